@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AplicativoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'aplicativo'
+
+    def ready(self):
+        # Registra os sinais que invalidam o cache do painel da página inicial
+        from . import painel  # noqa: F401
+        # Registra o sinal que descarta os fragmentos do layout quando um template é alterado no runserver
+        from . import layout  # noqa: F401
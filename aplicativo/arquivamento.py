@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from .models import Produto, Movimentacao, ProdutoArquivado, MovimentacaoArquivada, SaldoPeriodico
+
+# Arquivamento dos produtos e movimentações deletados (exclusão lógica). Os registros deletados antes da data limite
+# são copiados para as tabelas de arquivo e removidos das tabelas principais em lotes, cada lote em sua própria
+# transação, assim as tabelas e os índices consultados pelas telas contêm somente os registros em uso.
+# Os registros arquivados podem ser devolvidos às tabelas principais com o mesmo id (desarquivar_*).
+
+TAMANHO_LOTE = 1000
+
+CAMPOS_PRODUTO = ('nome', 'fabricante', 'tipo', 'descricao', 'ativo', 'deletado_em')
+CAMPOS_MOVIMENTACAO = ('produto_id', 'data_hora', 'quantidade', 'tipo_movimentacao', 'local_id', 'deletado_em')
+
+
+def _mover(origem, destino, campos, filtro, tamanho_lote, **valores):
+
+    # Copia um lote de registros da tabela de origem para a de destino, com o mesmo id, e os remove da origem.
+    # As linhas do lote ficam bloqueadas até o fim da transação, evitando que sejam alteradas entre a cópia
+    # e a remoção. Retorna os ids movidos
+    with transaction.atomic():
+        registros = list(
+            origem.select_for_update().filter(filtro).order_by('pk').values('pk', *campos)[:tamanho_lote]
+        )
+        ids = [registro.pop('pk') for registro in registros]
+        if ids:
+            destino.bulk_create(
+                [destino.model(id=pk, **registro, **valores) for pk, registro in zip(ids, registros)],
+                batch_size=tamanho_lote,
+            )
+            origem.filter(pk__in=ids).delete()
+
+    return ids
+
+
+def _arquivar(origem, destino, campos, filtro, tamanho_lote):
+    total = 0
+    while True:
+        ids = _mover(origem, destino, campos, filtro, tamanho_lote, arquivado_em=timezone.now())
+        total += len(ids)
+        if len(ids) < tamanho_lote:
+            return total
+
+
+def arquivar_deletados(limite, tamanho_lote=TAMANHO_LOTE):
+
+    # Arquiva as movimentações e os produtos deletados antes da data limite. As movimentações são arquivadas antes,
+    # pois um produto só é arquivado quando não possui mais nenhuma movimentação nas tabelas principais (as
+    # movimentações não deletadas de um produto deletado continuam fazendo parte do estoque e do histórico).
+    # Produtos com saldo de abertura também não são arquivados: após desanexar as partições antigas o saldo de
+    # abertura é o único registro do histórico do produto e seria removido junto com ele (on_delete=CASCADE)
+    deletado_antes = Q(deletado=True, deletado_em__lt=limite)
+
+    movimentacoes = _arquivar(
+        Movimentacao.todos, MovimentacaoArquivada.objects, CAMPOS_MOVIMENTACAO, deletado_antes, tamanho_lote
+    )
+    produtos = _arquivar(
+        Produto.todos, ProdutoArquivado.objects, CAMPOS_PRODUTO,
+        deletado_antes
+        & ~Exists(Movimentacao.todos.filter(produto=OuterRef('pk')))
+        & ~Exists(SaldoPeriodico.objects.filter(produto=OuterRef('pk'), abertura=True)),
+        tamanho_lote,
+    )
+
+    return {'movimentacoes': movimentacoes, 'produtos': produtos}
+
+
+def desarquivar_produtos(ids):
+
+    # Devolve os produtos arquivados à tabela de produtos ainda deletados, no mesmo estado em que estavam antes
+    # do arquivamento, assim podem ser restaurados da mesma forma que os demais produtos deletados
+    ids = set(ids)
+    return len(_mover(ProdutoArquivado.objects, Produto.todos, CAMPOS_PRODUTO, Q(pk__in=ids), len(ids) or 1,
+                      deletado=True))
+
+
+def desarquivar_movimentacoes(ids):
+
+    # Devolve as movimentações arquivadas à tabela de movimentações ainda deletadas. Os produtos dessas
+    # movimentações que também foram arquivados são devolvidos antes, na mesma transação
+    ids = set(ids)
+    with transaction.atomic():
+        desarquivar_produtos(
+            MovimentacaoArquivada.objects.filter(pk__in=ids).values_list('produto_id', flat=True).distinct()
+        )
+        return len(_mover(MovimentacaoArquivada.objects, Movimentacao.todos, CAMPOS_MOVIMENTACAO, Q(pk__in=ids),
+                          len(ids) or 1, deletado=True))
@@ -0,0 +1,91 @@
+import re
+from functools import reduce
+from operator import and_
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .models import Produto
+
+# Buscas de produtos feitas no banco.
+# O autocomplete do cadastro de movimentações carrega somente os produtos digitados em vez de todos os produtos
+# ativos, no PostgreSQL a busca por parte do nome ou do fabricante utiliza os índices de trigramas da migração 0021.
+# A busca da listagem de produtos utiliza no PostgreSQL a busca textual (full-text) sobre a coluna busca da migração
+# 0022, com um índice GIN, e nos demais bancos (ex.: SQLite) filtros icontains que percorrem a tabela de produtos.
+
+LIMITE_AUTOCOMPLETE = 20
+LIMITE_AUTOCOMPLETE_MAXIMO = 50
+
+CAMPOS_BUSCA = ('nome', 'fabricante', 'tipo', 'descricao')
+PRODUTOS_POR_PAGINA = 50
+
+
+def autocompletar_produtos(termo, limite=LIMITE_AUTOCOMPLETE):
+
+    # Retorna os primeiros produtos ativos cujo nome ou fabricante contém o termo. Os produtos cujo nome começa
+    # com o termo são listados primeiro, seguidos dos demais, ambos em ordem alfabética
+    produtos = Produto.objects.filter(ativo=True)
+
+    termo = ' '.join(termo.split())
+    if termo:
+        produtos = produtos.filter(Q(nome__icontains=termo) | Q(fabricante__icontains=termo)).annotate(
+            relevancia=Case(When(nome__istartswith=termo, then=Value(0)), default=Value(1),
+                            output_field=IntegerField())
+        ).order_by('relevancia', 'nome')
+    else:
+        produtos = produtos.order_by('nome')
+
+    return list(produtos.values('id', 'nome', 'fabricante')[:limite])
+
+
+def _palavras(termo):
+    # Palavras do termo (letras e números), descartando pontuação e os operadores da sintaxe de busca do PostgreSQL
+    return re.findall(r'[^\W_]+', termo)
+
+
+def _buscar_texto_postgresql(produtos, palavras):
+
+    # Todas as palavras devem estar presentes, cada uma como prefixo (ex.: "paraf sext" encontra "Parafuso
+    # Sextavado"). A relevância (ts_rank) considera os pesos da coluna busca: nome, fabricante, tipo e descrição
+    consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+
+    return produtos.filter(
+        RawSQL("aplicativo_produto.busca @@ to_tsquery('portuguese', %s)", [consulta], output_field=BooleanField())
+    ).annotate(
+        relevancia=RawSQL("ts_rank(aplicativo_produto.busca, to_tsquery('portuguese', %s))", [consulta],
+                          output_field=FloatField())
+    )
+
+
+def _buscar_texto_generico(produtos, termo, palavras):
+
+    # Cada palavra deve estar contida em algum dos campos. A relevância prioriza os produtos cujo nome começa
+    # com o termo, depois os que contêm o termo no nome e por último no fabricante
+    produtos = produtos.filter(reduce(and_, (
+        reduce(lambda filtro, campo: filtro | Q(**{f'{campo}__icontains': palavra}), CAMPOS_BUSCA, Q())
+        for palavra in palavras
+    )))
+
+    return produtos.annotate(relevancia=Case(
+        When(nome__istartswith=termo, then=Value(3)),
+        When(nome__icontains=termo, then=Value(2)),
+        When(fabricante__icontains=termo, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def buscar_produtos(termo):
+
+    # Produtos não deletados que correspondem ao termo em nome, fabricante, tipo ou descrição, dos mais relevantes
+    # para os menos relevantes. Sem termo retorna todos os produtos em ordem alfabética
+    produtos = Produto.objects.all()
+    palavras = _palavras(termo)
+    if not palavras:
+        return produtos.order_by('nome', 'pk')
+
+    if connection.vendor == 'postgresql':
+        produtos = _buscar_texto_postgresql(produtos, palavras)
+    else:
+        produtos = _buscar_texto_generico(produtos, ' '.join(termo.split()), palavras)
+
+    return produtos.order_by('-relevancia', 'nome', 'pk')
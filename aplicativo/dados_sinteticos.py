@@ -0,0 +1,125 @@
+import random
+from itertools import accumulate
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import Produto, Movimentacao, EstoqueProduto
+from .estoque import recalcular_saldos, recalcular_resumos_mensais, recalcular_saldos_periodicos
+from . import versoes
+from .versoes import incrementar_versao
+from .painel import invalidar_painel
+from .locais import resolver_locais
+
+# Geração de produtos e movimentações sintéticos para medir o desempenho das telas com volumes realistas.
+# Os produtos seguem uma distribuição de popularidade (poucos produtos concentram a maior parte das movimentações),
+# as datas se concentram nos anos mais recentes e as saidas nunca ultrapassam o estoque do produto.
+
+FABRICANTES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Wonka', 'Tyrell']
+TIPOS = ['Matéria-prima', 'Embalagem', 'Componente', 'Produto acabado', 'Insumo']
+LOCAIS = ['Depósito Central', 'Depósito Norte', 'Depósito Sul', 'Loja 01', 'Loja 02', 'Loja 03',
+          'Centro de Distribuição', 'Expedição', 'Recebimento', 'Quarentena']
+
+TAMANHO_LOTE = 10000
+
+
+def gerar_produtos(quantidade, prefixo='Sintético', proporcao_deletados=0.05, aleatorio=None):
+
+    # Os nomes continuam a numeração dos produtos sintéticos já existentes, mantendo-os únicos
+    aleatorio = aleatorio or random.Random()
+    agora = timezone.now()
+    inicio = Produto.todos.filter(nome__startswith=f'{prefixo} ').count()
+
+    produtos = []
+    for numero in range(inicio + 1, inicio + quantidade + 1):
+        deletado = aleatorio.random() < proporcao_deletados
+        produtos.append(Produto(
+            nome=f'{prefixo} {numero:07d}',
+            fabricante=aleatorio.choice(FABRICANTES),
+            tipo=aleatorio.choice(TIPOS),
+            descricao=None,
+            ativo=aleatorio.random() >= 0.1,
+            deletado=deletado,
+            deletado_em=agora if deletado else None,
+        ))
+    Produto.objects.bulk_create(produtos, batch_size=1000)
+
+    return list(
+        Produto.todos.filter(nome__in=[produto.nome for produto in produtos]).values_list('pk', flat=True)
+    )
+
+
+def gerar_movimentacoes(produto_ids, quantidade, anos=3, proporcao_saidas=0.45, proporcao_deletadas=0.02,
+                        aleatorio=None):
+
+    # Gera as movimentações em ordem cronológica e em lotes, assim a memória utilizada não depende da quantidade
+    aleatorio = aleatorio or random.Random()
+    agora = timezone.now()
+    periodo = timedelta(days=365 * anos).total_seconds()
+
+    # Popularidade dos produtos no formato de Zipf, o primeiro produto é o mais movimentado
+    pesos = list(accumulate(1 / (posicao + 1) for posicao in range(len(produto_ids))))
+    estoques = dict(EstoqueProduto.objects.filter(produto_id__in=produto_ids).values_list('produto_id', 'estoque'))
+
+    # As movimentações de produtos deletados são deletadas junto com o produto, com a mesma data de exclusão
+    # (ver exclusao.excluir_produtos), e não alteram o estoque
+    produtos_deletados = dict(
+        Produto.todos.filter(pk__in=produto_ids, deletado=True).values_list('pk', 'deletado_em')
+    )
+    local_ids = list(resolver_locais(LOCAIS).values())
+
+    # Datas concentradas no período mais recente (distribuição triangular com moda no momento atual)
+    segundos_atras = sorted((aleatorio.triangular(0, periodo, 0) for _ in range(quantidade)), reverse=True)
+
+    for inicio in range(0, quantidade, TAMANHO_LOTE):
+        lote = []
+        for segundos in segundos_atras[inicio:inicio + TAMANHO_LOTE]:
+            produto_id = aleatorio.choices(produto_ids, cum_weights=pesos)[0]
+            quantidade_movimentada = max(1, int(aleatorio.lognormvariate(2.5, 1)))
+            estoque = estoques.get(produto_id, 0)
+
+            # Saidas maiores que o estoque são registradas como entradas
+            saida = aleatorio.random() < proporcao_saidas and estoque >= quantidade_movimentada
+            deletado = aleatorio.random() < proporcao_deletadas
+            data_hora = agora - timedelta(seconds=segundos)
+
+            # As movimentações deletadas são consideradas deletadas no próprio dia em que foram registradas
+            deletado_em = data_hora if deletado else None
+            if produto_id in produtos_deletados:
+                deletado, deletado_em = True, produtos_deletados[produto_id]
+            if not deletado:
+                estoques[produto_id] = estoque - quantidade_movimentada if saida else estoque + quantidade_movimentada
+
+            lote.append(Movimentacao(
+                produto_id=produto_id,
+                data_hora=data_hora,
+                quantidade=quantidade_movimentada,
+                tipo_movimentacao=not saida,
+                local_id=aleatorio.choice(local_ids),
+                deletado=deletado,
+                deletado_em=deletado_em,
+            ))
+
+        with transaction.atomic():
+            Movimentacao.objects.bulk_create(lote, batch_size=1000)
+
+
+def gerar_dados(produtos, movimentacoes, anos=3, semente=None, produto_ids=None):
+
+    # Cria os produtos (quando produto_ids não é informado) e as movimentações, reconstruindo ao final os saldos,
+    # o resumo mensal e os saldos periódicos, que não são atualizados pelo bulk_create.
+    # Retorna os ids dos produtos utilizados
+    aleatorio = random.Random(semente)
+    if produto_ids is None:
+        produto_ids = gerar_produtos(produtos, aleatorio=aleatorio)
+
+    gerar_movimentacoes(produto_ids, movimentacoes, anos=anos, aleatorio=aleatorio)
+
+    with transaction.atomic():
+        incrementar_versao(versoes.PRODUTO)
+        incrementar_versao(versoes.MOVIMENTACAO)
+        recalcular_saldos()
+        recalcular_resumos_mensais()
+        recalcular_saldos_periodicos()
+        invalidar_painel()
+
+    return produto_ids
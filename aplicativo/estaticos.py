@@ -0,0 +1,207 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+
+# Arquivos estáticos compactados (ver ESTATICOS_COMPACTADOS em config/settings.py).
+# Cada página carrega um pacote com somente o css e o js que utiliza. Com ESTATICOS_COMPACTADOS ativo o collectstatic
+# gera um arquivo por pacote (pacotes/<nome>.css e pacotes/<nome>.js), grava todos os arquivos com o hash do conteúdo
+# no nome (ManifestStaticFilesStorage) e as versões pré-comprimidas (.gz e, com o módulo brotli instalado, .br).
+# O EstaticosMiddleware serve esses arquivos com o cache de longa duração, pois o nome muda quando o conteúdo muda.
+# Sem ESTATICOS_COMPACTADOS (desenvolvimento) os arquivos de cada pacote são carregados separadamente.
+
+CSS_BASE = (
+    'vendor/bootstrap/css/bootstrap.min.css',
+    'vendor/bootstrap-icons/bootstrap-icons.css',
+    'vendor/remixicon/remixicon.css',
+)
+JS_BASE = (
+    'vendor/bootstrap/js/bootstrap.bundle.min.js',
+    'js/main.js',
+)
+
+# O css do projeto (css/style.css) é sempre o último, pois sobrescreve os estilos das bibliotecas
+PACOTES = {
+    'padrao': {
+        'css': CSS_BASE + ('css/style.css',),
+        'js': JS_BASE,
+    },
+    'painel': {
+        'css': CSS_BASE + ('css/style.css',),
+        'js': ('vendor/apexcharts/apexcharts.min.js', 'vendor/echarts/echarts.min.js') + JS_BASE,
+    },
+    'estoque': {
+        'css': CSS_BASE + ('vendor/simple-datatables/style.css', 'css/style.css'),
+        'js': ('vendor/simple-datatables/simple-datatables.js',) + JS_BASE,
+    },
+    'movimentacao': {
+        'css': CSS_BASE + ('admin/css/vendor/select2/select2.min.css', 'css/style.css'),
+        'js': JS_BASE + (
+            'admin/js/vendor/select2/select2.full.min.js',
+            'admin/js/vendor/select2/i18n/pt-BR.js',
+            'js/autocomplete_produto.js',
+        ),
+    },
+}
+
+EXTENSOES_COMPRIMIDAS = ('.css', '.js', '.svg', '.json', '.txt', '.eot', '.ttf', '.map')
+# Sufixo dos arquivos pré-comprimidos de cada codificação, em ordem de preferência
+SUFIXOS = {'br': '.br', 'gzip': '.gz'}
+
+MAPA_FONTE = re.compile(r'^\s*(//[#@] sourceMappingURL=.*|/\*[#@] sourceMappingURL=.*?\*/)\s*$', re.MULTILINE)
+URL_CSS = re.compile(r'''url\(\s*(['"]?)(.*?)\1\s*\)''')
+COMENTARIO_CSS = re.compile(r'/\*(?!!).*?\*/', re.DOTALL)
+ESPACOS_CSS = re.compile(r'\s*([{};,>])\s*')
+
+
+def nome_pacote(nome, extensao):
+    return f'pacotes/{nome}.{extensao}'
+
+
+def _ajustar_urls_css(conteudo, origem, destino):
+
+    # As urls relativas do css (fontes e imagens) são reescritas a partir da pasta do pacote, assim continuam
+    # apontando para os mesmos arquivos, que depois recebem o hash no nome pelo ManifestStaticFilesStorage
+    def ajustar(encontrado):
+        aspas, url = encontrado.groups()
+        if not url or url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return encontrado.group(0)
+
+        caminho = posixpath.normpath(posixpath.join(posixpath.dirname(origem), url))
+        return f'url({aspas}{posixpath.relpath(caminho, posixpath.dirname(destino))}{aspas})'
+
+    return URL_CSS.sub(ajustar, conteudo)
+
+
+def _reduzir_css(conteudo):
+    # Remove os comentários (exceto os de licença, /*! */) e os espaços desnecessários do css
+    return ESPACOS_CSS.sub(r'\1', ' '.join(COMENTARIO_CSS.sub('', conteudo).split()))
+
+
+def montar_pacote(arquivos, extensao, destino, abrir):
+
+    # Concatena os arquivos do pacote na ordem informada. Os comentários de source map são removidos, pois os
+    # mapas não correspondem ao arquivo concatenado. O js não é reduzido, as bibliotecas já são distribuídas
+    # minificadas e os arquivos do projeto são pequenos
+    partes = []
+    for arquivo in arquivos:
+        with abrir(arquivo) as origem:
+            conteudo = MAPA_FONTE.sub('', origem.read().decode('utf-8'))
+
+        if extensao == 'css':
+            conteudo = _ajustar_urls_css(conteudo, arquivo, destino)
+            if not arquivo.endswith('.min.css'):
+                conteudo = _reduzir_css(conteudo)
+        partes.append(conteudo.strip())
+
+    # O ponto e vírgula separa os scripts que não terminam com ponto e vírgula
+    return ('\n' if extensao == 'css' else '\n;\n').join(partes) + '\n'
+
+
+def comprimir(conteudo):
+
+    # Versões comprimidas do conteúdo, por codificação (Content-Encoding). O brotli é uma dependência opcional,
+    # sem ele somente a versão gzip é gerada
+    versoes = {'gzip': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        versoes['br'] = brotli.compress(conteudo)
+
+    return versoes
+
+
+class ArmazenamentoEstaticos(ManifestStaticFilesStorage):
+
+    # Storage do collectstatic que, além dos nomes com hash, gera os pacotes das páginas e as versões comprimidas
+
+    def _gravar(self, nome, conteudo):
+        if self.exists(nome):
+            self.delete(nome)
+        self.save(nome, ContentFile(conteudo))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        # Os pacotes são montados a partir dos arquivos já copiados para o STATIC_ROOT e processados junto com
+        # os demais arquivos, assim as urls do css recebem os nomes com hash
+        for nome, pacote in PACOTES.items():
+            for extensao, arquivos in pacote.items():
+                destino = nome_pacote(nome, extensao)
+                self._gravar(destino, montar_pacote(arquivos, extensao, destino, self.open).encode('utf-8'))
+                paths[destino] = (self, destino)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for nome in set(self.hashed_files.values()):
+            if not nome.endswith(EXTENSOES_COMPRIMIDAS):
+                continue
+
+            with self.open(nome) as arquivo:
+                conteudo = arquivo.read()
+            for codificacao, comprimido in comprimir(conteudo).items():
+                # Arquivos que não diminuem com a compressão são servidos sem compressão
+                if len(comprimido) < len(conteudo):
+                    self._gravar(nome + SUFIXOS[codificacao], comprimido)
+
+
+class EstaticosMiddleware:
+
+    # Serve os arquivos do STATIC_ROOT com a versão comprimida aceita pelo navegador (Accept-Encoding).
+    # Os arquivos com hash no nome recebem o cache de ESTATICOS_CACHE_MAXIMO segundos (immutable), os demais
+    # (ex.: arquivos referenciados sem o template tag static) são revalidados a cada ESTATICOS_CACHE_SEM_HASH segundos
+
+    def __init__(self, get_response):
+        if not settings.ESTATICOS_COMPACTADOS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.com_hash = set(staticfiles_storage.hashed_files.values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(settings.STATIC_URL):
+            resposta = self.servir(request, request.path[len(settings.STATIC_URL):])
+            if resposta is not None:
+                return resposta
+
+        return self.get_response(request)
+
+    def servir(self, request, nome):
+        try:
+            caminho = safe_join(settings.STATIC_ROOT, nome)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(caminho):
+            return None
+
+        aceitas = {
+            parte.split(';')[0].strip() for parte in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        codificacao = next(
+            (codificacao for codificacao in SUFIXOS
+             if codificacao in aceitas and os.path.isfile(caminho + SUFIXOS[codificacao])),
+            None,
+        )
+
+        tipo, _ = mimetypes.guess_type(nome)
+        resposta = FileResponse(open(caminho + SUFIXOS[codificacao] if codificacao else caminho, 'rb'),
+                                content_type=tipo or 'application/octet-stream')
+        if codificacao:
+            resposta['Content-Encoding'] = codificacao
+        resposta['Vary'] = 'Accept-Encoding'
+        if nome in self.com_hash:
+            resposta['Cache-Control'] = f'public, max-age={settings.ESTATICOS_CACHE_MAXIMO}, immutable'
+        else:
+            resposta['Cache-Control'] = f'public, max-age={settings.ESTATICOS_CACHE_SEM_HASH}'
+
+        return resposta
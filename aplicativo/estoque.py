@@ -0,0 +1,506 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Case, Count, DateField, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+from django.utils import timezone
+from .models import Movimentacao, EstoqueProduto, MovimentacaoMensal, SaldoPeriodico, ContadorAlteracao
+from . import versoes
+
+# Funções responsáveis por manter as tabelas EstoqueProduto, MovimentacaoMensal e SaldoPeriodico sincronizadas
+# com as movimentações.
+# Devem ser chamadas dentro da mesma transação (transaction.atomic) que grava a movimentação.
+# A versão das movimentações (versoes.MOVIMENTACAO) deve ser incrementada antes, na mesma transação, pois as linhas
+# de EstoqueProduto e MovimentacaoMensal alteradas são marcadas com ela (ver painel.delta_painel).
+
+
+class EstoqueInsuficiente(Exception):
+    # Lançada quando uma saída não pode ser reservada por falta de estoque, a transação deve ser desfeita
+    def __init__(self, produto_id, quantidade):
+        self.produto_id = produto_id
+        self.quantidade = quantidade
+        super().__init__(
+            f"Estoque insuficiente para efetuar a saida de <strong>{quantidade} itens</strong> do produto, "
+            f"faça mais entradas deste produto para ser possivel efetuar a saida.")
+
+
+def obter_saldo(produto):
+    # Retorna o saldo materializado do produto, caso ainda não exista retorna um saldo zerado (não salvo)
+    saldo = EstoqueProduto.objects.filter(produto=produto).first()
+
+    return saldo or EstoqueProduto(produto=produto)
+
+
+def _versao_atual():
+    # Versão das movimentações já incrementada pela transação atual, lida pelo próprio UPDATE como subconsulta
+    versao = ContadorAlteracao.objects.filter(nome=versoes.MOVIMENTACAO).values('versao')[:1]
+
+    return Coalesce(Subquery(versao), Value(0))
+
+
+def _incrementar(modelo, filtro, incrementos):
+
+    # O incremento é feito com F() para que o banco aplique o valor sobre o valor atual,
+    # evitando sobrescrever alterações feitas por outra transação em paralelo
+    campos = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    campos['versao'] = _versao_atual()
+    if modelo.objects.filter(**filtro).update(**campos):
+        return
+
+    # Na primeira movimentação a linha ainda não existe, então ela é criada já com os valores incrementados.
+    # Caso outra transação tenha criado a linha no mesmo instante, o incremento é aplicado sobre ela
+    _, criado = modelo.objects.get_or_create(**filtro, defaults={**incrementos, 'versao': _versao_atual()})
+    if not criado:
+        modelo.objects.filter(**filtro).update(**campos)
+
+
+def _ajustar_saldo(produto_id, tipo_movimentacao, quantidade, sinal):
+    quantidade = quantidade * sinal
+    if tipo_movimentacao:
+        incrementos = {'total_entradas': quantidade, 'contagem_entradas': sinal, 'estoque': quantidade}
+    else:
+        incrementos = {'total_saidas': quantidade, 'contagem_saidas': sinal, 'estoque': -quantidade}
+
+    _incrementar(EstoqueProduto, {'produto_id': produto_id}, incrementos)
+
+
+def _ajustar_resumo_mensal(movimentacao, sinal):
+
+    # Identifica o mês da movimentação pelo primeiro dia do mês, no fuso horário do projeto
+    mes = timezone.localtime(movimentacao.data_hora).date().replace(day=1)
+    campo_total = 'total_entradas' if movimentacao.tipo_movimentacao else 'total_saidas'
+
+    _incrementar(MovimentacaoMensal, {'mes': mes}, {campo_total: movimentacao.quantidade * sinal, 'contagem': sinal})
+
+
+def _incrementos_saldo_periodico(tipo_movimentacao, quantidade, sinal):
+    if tipo_movimentacao:
+        return {'total_entradas': quantidade, 'estoque': quantidade, 'contagem_entradas': sinal}
+
+    return {'total_saidas': quantidade, 'estoque': -quantidade, 'contagem_saidas': sinal}
+
+
+def _atualizar_saldos_periodicos(saldos, incrementos):
+    # As contagens são mantidas somente nos saldos de abertura, os demais saldos periódicos não as utilizam
+    saldos.update(**{
+        campo: Case(When(abertura=True, then=F(campo) + valor), default=F(campo))
+        if campo.startswith('contagem_') else F(campo) + valor
+        for campo, valor in incrementos.items()
+    })
+
+
+def _ajustar_saldos_periodicos(movimentacao, sinal):
+
+    # Os saldos periódicos posteriores ao dia da movimentação já a contabilizam, uma movimentação com data
+    # retroativa (cadastro, edição ou exclusão) é aplicada em todos eles em um único UPDATE
+    dia = timezone.localtime(movimentacao.data_hora).date()
+    incrementos = _incrementos_saldo_periodico(movimentacao.tipo_movimentacao, movimentacao.quantidade * sinal, sinal)
+
+    _atualizar_saldos_periodicos(
+        SaldoPeriodico.objects.filter(produto_id=movimentacao.produto_id, data__gt=dia), incrementos
+    )
+
+
+def reservar_saida(produto_id, quantidade):
+
+    # Baixa a saida do saldo em um único UPDATE condicional, o banco só altera a linha caso ainda exista
+    # estoque suficiente no momento da gravação. Como a verificação e a baixa acontecem no mesmo comando,
+    # duas saidas simultâneas do mesmo produto não conseguem deixar o estoque negativo
+    reservado = EstoqueProduto.objects.filter(produto_id=produto_id, estoque__gte=quantidade).update(
+        total_saidas=F('total_saidas') + quantidade,
+        contagem_saidas=F('contagem_saidas') + 1,
+        estoque=F('estoque') - quantidade,
+        versao=_versao_atual(),
+    )
+
+    if not reservado:
+        raise EstoqueInsuficiente(produto_id, quantidade)
+
+
+def registrar_movimentacao(movimentacao):
+    # Soma a movimentação ao saldo do produto, movimentações deletadas não são contabilizadas.
+    # Saidas sem estoque suficiente lançam EstoqueInsuficiente
+    if movimentacao.deletado:
+        return
+
+    if movimentacao.tipo_movimentacao:
+        _ajustar_saldo(movimentacao.produto_id, movimentacao.tipo_movimentacao, movimentacao.quantidade, 1)
+    else:
+        reservar_saida(movimentacao.produto_id, movimentacao.quantidade)
+
+    _ajustar_resumo_mensal(movimentacao, 1)
+    _ajustar_saldos_periodicos(movimentacao, 1)
+
+    # Atualiza a data da última movimentação apenas se a nova for mais recente
+    EstoqueProduto.objects.filter(
+        Q(ultima_movimentacao__isnull=True) | Q(ultima_movimentacao__lt=movimentacao.data_hora),
+        produto_id=movimentacao.produto_id,
+    ).update(ultima_movimentacao=movimentacao.data_hora)
+
+
+def estornar_movimentacao(movimentacao):
+    # Remove a movimentação do saldo do produto, utilizado na edição e na exclusão.
+    # Deve ser chamado após a movimentação ter sido gravada no banco, pois a data da última movimentação
+    # é recalculada a partir das movimentações restantes
+    if movimentacao.deletado:
+        return
+
+    _ajustar_saldo(movimentacao.produto_id, movimentacao.tipo_movimentacao, movimentacao.quantidade, -1)
+    _ajustar_resumo_mensal(movimentacao, -1)
+    _ajustar_saldos_periodicos(movimentacao, -1)
+
+    # Somente recalcula a última movimentação caso a movimentação estornada fosse a mais recente,
+    # a busca da nova data é feita como subconsulta do próprio UPDATE
+    ultima = (
+        Movimentacao.objects
+        .filter(produto_id=movimentacao.produto_id)
+        .order_by('-data_hora')
+        .values('data_hora')[:1]
+    )
+    EstoqueProduto.objects.filter(
+        produto_id=movimentacao.produto_id,
+        ultima_movimentacao__lte=movimentacao.data_hora,
+    ).update(ultima_movimentacao=Subquery(ultima))
+
+
+def atualizar_movimentacao(anterior, movimentacao):
+    # Estorna os valores anteriores da movimentação e registra os novos, o produto e o mês podem ter sido
+    # trocados na edição
+    estornar_movimentacao(anterior)
+    registrar_movimentacao(movimentacao)
+
+
+def obter_saldos_para_atualizacao(produto_ids):
+    # Retorna o estoque atual de cada produto bloqueando as linhas de saldo até o fim da transação,
+    # assim nenhuma outra saida pode ser gravada enquanto um lote é validado em memória
+    saldos = EstoqueProduto.objects.select_for_update().filter(produto_id__in=produto_ids).values_list(
+        'produto_id', 'estoque'
+    )
+
+    return dict(saldos)
+
+
+def _ajustar_em_lote(movimentacoes, sinal):
+
+    # Acumula os valores de um lote de movimentações em memória para executar um único incremento por produto,
+    # por mês e por dia em vez de um por movimentação. Com sinal -1 os valores são estornados.
+    # Retorna os ids dos produtos do lote e a data da movimentação mais recente de cada um
+    por_produto = {}
+    por_mes = {}
+    por_dia = {}
+    for movimentacao in movimentacoes:
+        if movimentacao.deletado:
+            continue
+
+        quantidade = movimentacao.quantidade * sinal
+        produto = por_produto.setdefault(movimentacao.produto_id, {
+            'incrementos': {'total_entradas': 0, 'total_saidas': 0, 'contagem_entradas': 0,
+                            'contagem_saidas': 0, 'estoque': 0},
+            'ultima_movimentacao': movimentacao.data_hora,
+        })
+        mes = por_mes.setdefault(
+            timezone.localtime(movimentacao.data_hora).date().replace(day=1),
+            {'total_entradas': 0, 'total_saidas': 0, 'contagem': 0},
+        )
+
+        if movimentacao.tipo_movimentacao:
+            produto['incrementos']['total_entradas'] += quantidade
+            produto['incrementos']['contagem_entradas'] += sinal
+            produto['incrementos']['estoque'] += quantidade
+            mes['total_entradas'] += quantidade
+        else:
+            produto['incrementos']['total_saidas'] += quantidade
+            produto['incrementos']['contagem_saidas'] += sinal
+            produto['incrementos']['estoque'] -= quantidade
+            mes['total_saidas'] += quantidade
+        mes['contagem'] += sinal
+        produto['ultima_movimentacao'] = max(produto['ultima_movimentacao'], movimentacao.data_hora)
+
+        dia = por_dia.setdefault(
+            (movimentacao.produto_id, timezone.localtime(movimentacao.data_hora).date()),
+            {'total_entradas': 0, 'total_saidas': 0, 'estoque': 0, 'contagem_entradas': 0, 'contagem_saidas': 0},
+        )
+        for campo, valor in _incrementos_saldo_periodico(movimentacao.tipo_movimentacao, quantidade, sinal).items():
+            dia[campo] += valor
+
+    for produto_id, produto in por_produto.items():
+        _incrementar(EstoqueProduto, {'produto_id': produto_id}, produto['incrementos'])
+
+    for mes, incrementos in por_mes.items():
+        _incrementar(MovimentacaoMensal, {'mes': mes}, incrementos)
+
+    # Normalmente o lote é mais recente que o último saldo periódico, nesse caso uma única consulta confirma
+    # que não há saldos a ajustar. Caso contrário é executado um UPDATE por produto e dia do lote
+    if por_dia and SaldoPeriodico.objects.filter(
+        produto_id__in=por_produto, data__gt=min(dia for _, dia in por_dia)
+    ).exists():
+        for (produto_id, dia), incrementos in por_dia.items():
+            _atualizar_saldos_periodicos(SaldoPeriodico.objects.filter(produto_id=produto_id, data__gt=dia),
+                                         incrementos)
+
+    return {produto_id: produto['ultima_movimentacao'] for produto_id, produto in por_produto.items()}
+
+
+def registrar_movimentacoes_em_lote(movimentacoes):
+    # Soma um lote de movimentações já gravadas aos saldos, ao resumo mensal e aos saldos periódicos.
+    # O estoque das saidas deve ter sido validado antes, com os saldos bloqueados por obter_saldos_para_atualizacao
+    ultimas = _ajustar_em_lote(movimentacoes, 1)
+
+    for produto_id, ultima_movimentacao in ultimas.items():
+        EstoqueProduto.objects.filter(
+            Q(ultima_movimentacao__isnull=True) | Q(ultima_movimentacao__lt=ultima_movimentacao),
+            produto_id=produto_id,
+        ).update(ultima_movimentacao=ultima_movimentacao)
+
+
+def estornar_movimentacoes_em_lote(movimentacoes):
+
+    # Remove um lote de movimentações dos saldos, do resumo mensal e dos saldos periódicos, utilizado na exclusão
+    # em lote. Assim como em estornar_movimentacao, deve ser chamado após as movimentações terem sido gravadas
+    # como deletadas, a última movimentação dos produtos do lote é recalculada em um único UPDATE
+    ultimas = _ajustar_em_lote(movimentacoes, -1)
+    if not ultimas:
+        return
+
+    ultima = (
+        Movimentacao.objects
+        .filter(produto_id=OuterRef('produto_id'))
+        .order_by('-data_hora')
+        .values('data_hora')[:1]
+    )
+    EstoqueProduto.objects.filter(produto_id__in=ultimas).update(ultima_movimentacao=Subquery(ultima))
+
+
+# Campos acumulados por produto nos saldos de abertura e nos saldos recalculados
+CAMPOS_SALDO = ('total_entradas', 'total_saidas', 'contagem_entradas', 'contagem_saidas', 'ultima_movimentacao')
+
+
+def obter_corte_historico():
+    # Data do saldo de abertura mais recente. As movimentações anteriores a essa data podem ter sido desanexadas
+    # (ver particionamento.desanexar_particoes_expiradas) e são consideradas somente através do saldo de abertura
+    return SaldoPeriodico.objects.filter(abertura=True).aggregate(corte=Max('data'))['corte']
+
+
+def _movimentacoes_desde(corte):
+    # Movimentações que os recálculos devem somar ao saldo de abertura, todas quando não há saldo de abertura
+    if corte is None:
+        return Movimentacao.objects.all()
+
+    return Movimentacao.objects.filter(data_hora__gte=_inicio_do_dia(corte))
+
+
+def _somar_saldos(saldos, movimentacoes):
+
+    # Soma aos saldos (por produto) os totais das movimentações, agrupados por produto em uma única consulta
+    totais = (
+        movimentacoes
+        .values('produto_id')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+            contagem_entradas=Count('id', filter=Q(tipo_movimentacao=True)),
+            contagem_saidas=Count('id', filter=Q(tipo_movimentacao=False)),
+            ultima_movimentacao=Max('data_hora'),
+        )
+        .order_by()
+    )
+    for total in totais:
+        saldo = saldos.setdefault(total['produto_id'], dict.fromkeys(CAMPOS_SALDO, 0))
+        for campo in CAMPOS_SALDO[:-1]:
+            saldo[campo] += total[campo] or 0
+        if not saldo['ultima_movimentacao'] or saldo['ultima_movimentacao'] < total['ultima_movimentacao']:
+            saldo['ultima_movimentacao'] = total['ultima_movimentacao']
+
+    return saldos
+
+
+def _saldos_abertura(corte):
+    if corte is None:
+        return {}
+
+    return {
+        saldo['produto_id']: {campo: saldo[campo] for campo in CAMPOS_SALDO}
+        for saldo in SaldoPeriodico.objects.filter(abertura=True, data=corte).values('produto_id', *CAMPOS_SALDO)
+    }
+
+
+def registrar_saldos_abertura(data):
+
+    # Registra o saldo de cada produto no inicio da data informada como saldo de abertura, a partir do saldo de
+    # abertura anterior e das movimentações entre ele e a data. Deve ser executado antes de desanexar as
+    # movimentações anteriores à data, retorna a quantidade de saldos registrados
+    corte = obter_corte_historico()
+    if corte is not None and corte >= data:
+        return 0
+
+    saldos = _somar_saldos(
+        _saldos_abertura(corte), _movimentacoes_desde(corte).filter(data_hora__lt=_inicio_do_dia(data))
+    )
+    SaldoPeriodico.objects.filter(data=data).delete()
+    SaldoPeriodico.objects.bulk_create([
+        SaldoPeriodico(produto_id=produto_id, data=data, abertura=True,
+                       estoque=saldo['total_entradas'] - saldo['total_saidas'], **saldo)
+        for produto_id, saldo in saldos.items()
+    ], batch_size=1000)
+
+    return len(saldos)
+
+
+def recalcular_saldos():
+
+    # Reconstrói todos os saldos a partir do histórico de movimentações em uma única consulta agrupada por produto,
+    # partindo do saldo de abertura quando as movimentações mais antigas foram desanexadas
+    versao = versoes.obter_versao(versoes.MOVIMENTACAO).versao
+    corte = obter_corte_historico()
+    totais = _somar_saldos(_saldos_abertura(corte), _movimentacoes_desde(corte))
+
+    saldos = []
+    for produto_id, total in totais.items():
+        saldos.append(EstoqueProduto(
+            produto_id=produto_id,
+            estoque=total['total_entradas'] - total['total_saidas'],
+            versao=versao,
+            **total,
+        ))
+
+    EstoqueProduto.objects.all().delete()
+    EstoqueProduto.objects.bulk_create(saldos, batch_size=1000)
+
+    return len(saldos)
+
+
+def obter_resumo_mensal():
+    # Retorna os meses que possuem movimentações, em ordem cronológica
+    return MovimentacaoMensal.objects.filter(contagem__gt=0).order_by('mes')
+
+
+def recalcular_resumos_mensais():
+
+    # Reconstrói o resumo mensal a partir do histórico de movimentações em uma única consulta agrupada por mês.
+    # Os meses anteriores ao saldo de abertura (movimentações desanexadas) são mantidos
+    versao = versoes.obter_versao(versoes.MOVIMENTACAO).versao
+    corte = obter_corte_historico()
+    totais = (
+        _movimentacoes_desde(corte)
+        .annotate(mes=TruncMonth('data_hora', output_field=DateField()))
+        .values('mes')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+            contagem=Count('id'),
+        )
+        .order_by()
+    )
+
+    resumos = [
+        MovimentacaoMensal(
+            mes=total['mes'],
+            total_entradas=total['total_entradas'] or 0,
+            total_saidas=total['total_saidas'] or 0,
+            contagem=total['contagem'],
+            versao=versao,
+        )
+        for total in totais
+    ]
+
+    (MovimentacaoMensal.objects.filter(mes__gte=corte) if corte else MovimentacaoMensal.objects.all()).delete()
+    MovimentacaoMensal.objects.bulk_create(resumos, batch_size=1000)
+
+    return len(resumos)
+
+
+# Periodicidade dos saldos periódicos, relacionando a função que trunca a data ao inicio do período
+PERIODOS_SALDO = {
+    'diario': TruncDay,
+    'mensal': TruncMonth,
+}
+
+
+def _fim_periodo(inicio, periodo):
+    # Primeiro dia do período seguinte, data em que o saldo do período é registrado
+    if periodo == 'diario':
+        return inicio + timedelta(days=1)
+
+    return (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def recalcular_saldos_periodicos(periodo='mensal'):
+
+    # Reconstrói os saldos periódicos acumulando, em ordem cronológica, os totais de cada produto por período.
+    # Um saldo é registrado somente ao final dos períodos com movimentações do produto, nos demais o saldo
+    # é o mesmo do último período registrado. Havendo saldo de abertura, os saldos até ele são mantidos
+    # e o acúmulo parte dele
+    corte = obter_corte_historico()
+    totais = (
+        _movimentacoes_desde(corte)
+        .annotate(periodo=PERIODOS_SALDO[periodo]('data_hora', output_field=DateField()))
+        .values('produto_id', 'periodo')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+        )
+        .order_by('produto_id', 'periodo')
+    )
+
+    saldos = []
+    acumulados = {
+        produto_id: {'total_entradas': saldo['total_entradas'], 'total_saidas': saldo['total_saidas']}
+        for produto_id, saldo in _saldos_abertura(corte).items()
+    }
+    for total in totais.iterator():
+        acumulado = acumulados.setdefault(total['produto_id'], {'total_entradas': 0, 'total_saidas': 0})
+        acumulado['total_entradas'] += total['total_entradas'] or 0
+        acumulado['total_saidas'] += total['total_saidas'] or 0
+        saldos.append(SaldoPeriodico(
+            produto_id=total['produto_id'],
+            data=_fim_periodo(total['periodo'], periodo),
+            total_entradas=acumulado['total_entradas'],
+            total_saidas=acumulado['total_saidas'],
+            estoque=acumulado['total_entradas'] - acumulado['total_saidas'],
+        ))
+
+    (SaldoPeriodico.objects.filter(data__gt=corte) if corte else SaldoPeriodico.objects.all()).delete()
+    SaldoPeriodico.objects.bulk_create(saldos, batch_size=1000)
+
+    return len(saldos)
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def obter_saldo_em(produto_id, data):
+
+    # Retorna o saldo do produto ao final do dia informado. Parte do saldo periódico mais próximo anterior à data
+    # e soma somente as movimentações entre ele e o final do dia, em vez de todo o histórico
+    limite = data + timedelta(days=1)
+    base = (
+        SaldoPeriodico.objects
+        .filter(produto_id=produto_id, data__lte=limite)
+        .order_by('-data')
+        .values('data', 'total_entradas', 'total_saidas')
+        .first()
+    )
+
+    movimentacoes = Movimentacao.objects.filter(
+        produto_id=produto_id, data_hora__lt=_inicio_do_dia(limite)
+    )
+    if base:
+        movimentacoes = movimentacoes.filter(data_hora__gte=_inicio_do_dia(base['data']))
+
+    totais = movimentacoes.aggregate(
+        total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+        total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+        contagem=Count('id'),
+    )
+
+    total_entradas = (base['total_entradas'] if base else 0) + (totais['total_entradas'] or 0)
+    total_saidas = (base['total_saidas'] if base else 0) + (totais['total_saidas'] or 0)
+
+    return {
+        'produto': produto_id,
+        'data': data,
+        'total_entradas': total_entradas,
+        'total_saidas': total_saidas,
+        'estoque': total_entradas - total_saidas,
+        'saldo_periodico': base['data'] if base else None,
+        'movimentacoes_somadas': totais['contagem'],
+    }
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from functools import partial
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .painel import delta_painel, CursorInvalido, executar_em_thread
+
+# Atualização da página inicial por server-sent events, servida diretamente pelo ASGI (config/asgi.py).
+# No Django 3.2 as respostas em streaming são percorridas de forma síncrona pelo ASGIHandler, uma view que aguarda
+# novas movimentações bloquearia o event loop. Por isso o caminho CAMINHO_EVENTOS é atendido por esta aplicação ASGI,
+# que aguarda entre as consultas sem ocupar uma thread, e as demais requisições seguem para o Django.
+# Cada evento contém o resultado de painel.delta_painel e o seu id é o cursor, assim ao reconectar o navegador envia
+# o último cursor recebido (Last-Event-ID) e a atualização continua de onde parou.
+
+CAMINHO_EVENTOS = '/painel/eventos/'
+
+
+def _cursor_inicial(scope):
+    # O cabeçalho Last-Event-ID da reconexão tem prioridade sobre o cursor da página (parâmetro cursor)
+    cabecalhos = dict(scope.get('headers', []))
+    cursor = cabecalhos.get(b'last-event-id', b'').decode('latin-1')
+    if not cursor:
+        cursor = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('cursor', [''])[0]
+
+    return cursor or None
+
+
+async def _aguardar_desconexao(receive, desconectado):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    desconectado.set()
+
+
+async def _enviar(send, texto):
+    await send({'type': 'http.response.body', 'body': texto.encode('utf-8'), 'more_body': True})
+
+
+async def eventos_painel(scope, receive, send):
+    cursor = _cursor_inicial(scope)
+    desconectado = asyncio.Event()
+    tarefa_desconexao = asyncio.ensure_future(_aguardar_desconexao(receive, desconectado))
+    loop = asyncio.get_running_loop()
+    inicio = ultimo_envio = loop.time()
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        # Desativa o buffer de proxies (ex.: nginx), os eventos devem chegar ao navegador assim que enviados
+        (b'x-accel-buffering', b'no'),
+    ]})
+
+    try:
+        # Intervalo de reconexão do navegador, em milissegundos
+        await _enviar(send, f'retry: {int(settings.PAINEL_EVENTOS_INTERVALO * 1000)}\n\n')
+
+        while not desconectado.is_set() and loop.time() - inicio < settings.PAINEL_EVENTOS_DURACAO:
+            try:
+                delta = await sync_to_async(executar_em_thread, thread_sensitive=False)(
+                    partial(delta_painel, cursor)
+                )
+            except CursorInvalido:
+                # Cursor alterado no navegador, o painel é enviado completo
+                cursor = None
+                continue
+
+            if delta is not None:
+                cursor = delta['cursor']
+                await _enviar(send, f"id: {cursor}\nevent: delta\ndata: {json.dumps(delta)}\n\n")
+                ultimo_envio = loop.time()
+            elif loop.time() - ultimo_envio >= settings.PAINEL_EVENTOS_HEARTBEAT:
+                await _enviar(send, ': heartbeat\n\n')
+                ultimo_envio = loop.time()
+
+            try:
+                await asyncio.wait_for(desconectado.wait(), timeout=settings.PAINEL_EVENTOS_INTERVALO)
+            except asyncio.TimeoutError:
+                pass
+
+        if not desconectado.is_set():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        tarefa_desconexao.cancel()
+
+
+def aplicacao_com_eventos(aplicacao):
+
+    # Envolve a aplicação ASGI do Django, atendendo somente as requisições GET de CAMINHO_EVENTOS
+    async def aplicacao_asgi(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == CAMINHO_EVENTOS and scope['method'] == 'GET':
+            return await eventos_painel(scope, receive, send)
+
+        return await aplicacao(scope, receive, send)
+
+    return aplicacao_asgi
@@ -0,0 +1,199 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+from .models import Produto, Movimentacao
+from .estoque import (registrar_movimentacoes_em_lote, estornar_movimentacoes_em_lote, obter_saldos_para_atualizacao,
+                      EstoqueInsuficiente)
+from .painel import invalidar_painel
+from . import versoes
+from .versoes import incrementar_versao
+
+# Exclusão lógica e restauração em lote de produtos e movimentações, a partir de ids selecionados ou de filtros.
+# Os registros do lote são gravados em um único UPDATE e os saldos, o resumo mensal e os saldos periódicos são
+# ajustados uma única vez por produto, mês e dia do lote (ver estoque.registrar_movimentacoes_em_lote), tudo na
+# mesma transação. Como o update() não dispara os sinais de gravação, o painel é invalidado diretamente.
+# A exclusão de um produto exclui também as suas movimentações com a mesma data de exclusão, assim a restauração
+# do produto restaura somente as movimentações excluídas junto com ele.
+# Os registros são lidos e gravados em lotes de TAMANHO_LOTE ids, assim uma exclusão por filtro que atinge muitas
+# movimentações não carrega todas em memória nem gera um UPDATE com todos os ids. Uma exclusão ou restauração que
+# não encontra nenhum registro não incrementa a versão dos dados.
+
+CAMPOS_LOTE = ('produto_id', 'tipo_movimentacao', 'quantidade', 'data_hora', 'deletado')
+TAMANHO_LOTE = 1000
+
+
+class NomeEmUso(Exception):
+    # Lançada quando a restauração deixaria dois produtos não deletados com o mesmo nome, o que viola o índice único
+    # produto_nome_unico_ativo. Nenhum produto é restaurado
+    def __init__(self, nomes):
+        self.nomes = nomes
+        super().__init__(
+            f"Os produtos {', '.join(nomes)} não podem ser restaurados pois o nome já está em uso por outro produto, "
+            f"renomeie ou exclua o outro produto antes de restaurá-los.")
+
+
+def _lotes_bloqueados(registros, *campos):
+
+    # Percorre os registros do queryset em lotes de TAMANHO_LOTE, em ordem de pk, bloqueando as linhas de cada lote
+    # até o fim da transação. Somente as colunas informadas são lidas
+    ultimo = 0
+    while True:
+        lote = list(
+            registros.filter(pk__gt=ultimo).select_for_update(of=('self',)).only(*campos).order_by('pk')[:TAMANHO_LOTE]
+        )
+        if lote:
+            yield lote
+        if len(lote) < TAMANHO_LOTE:
+            return
+        ultimo = lote[-1].pk
+
+
+def _validar_estoque(movimentacoes):
+
+    # A restauração de saidas não pode deixar o estoque de nenhum produto negativo. Os saldos dos produtos com saidas
+    # são bloqueados antes de somar as movimentações no banco, assim nenhuma outra saida é gravada durante a validação
+    produto_ids = set(movimentacoes.filter(tipo_movimentacao=False).values_list('produto_id', flat=True).distinct())
+    if not produto_ids:
+        return
+
+    saldos = obter_saldos_para_atualizacao(produto_ids)
+    variacoes = (
+        movimentacoes
+        .filter(produto_id__in=produto_ids)
+        .order_by()
+        .values('produto_id')
+        .annotate(
+            variacao=Sum(Case(When(tipo_movimentacao=True, then=F('quantidade')), default=-F('quantidade'))),
+            saidas=Sum(Case(When(tipo_movimentacao=False, then=F('quantidade')), default=0)),
+        )
+    )
+    for variacao in variacoes:
+        if saldos.get(variacao['produto_id'], 0) + variacao['variacao'] < 0:
+            raise EstoqueInsuficiente(variacao['produto_id'], variacao['saidas'])
+
+
+def excluir_movimentacoes(movimentacoes, deletado_em=None):
+
+    # Exclui as movimentações não deletadas do queryset e as remove dos saldos. Retorna a quantidade excluída
+    deletado_em = deletado_em or timezone.now()
+    total = 0
+    with transaction.atomic():
+        for lote in _lotes_bloqueados(movimentacoes.filter(deletado=False), *CAMPOS_LOTE):
+            # A versão é incrementada antes do ajuste dos saldos, que gravam a versão atual
+            if not total:
+                incrementar_versao(versoes.MOVIMENTACAO)
+
+            Movimentacao.todos.filter(pk__in=[movimentacao.pk for movimentacao in lote]).update(
+                deletado=True, deletado_em=deletado_em
+            )
+            estornar_movimentacoes_em_lote(lote)
+            total += len(lote)
+
+        if total:
+            invalidar_painel()
+
+    return total
+
+
+def _restaurar_movimentacoes(movimentacoes):
+    # Restaura as movimentações do queryset em lotes, deve ser executado dentro de uma transação
+    _validar_estoque(movimentacoes)
+
+    total = 0
+    for lote in _lotes_bloqueados(movimentacoes, *CAMPOS_LOTE):
+        if not total:
+            incrementar_versao(versoes.MOVIMENTACAO)
+
+        Movimentacao.todos.filter(pk__in=[movimentacao.pk for movimentacao in lote]).update(
+            deletado=False, deletado_em=None
+        )
+        for movimentacao in lote:
+            movimentacao.deletado = False
+        registrar_movimentacoes_em_lote(lote)
+        total += len(lote)
+
+    if total:
+        invalidar_painel()
+
+    return total
+
+
+def restaurar_movimentacoes(movimentacoes):
+
+    # Restaura as movimentações deletadas do queryset e as soma novamente aos saldos. As movimentações de produtos
+    # deletados só são restauradas junto com o produto (restaurar_produtos). Lança EstoqueInsuficiente caso
+    # a restauração deixe o estoque de algum produto negativo. Retorna a quantidade restaurada
+    with transaction.atomic():
+        return _restaurar_movimentacoes(movimentacoes.filter(deletado=True, produto__deletado=False))
+
+
+def excluir_produtos(produtos):
+
+    # Exclui os produtos não deletados do queryset e todas as suas movimentações.
+    # Retorna a quantidade de produtos e de movimentações excluídos
+    deletado_em = timezone.now()
+    total = movimentacoes = 0
+    with transaction.atomic():
+        for lote in _lotes_bloqueados(produtos.filter(deletado=False), 'pk'):
+            if not total:
+                incrementar_versao(versoes.PRODUTO)
+
+            ids = [produto.pk for produto in lote]
+            Produto.todos.filter(pk__in=ids).update(deletado=True, deletado_em=deletado_em)
+            movimentacoes += excluir_movimentacoes(Movimentacao.objects.filter(produto_id__in=ids), deletado_em)
+            total += len(ids)
+
+        if total:
+            invalidar_painel()
+
+    return total, movimentacoes
+
+
+def _validar_nomes(produtos):
+
+    # Os produtos restaurados não podem ter o nome (sem diferenciar maiúsculas e minúsculas) de um produto não
+    # deletado nem repetir o nome entre si
+    restaurados = produtos.annotate(nome_minusculo=Lower('nome'))
+    em_uso = set(
+        Produto.objects
+        .annotate(nome_minusculo=Lower('nome'))
+        .filter(nome_minusculo__in=restaurados.values('nome_minusculo'))
+        .values_list('nome_minusculo', flat=True)
+    )
+    repetidos = set(
+        restaurados.order_by().values('nome_minusculo').annotate(total=Count('pk')).filter(total__gt=1)
+        .values_list('nome_minusculo', flat=True)
+    )
+    if em_uso or repetidos:
+        nomes = restaurados.filter(nome_minusculo__in=em_uso | repetidos).order_by('nome', 'pk')
+        raise NomeEmUso(list(nomes.values_list('nome', flat=True)))
+
+
+def restaurar_produtos(produtos):
+
+    # Restaura os produtos deletados do queryset e as movimentações excluídas junto com eles. Lança NomeEmUso caso
+    # o nome de algum produto esteja em uso. Retorna a quantidade de produtos e de movimentações restaurados
+    total = movimentacoes = 0
+    with transaction.atomic():
+        produtos = produtos.filter(deletado=True)
+        _validar_nomes(produtos)
+
+        for lote in _lotes_bloqueados(produtos, 'pk'):
+            if not total:
+                incrementar_versao(versoes.PRODUTO)
+
+            # As movimentações excluídas junto com o produto (mesma data de exclusão) são restauradas antes do produto,
+            # enquanto a data de exclusão do produto ainda está gravada
+            ids = [produto.pk for produto in lote]
+            movimentacoes += _restaurar_movimentacoes(
+                Movimentacao.todos.filter(produto_id__in=ids, deletado=True, deletado_em=F('produto__deletado_em'))
+            )
+            Produto.todos.filter(pk__in=ids).update(deletado=False, deletado_em=None)
+            total += len(ids)
+
+        if total:
+            invalidar_painel()
+
+    return total, movimentacoes
@@ -0,0 +1,63 @@
+import csv
+from django.utils import timezone
+from .models import Movimentacao
+from .grid import filtrar_movimentacoes
+
+# Exportação do histórico completo de movimentações em CSV e XLSX.
+# As movimentações são lidas do banco em blocos (iterator), assim o consumo de memória não depende
+# da quantidade de linhas exportadas. As colunas seguem o formato aceito pela importação de CSV.
+
+CABECALHO = ['id', 'produto', 'tipo_movimentacao', 'quantidade', 'local', 'data_hora']
+TAMANHO_BLOCO = 2000
+
+
+def consultar_exportacao(parametros):
+    # Retorna as movimentações filtradas por produto, tipo, local e período, os parâmetros são validados
+    # antes do inicio da resposta, lançando ParametroInvalido
+    return (
+        filtrar_movimentacoes(Movimentacao.objects.all(), parametros)
+        .select_related('produto', 'local')
+        .only('pk', 'tipo_movimentacao', 'quantidade', 'data_hora', 'produto__nome', 'local__nome')
+        .order_by('data_hora', 'pk')
+    )
+
+
+def linhas_movimentacoes(movimentacoes):
+    # Gera o cabeçalho e uma linha por movimentação
+    yield CABECALHO
+    for movimentacao in movimentacoes.iterator(chunk_size=TAMANHO_BLOCO):
+        yield [
+            movimentacao.pk,
+            movimentacao.produto.nome,
+            'entrada' if movimentacao.tipo_movimentacao else 'saida',
+            movimentacao.quantidade,
+            movimentacao.local.nome,
+            timezone.localtime(movimentacao.data_hora).strftime('%d/%m/%Y %H:%M:%S'),
+        ]
+
+
+class _Eco:
+    # Objeto com a interface de arquivo que apenas devolve o texto escrito pelo csv.writer
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    # Converte cada linha em texto CSV conforme é gerada, o BOM permite que o Excel reconheça o UTF-8
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff'
+    for linha in linhas:
+        yield escritor.writerow(linha)
+
+
+def gerar_xlsx(linhas, destino):
+
+    # Grava as linhas em uma planilha no modo somente escrita do openpyxl, que não mantém as linhas em memória.
+    # O openpyxl é uma dependência opcional, utilizada apenas nesta exportação
+    from openpyxl import Workbook
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Movimentações')
+    for linha in linhas:
+        aba.append(linha)
+    planilha.save(destino)
@@ -1,8 +1,13 @@
 from django import forms
 from .models import Produto
 from .models import Movimentacao
+from .estoque import obter_saldo
+from .locais import obter_local, LocalInvalido
+from .importacao import TAMANHO_LOTE_PADRAO
 from django.forms import Select
-from django.db.models import Q, Sum
+from django.db.models import Q
+from django.urls import reverse
+from django.db.models.functions import Lower
 from bootstrap_datepicker_plus.widgets import DateTimePickerInput
 
 
@@ -16,9 +21,11 @@ class ProdutoForm(forms.ModelForm):
 
         nome = self.cleaned_data['nome']
 
-        # Verifica se o nome que está sendo cadastrado já existe no banco, caso exista verifica se não está deletado.
-        # Excluindo a si mesmo desta busca para que possa ser possivel utilizar o form corretamente na função de editar
-        if Produto.objects.filter(nome__iexact=nome, deletado=False).exclude(id=self.instance.id).exists():
+        # Verifica se o nome que está sendo cadastrado já existe entre os produtos não deletados (manager padrão).
+        # Excluindo a si mesmo desta busca para que possa ser possivel utilizar o form corretamente na função de editar.
+        # A comparação é feita com lower(nome) para utilizar o índice único produto_nome_unico_ativo
+        produtos = Produto.objects.annotate(nome_minusculo=Lower('nome'))
+        if produtos.filter(nome_minusculo=nome.lower()).exclude(id=self.instance.id).exists():
 
             raise forms.ValidationError("Este nome de produto já está em uso. Por favor, escolha outro nome.")
 
@@ -49,11 +56,45 @@ class ProdutoForm(forms.ModelForm):
         }
 
 
+class ProdutoAutocomplete(Select):
+
+    # Seleção de produto com busca pelo nome ou fabricante. Somente a opção do produto selecionado é renderizada,
+    # as demais são carregadas durante a digitação pela view api_autocomplete_produto
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = reverse('api_autocomplete_produto')
+
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        # value é a lista de valores selecionados, já convertidos para texto
+        selecionados = [valor for valor in value if valor.isdigit()]
+        produtos = Produto.todos.filter(pk__in=selecionados).values_list('pk', 'nome') if selecionados else []
+
+        return [
+            (None, [self.create_option(name, pk, nome, str(pk) in value, indice)], indice)
+            for indice, (pk, nome) in enumerate([('', '---------'), *produtos])
+        ]
+
+
 class MovimentacaoForm(forms.ModelForm):
+
+    # O local continua sendo digitado livremente e é convertido para o cadastro de locais em clean_local
+    local = forms.CharField(max_length=255, widget=forms.TextInput(attrs={'class': 'form-control'}))
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        produto_id = self.instance.produto.id if self.instance.pk else None
-        self.fields['produto'].queryset = Produto.objects.filter(Q(ativo=True) | Q(id=produto_id), deletado=False)
+        produto_id = self.instance.produto_id if self.instance.pk else None
+        self.fields['produto'].queryset = Produto.objects.filter(Q(ativo=True) | Q(id=produto_id))
+        if self.instance.pk:
+            self.initial['local'] = self.instance.local.nome
+
+    def clean_local(self):
+        # Variações de digitação de um local já cadastrado (acentos, maiúsculas e espaços) utilizam o mesmo local
+        try:
+            return obter_local(self.cleaned_data['local'])
+        except LocalInvalido as erro:
+            raise forms.ValidationError(str(erro))
 
     class Meta:
         tipos_movimentacao = (
@@ -63,9 +104,8 @@ class MovimentacaoForm(forms.ModelForm):
         model = Movimentacao
         fields = ['produto', 'quantidade', 'local', 'tipo_movimentacao', 'data_hora']
         widgets = {
-            'produto': Select(attrs={'class': 'form-control'}),
+            'produto': ProdutoAutocomplete(attrs={'class': 'form-control'}),
             'quantidade': forms.NumberInput(attrs={'class': 'form-control'}),
-            'local': forms.TextInput(attrs={'class': 'form-control'}),
             'tipo_movimentacao': forms.Select(choices=tipos_movimentacao, attrs={'class': 'form-control'}),
             'data_hora': forms.DateTimeInput(attrs={'class': 'form-control', 'id': 'data_hora'}),
 
@@ -79,24 +119,12 @@ class MovimentacaoForm(forms.ModelForm):
         produto_selecionado = self.cleaned_data['produto']
         # Fim
 
-        # Inicio - Obter totais ENTRADAS por produto
-        total_produto_entrada = Movimentacao.objects.filter(
-            tipo_movimentacao=True,
-            deletado=False,
-            produto=produto_selecionado
-        ).aggregate(total_entrada=Sum('quantidade')) or 0
+        # Inicio - Obter o saldo materializado do produto (entradas e saidas)
+        saldo = obter_saldo(produto_selecionado)
         # -------------------- Fim --------------------
 
-        # Inicio - Obter totais SAIDAS por produto
-        total_produto_saida = Movimentacao.objects.filter(
-            tipo_movimentacao=False,
-            deletado=False,
-            produto=produto_selecionado
-        ).aggregate(total_saida=Sum('quantidade')) or 0
-        # -------------------- Fim --------------------
-
-        total_entrada = total_produto_entrada['total_entrada'] or 0
-        total_saida = total_produto_saida['total_saida'] or 0
+        total_entrada = saldo.total_entradas
+        total_saida = saldo.total_saidas
         total_estoque_produto = total_entrada - total_saida or 0
         movimentacao_valida = (total_estoque_produto - quantidade_movimentada) >= 0
 
@@ -114,3 +142,22 @@ class MovimentacaoForm(forms.ModelForm):
                 f"deste produto para ser possivel efetuar a saida.")
 
         return quantidade_movimentada
+
+
+class ImportacaoMovimentacaoForm(forms.Form):
+
+    arquivo = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
+    tamanho_lote = forms.IntegerField(
+        min_value=1, max_value=50000, initial=TAMANHO_LOTE_PADRAO,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+
+
+class EstoqueEmForm(forms.Form):
+
+    # Consulta do estoque de um produto ao final de uma data passada
+    produto = forms.ModelChoiceField(
+        queryset=Produto.objects.order_by('nome'),
+        widget=Select(attrs={'class': 'form-control'})
+    )
+    data = forms.DateField(widget=forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'}))
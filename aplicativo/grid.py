@@ -0,0 +1,186 @@
+import base64
+import binascii
+import json
+from datetime import datetime, time
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Movimentacao
+
+# Paginação do grid de movimentações feita no banco por busca de chave (keyset), em vez de OFFSET.
+# Cada página continua a partir do último registro da página anterior, informado pelo cursor,
+# assim o custo de cada página não cresce conforme o histórico de movimentações aumenta.
+
+# Colunas que podem ser ordenadas, relacionando o nome recebido na requisição ao campo do banco
+COLUNAS_ORDENACAO = {
+    'id': 'pk',
+    'tipo': 'tipo_movimentacao',
+    'produto': 'produto__nome',
+    'quantidade': 'quantidade',
+    'local': 'local__nome',
+    'data_hora': 'data_hora',
+}
+
+# Parâmetros de filtro aplicados por filtrar_movimentacoes
+FILTROS = ('produto', 'tipo', 'local', 'data_inicio', 'data_fim')
+
+LIMITE_PADRAO = 25
+LIMITE_MAXIMO = 100
+
+
+class ParametroInvalido(ValueError):
+    # Lançada quando algum parâmetro de filtro, ordenação ou paginação recebido não é válido
+    pass
+
+
+def _codificar_cursor(valor, pk):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+
+    return base64.urlsafe_b64encode(json.dumps([valor, pk]).encode()).decode()
+
+
+# Tipo do valor de cada coluna de ordenação guardado no cursor (a data_hora é guardada no formato ISO)
+TIPOS_CURSOR = {
+    'pk': int,
+    'tipo_movimentacao': bool,
+    'produto__nome': str,
+    'quantidade': int,
+    'local__nome': str,
+    'data_hora': str,
+}
+
+
+def _valor_do_tipo(valor, tipo):
+    # bool é subclasse de int no python, por isso o tipo é comparado exatamente
+    return type(valor) is tipo
+
+
+def _decodificar_cursor(cursor, campo):
+    try:
+        valor, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise ParametroInvalido('Cursor inválido.')
+
+    # Os valores do cursor são utilizados diretamente nos filtros, um cursor alterado não pode chegar ao banco
+    if not _valor_do_tipo(pk, int) or not _valor_do_tipo(valor, TIPOS_CURSOR[campo]):
+        raise ParametroInvalido('Cursor inválido.')
+
+    if campo == 'data_hora':
+        try:
+            valor = parse_datetime(valor)
+        except ValueError:
+            valor = None
+        if valor is None:
+            raise ParametroInvalido('Cursor inválido.')
+
+    return valor, pk
+
+
+def _data_limite(valor, nome, hora):
+    # Converte a data recebida (AAAA-MM-DD) para o inicio ou o fim do dia no fuso horário do projeto
+    # parse_date retorna None para um formato diferente e lança ValueError para uma data inexistente (ex.: mês 13)
+    try:
+        data = parse_date(valor) if valor else None
+    except ValueError:
+        data = None
+    if valor and data is None:
+        raise ParametroInvalido(f'O parâmetro {nome} deve ser uma data válida no formato AAAA-MM-DD.')
+
+    return timezone.make_aware(datetime.combine(data, hora)) if data else None
+
+
+def filtrar_movimentacoes(movimentacoes, parametros):
+    # Aplica os filtros de produto, tipo, local e período recebidos na requisição, também utilizado nas exportações
+    produto = parametros.get('produto')
+    if produto:
+        # isdigit também aceita outros dígitos unicode (ex.: '²') que o int não converte
+        if not (produto.isascii() and produto.isdigit()):
+            raise ParametroInvalido('O parâmetro produto deve ser o código do produto.')
+        movimentacoes = movimentacoes.filter(produto_id=int(produto))
+
+    tipo = parametros.get('tipo')
+    if tipo:
+        if tipo not in ('entrada', 'saida'):
+            raise ParametroInvalido('O parâmetro tipo deve ser entrada ou saida.')
+        movimentacoes = movimentacoes.filter(tipo_movimentacao=(tipo == 'entrada'))
+
+    local = parametros.get('local')
+    if local:
+        movimentacoes = movimentacoes.filter(local__nome__istartswith=local)
+
+    data_inicio = _data_limite(parametros.get('data_inicio'), 'data_inicio', time.min)
+    if data_inicio:
+        movimentacoes = movimentacoes.filter(data_hora__gte=data_inicio)
+
+    data_fim = _data_limite(parametros.get('data_fim'), 'data_fim', time.max)
+    if data_fim:
+        movimentacoes = movimentacoes.filter(data_hora__lte=data_fim)
+
+    return movimentacoes
+
+
+def consultar_movimentacoes(parametros):
+
+    # Inicio - Leitura da ordenação e do tamanho da página
+    coluna = parametros.get('ordem', 'data_hora')
+    if coluna not in COLUNAS_ORDENACAO:
+        raise ParametroInvalido(f"O parâmetro ordem deve ser um dos valores: {', '.join(COLUNAS_ORDENACAO)}.")
+    campo = COLUNAS_ORDENACAO[coluna]
+
+    direcao = parametros.get('direcao', 'desc')
+    if direcao not in ('asc', 'desc'):
+        raise ParametroInvalido('O parâmetro direcao deve ser asc ou desc.')
+    descendente = direcao == 'desc'
+
+    try:
+        limite = min(max(int(parametros.get('limite', LIMITE_PADRAO)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        raise ParametroInvalido('O parâmetro limite deve ser um número.')
+    # Fim
+
+    movimentacoes = filtrar_movimentacoes(Movimentacao.objects.all(), parametros)
+
+    # O id é utilizado como critério de desempate para que a ordenação seja sempre única
+    prefixo = '-' if descendente else ''
+    movimentacoes = movimentacoes.order_by(f'{prefixo}{campo}', f'{prefixo}pk')
+
+    # Continua a partir do último registro da página anterior
+    cursor = parametros.get('cursor')
+    if cursor:
+        valor, pk = _decodificar_cursor(cursor, campo)
+        comparacao = 'lt' if descendente else 'gt'
+        if campo == 'pk':
+            movimentacoes = movimentacoes.filter(**{f'pk__{comparacao}': pk})
+        else:
+            movimentacoes = movimentacoes.filter(
+                Q(**{f'{campo}__{comparacao}': valor}) | Q(**{campo: valor, f'pk__{comparacao}': pk})
+            )
+
+    # Busca um registro a mais para saber se existe uma próxima página
+    registros = list(movimentacoes.values(
+        'pk', 'tipo_movimentacao', 'produto__nome', 'quantidade', 'local__nome', 'data_hora'
+    )[:limite + 1])
+    possui_proxima = len(registros) > limite
+    registros = registros[:limite]
+
+    proximo_cursor = None
+    if possui_proxima:
+        ultimo = registros[-1]
+        proximo_cursor = _codificar_cursor(ultimo[campo], ultimo['pk'])
+
+    resultados = []
+    for registro in registros:
+        data_hora = timezone.localtime(registro['data_hora'])
+        resultados.append({
+            'id': registro['pk'],
+            'id_busca_grid': f"#{registro['pk']}",
+            'tipo_movimentacao': registro['tipo_movimentacao'],
+            'produto': registro['produto__nome'],
+            'quantidade': registro['quantidade'],
+            'local': registro['local__nome'],
+            'data': data_hora.strftime('%d/%m/%Y'),
+            'hora': data_hora.strftime('%H:%M'),
+        })
+
+    return {'resultados': resultados, 'proximo_cursor': proximo_cursor}
@@ -0,0 +1,226 @@
+import csv
+import time
+from itertools import islice
+from django import forms
+from django.db import transaction
+from django.db.models.functions import Lower
+from .models import Produto, Movimentacao
+from .estoque import obter_saldos_para_atualizacao, registrar_movimentacoes_em_lote
+from . import versoes
+from .versoes import incrementar_versao
+from .painel import invalidar_painel
+from .locais import resolver_locais, normalizar_local
+
+# Importação em massa de movimentações a partir de um arquivo CSV.
+# O arquivo é lido em lotes, cada lote resolve os produtos em uma única consulta, valida o estoque em memória
+# na ordem cronológica das movimentações e grava tudo com bulk_create dentro de uma transação.
+#
+# Colunas esperadas no cabeçalho do CSV:
+#   produto            nome do produto (sem diferenciar maiúsculas e minúsculas)
+#   tipo_movimentacao  entrada ou saida
+#   quantidade         número inteiro maior que zero
+#   local              local da movimentação, cadastrado automaticamente caso ainda não exista
+#   data_hora          data e hora, ex.: 31/12/2023 14:30 ou 2023-12-31 14:30
+
+COLUNAS = ('produto', 'tipo_movimentacao', 'quantidade', 'local', 'data_hora')
+TAMANHO_LOTE_PADRAO = 5000
+
+_campo_data_hora = forms.DateTimeField()
+
+
+class ArquivoInvalido(ValueError):
+    # Lançada quando o cabeçalho do arquivo não possui as colunas esperadas
+    pass
+
+
+class ResultadoImportacao:
+
+    def __init__(self):
+        self.total = 0
+        self.importadas = 0
+        self.rejeitadas = []
+        self.duracao = 0.0
+        self.interrompida = None
+
+    def rejeitar(self, numero_linha, motivo):
+        self.rejeitadas.append((numero_linha, motivo))
+
+    def interromper(self, numero_linha, motivo):
+        # Erro de leitura do arquivo, as linhas a partir de numero_linha não foram lidas
+        self.interrompida = (numero_linha, motivo)
+
+    @property
+    def linhas_por_segundo(self):
+        return self.total / self.duracao if self.duracao else 0.0
+
+    def resumo(self):
+        resumo = (f'{self.importadas} de {self.total} movimentações importadas, {len(self.rejeitadas)} rejeitadas, '
+                  f'em {self.duracao:.2f}s ({self.linhas_por_segundo:.0f} linhas/s).')
+        if self.interrompida:
+            numero_linha, motivo = self.interrompida
+            resumo += (f' Importação interrompida na linha {numero_linha}: {motivo} As linhas anteriores foram '
+                       f'importadas, as linhas a partir dela não foram importadas.')
+
+        return resumo
+
+
+def _converter_linha(linha):
+
+    # Converte uma linha do CSV nos valores da movimentação, lançando ValueError com o motivo da rejeição
+    tipo = (linha.get('tipo_movimentacao') or '').strip().lower()
+    if tipo not in ('entrada', 'saida', 'saída'):
+        raise ValueError('tipo_movimentacao deve ser entrada ou saida.')
+
+    try:
+        quantidade = int(linha.get('quantidade') or '')
+    except ValueError:
+        raise ValueError('quantidade deve ser um número inteiro.')
+    if quantidade <= 0:
+        raise ValueError('A quantidade deve ser maior que zero.')
+
+    local = (linha.get('local') or '').strip()
+    if not normalizar_local(local) or len(local) > 255:
+        raise ValueError('local deve ser informado com até 255 caracteres.')
+
+    try:
+        data_hora = _campo_data_hora.clean((linha.get('data_hora') or '').strip())
+    except forms.ValidationError:
+        raise ValueError('data_hora inválida.')
+
+    return {
+        'tipo_movimentacao': tipo == 'entrada',
+        'quantidade': quantidade,
+        'local': local,
+        'data_hora': data_hora,
+    }
+
+
+def _resolver_produtos(nomes):
+    # Busca todos os produtos ativos do lote em uma única consulta, indexados pelo nome em minúsculas
+    produtos = (
+        Produto.objects
+        .filter(ativo=True)
+        .annotate(nome_minusculo=Lower('nome'))
+        .filter(nome_minusculo__in=nomes)
+        .values_list('nome_minusculo', 'pk')
+    )
+
+    return dict(produtos)
+
+
+def _importar_lote(lote, resultado):
+
+    # Inicio - Conversão das linhas
+    validas = []
+    for numero_linha, linha in lote:
+        try:
+            valores = _converter_linha(linha)
+        except ValueError as erro:
+            resultado.rejeitar(numero_linha, str(erro))
+            continue
+        valores['nome_produto'] = (linha.get('produto') or '').strip().lower()
+        validas.append((numero_linha, valores))
+    # Fim
+
+    with transaction.atomic():
+
+        # Os locais novos são cadastrados na transação do lote, desfeitos junto com ele em caso de erro
+        produtos = _resolver_produtos({valores['nome_produto'] for _, valores in validas})
+        locais = resolver_locais({valores['local'] for _, valores in validas})
+        for _, valores in validas:
+            valores['local_id'] = locais[valores.pop('local')]
+
+        # Bloqueia os saldos dos produtos do lote e valida as saidas em memória na ordem cronológica
+        saldos = obter_saldos_para_atualizacao(set(produtos.values()))
+
+        movimentacoes = []
+        for numero_linha, valores in sorted(validas, key=lambda item: item[1]['data_hora']):
+            produto_id = produtos.get(valores.pop('nome_produto'))
+            if produto_id is None:
+                resultado.rejeitar(numero_linha, 'Produto não encontrado ou desativado.')
+                continue
+
+            estoque = saldos.get(produto_id, 0)
+            if valores['tipo_movimentacao']:
+                saldos[produto_id] = estoque + valores['quantidade']
+            elif estoque >= valores['quantidade']:
+                saldos[produto_id] = estoque - valores['quantidade']
+            else:
+                resultado.rejeitar(numero_linha,
+                                   f'Estoque insuficiente, existem {estoque} itens do produto em estoque.')
+                continue
+
+            movimentacoes.append(Movimentacao(produto_id=produto_id, **valores))
+
+        if movimentacoes:
+            incrementar_versao(versoes.MOVIMENTACAO)
+            Movimentacao.objects.bulk_create(movimentacoes, batch_size=1000)
+            registrar_movimentacoes_em_lote(movimentacoes)
+            # O bulk_create não dispara os sinais de gravação, o painel é invalidado diretamente
+            invalidar_painel()
+
+    resultado.importadas += len(movimentacoes)
+
+
+def importar_movimentacoes(arquivo, tamanho_lote=TAMANHO_LOTE_PADRAO):
+
+    # Lê o arquivo (texto) em lotes de tamanho_lote linhas, sem carregar o arquivo inteiro em memória.
+    # Cada lote é gravado em sua própria transação, um lote com erro não desfaz os lotes anteriores
+    resultado = ResultadoImportacao()
+    inicio = time.perf_counter()
+
+    try:
+        leitor = csv.DictReader(arquivo, delimiter=_detectar_delimitador(arquivo))
+        colunas = leitor.fieldnames
+    except (UnicodeDecodeError, csv.Error) as erro:
+        raise ArquivoInvalido(_motivo_erro_leitura(erro))
+    colunas_faltantes = set(COLUNAS) - set(colunas or [])
+    if colunas_faltantes:
+        raise ArquivoInvalido(f"Colunas ausentes no arquivo: {', '.join(sorted(colunas_faltantes))}.")
+
+    linhas = _ler_linhas(leitor, resultado)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        resultado.total += len(lote)
+        _importar_lote(lote, resultado)
+
+    resultado.duracao = time.perf_counter() - inicio
+    resultado.rejeitadas.sort()
+
+    return resultado
+
+
+def _ler_linhas(leitor, resultado):
+
+    # Numera as linhas do arquivo, a primeira linha de dados é a linha 2, a linha 1 é o cabeçalho.
+    # Um erro de leitura no meio do arquivo encerra a leitura, as linhas já lidas são importadas normalmente e o
+    # resultado informa a linha e o motivo da interrupção
+    numero_linha = 2
+    while True:
+        try:
+            linha = next(leitor)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as erro:
+            resultado.interromper(numero_linha, _motivo_erro_leitura(erro))
+            return
+
+        yield numero_linha, linha
+        numero_linha += 1
+
+
+def _motivo_erro_leitura(erro):
+    if isinstance(erro, UnicodeDecodeError):
+        return f'O arquivo não está codificado em {erro.encoding.upper()} ({erro.reason}).'
+
+    return f'Formato CSV inválido ({erro}).'
+
+
+def _detectar_delimitador(arquivo):
+    # Aceita arquivos separados por vírgula ou ponto e vírgula (padrão do Excel em português)
+    cabecalho = arquivo.readline()
+    arquivo.seek(0)
+
+    return ';' if cabecalho.count(';') > cabecalho.count(',') else ','
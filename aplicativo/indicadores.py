@@ -0,0 +1,102 @@
+from django.db.models import Q, Sum
+from .models import EstoqueProduto, Movimentacao, Produto, Local
+from .estoque import obter_resumo_mensal
+
+# Consultas de indicadores compartilhadas pela página inicial, pela página de estoque e pelo relatório mensal.
+# Os totais são lidos dos saldos materializados (EstoqueProduto e MovimentacaoMensal), que são agregados das
+# movimentações com Sum e Count condicionais (ver estoque.recalcular_saldos), assim cada formato de indicador
+# (por produto e por mês) é obtido em uma única consulta.
+
+
+def saldos_por_produto():
+    # Entradas, saidas, estoque e contagens de cada produto que já foi movimentado, em uma única consulta
+    return list(
+        EstoqueProduto.objects
+        .filter(Q(total_entradas__gt=0) | Q(total_saidas__gt=0))
+        .values('produto__pk', 'produto__nome', 'produto__ativo', 'total_entradas', 'total_saidas', 'estoque',
+                'contagem_entradas', 'contagem_saidas')
+    )
+
+
+def resumo_mensal():
+    # Entradas e saidas de cada mês com movimentações, em ordem cronológica e com o mês formatado (mm/aaaa)
+    return [
+        {'mes_ano': resumo.mes.strftime('%m/%Y'), 'total_entradas': resumo.total_entradas,
+         'total_saidas': resumo.total_saidas}
+        for resumo in obter_resumo_mensal()
+    ]
+
+
+def indicadores_painel(saldos, meses):
+
+    # Monta os dados da página inicial a partir do resultado de saldos_por_produto e resumo_mensal.
+    # Os totais gerais são a soma dos saldos por produto, sem uma consulta adicional
+    total_entradas = sum(saldo['total_entradas'] for saldo in saldos)
+    total_saidas = sum(saldo['total_saidas'] for saldo in saldos)
+
+    return {
+        'categorias_mes_ano': [mes['mes_ano'] for mes in meses],
+        'entradas_mes_ano': [mes['total_entradas'] for mes in meses],
+        'saidas_mes_ano': [mes['total_saidas'] for mes in meses],
+        'total_entradas': total_entradas,
+        'total_saidas': total_saidas,
+        'total_estoque': total_entradas - total_saidas,
+        # Dados dos gráficos de pizza, contendo somente os produtos com entradas ou saidas
+        'entradas_por_produto': [
+            {'produto__pk': saldo['produto__pk'], 'produto__nome': saldo['produto__nome'],
+             'total_quantidade': saldo['total_entradas']}
+            for saldo in saldos if saldo['total_entradas'] > 0
+        ],
+        'saidas_por_produto': [
+            {'produto__pk': saldo['produto__pk'], 'produto__nome': saldo['produto__nome'],
+             'total_quantidade': saldo['total_saidas']}
+            for saldo in saldos if saldo['total_saidas'] > 0
+        ],
+        'contagem_entradas': sum(saldo['contagem_entradas'] for saldo in saldos),
+        'contagem_saidas': sum(saldo['contagem_saidas'] for saldo in saldos),
+    }
+
+
+def linhas_relatorio_mensal(meses):
+    # Linhas do relatório mensal em PDF (mês/ano, entradas, saidas)
+    return [[mes['mes_ano'], mes['total_entradas'], mes['total_saidas']] for mes in meses]
+
+
+def saldos_por_local(local_id=None):
+
+    # Entradas, saidas e estoque de cada produto em cada local. O agrupamento é feito somente pelos ids (inteiros)
+    # do local e do produto, os nomes são buscados depois em duas consultas pelos ids encontrados.
+    # As movimentações de produtos deletados continuam no estoque, por isso os produtos são buscados pelo manager todos
+    totais = (
+        Movimentacao.objects
+        .values('local_id', 'produto_id')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+        )
+        .order_by()
+    )
+    if local_id is not None:
+        totais = totais.filter(local_id=local_id)
+    totais = list(totais)
+
+    locais = dict(Local.objects.filter(pk__in={total['local_id'] for total in totais}).values_list('pk', 'nome'))
+    produtos = dict(
+        Produto.todos.filter(pk__in={total['produto_id'] for total in totais}).values_list('pk', 'nome')
+    )
+
+    saldos = []
+    for total in totais:
+        total_entradas = total['total_entradas'] or 0
+        total_saidas = total['total_saidas'] or 0
+        saldos.append({
+            'local_id': total['local_id'],
+            'local': locais[total['local_id']],
+            'produto_id': total['produto_id'],
+            'produto': produtos[total['produto_id']],
+            'total_entradas': total_entradas,
+            'total_saidas': total_saidas,
+            'estoque': total_entradas - total_saidas,
+        })
+
+    return sorted(saldos, key=lambda saldo: (saldo['local'], saldo['produto']))
@@ -0,0 +1,74 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.utils.autoreload import file_changed
+
+# Layout comum das páginas (templates/base.html). O cabeçalho e o menu lateral não dependem dos dados e são
+# renderizados uma vez por processo, em fragmentos do cache 'layout' (LocMemCache) que só expiram quando o processo
+# é reiniciado. O menu lateral possui um fragmento para cada item destacado (seção e página) do menu.
+
+# Seção aberta e página destacada no menu lateral, pelo nome da URL em config/urls.py
+MENU_LATERAL = {
+    'index': ('inicio', 'index'),
+    'produto': ('produtos', 'produto'),
+    'edit_produto': ('produtos', 'produto'),
+    'create_produto': ('produtos', 'create_produto'),
+    'stock_produto': ('produtos', 'stock_produto'),
+    'stock_produto_em': ('produtos', 'stock_produto'),
+    'stock_local': ('produtos', 'stock_produto'),
+    'movimentacao': ('movimentacoes', 'movimentacao'),
+    'edit_movimentacao': ('movimentacoes', 'movimentacao'),
+    'create_movimentacao': ('movimentacoes', 'create_movimentacao'),
+    'import_movimentacao': ('movimentacoes', None),
+}
+
+
+def contexto_layout(request):
+    # Context processor com as variáveis do layout, utilizadas também como chave dos fragmentos em cache
+    nome_url = request.resolver_match.url_name if request.resolver_match else None
+    menu_secao, menu_pagina = MENU_LATERAL.get(nome_url, (None, None))
+
+    return {
+        'menu_secao': menu_secao,
+        'menu_pagina': menu_pagina,
+        'layout_cache_timeout': settings.LAYOUT_CACHE_TIMEOUT,
+    }
+
+
+@lru_cache(maxsize=None)
+def identificador_implantacao():
+
+    # Identifica a versão implantada dos templates e dos arquivos estáticos, utilizado no ETag das páginas de listagem
+    # para que uma página guardada pelo navegador não seja reutilizada após uma implantação que altere o html ou os
+    # nomes dos arquivos estáticos. Com VERSAO_IMPLANTACAO informado ele é utilizado, caso contrário é calculado uma
+    # vez por processo a partir do conteúdo dos templates e do manifesto dos arquivos estáticos (nomes com hash)
+    if settings.VERSAO_IMPLANTACAO:
+        return settings.VERSAO_IMPLANTACAO
+
+    resumo = hashlib.sha256()
+    diretorios = [*engines['django'].engine.dirs, *get_app_template_dirs('templates')]
+    for diretorio in diretorios:
+        for template in sorted(Path(diretorio).rglob('*.html')):
+            resumo.update(str(template.relative_to(diretorio)).encode())
+            resumo.update(template.read_bytes())
+
+    ler_manifesto = getattr(staticfiles_storage, 'read_manifest', None)
+    manifesto = ler_manifesto() if ler_manifesto else None
+    resumo.update((manifesto or '').encode())
+
+    return resumo.hexdigest()[:12]
+
+
+@receiver(file_changed)
+def limpar_fragmentos_layout(sender, file_path, **kwargs):
+    # No servidor de desenvolvimento (runserver) os templates alterados são recarregados sem reiniciar o processo,
+    # os fragmentos do layout e o identificador da implantação são descartados para que as alterações apareçam
+    if Path(file_path).suffix == '.html':
+        caches['layout'].clear()
+        identificador_implantacao.cache_clear()
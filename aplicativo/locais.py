@@ -0,0 +1,56 @@
+import unicodedata
+from .models import Local
+
+# Normalização dos locais das movimentações, cada local é cadastrado uma única vez e referenciado pelo id.
+
+
+class LocalInvalido(ValueError):
+    # Lançada quando o nome do local não resulta em uma chave (ex.: somente acentos ou espaços)
+    pass
+
+
+def normalizar_local(nome):
+
+    # Remove acentos, espaços repetidos e a diferença entre maiúsculas e minúsculas, "Depósito  central" e
+    # "deposito Central" resultam na mesma chave. Somente as marcas combinantes (acentos) são removidas,
+    # os demais caracteres de qualquer alfabeto (ex.: cirílico, chinês) são mantidos
+    decomposto = unicodedata.normalize('NFKD', nome)
+    sem_acentos = unicodedata.normalize('NFC', ''.join(c for c in decomposto if not unicodedata.combining(c)))
+
+    return ' '.join(sem_acentos.split()).casefold()
+
+
+def _chave(nome):
+    chave = normalizar_local(nome)
+    if not chave:
+        raise LocalInvalido('O local deve conter ao menos uma letra, número ou símbolo.')
+
+    return chave
+
+
+def obter_local(nome):
+    # Retorna o local com o nome informado, cadastrando-o caso ainda não exista. Lança LocalInvalido caso o nome
+    # não resulte em uma chave
+    nome = ' '.join(nome.split())
+    local, _ = Local.objects.get_or_create(chave=_chave(nome), defaults={'nome': nome})
+
+    return local
+
+
+def resolver_locais(nomes):
+
+    # Retorna o id de cada nome de local, indexado pelo nome recebido, cadastrando de uma só vez os locais que
+    # ainda não existem. Utilizado pela importação em lote
+    chaves = {nome: _chave(nome) for nome in nomes}
+    existentes = dict(Local.objects.filter(chave__in=set(chaves.values())).values_list('chave', 'pk'))
+
+    novos = {}
+    for nome, chave in chaves.items():
+        if chave not in existentes:
+            novos.setdefault(chave, Local(nome=' '.join(nome.split()), chave=chave))
+    if novos:
+        # ignore_conflicts evita o erro caso outra transação tenha cadastrado o mesmo local no mesmo instante
+        Local.objects.bulk_create(novos.values(), ignore_conflicts=True)
+        existentes.update(Local.objects.filter(chave__in=novos).values_list('chave', 'pk'))
+
+    return {nome: existentes[chave] for nome, chave in chaves.items()}
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from aplicativo.arquivamento import arquivar_deletados, desarquivar_produtos, desarquivar_movimentacoes, TAMANHO_LOTE
+
+
+class Command(BaseCommand):
+    help = ('Move os produtos e movimentações deletados há mais de --dias dias para as tabelas de arquivo '
+            '(ProdutoArquivado e MovimentacaoArquivada), em lotes de --lote registros. Produtos com saldo de '
+            'abertura (partições desanexadas) não são arquivados. Com --desarquivar-produtos ou '
+            '--desarquivar-movimentacoes devolve os registros arquivados informados às tabelas principais.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90,
+                            help='Somente os registros deletados há mais dias que o informado são arquivados.')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de registros movidos em cada transação.')
+        parser.add_argument('--desarquivar-produtos', type=int, nargs='+', default=[],
+                            help='Ids dos produtos arquivados a serem devolvidos à tabela de produtos.')
+        parser.add_argument('--desarquivar-movimentacoes', type=int, nargs='+', default=[],
+                            help='Ids das movimentações arquivadas a serem devolvidas à tabela de movimentações.')
+
+    def handle(self, *args, **options):
+        if options['desarquivar_produtos'] or options['desarquivar_movimentacoes']:
+            movimentacoes = desarquivar_movimentacoes(options['desarquivar_movimentacoes'])
+            produtos = desarquivar_produtos(options['desarquivar_produtos'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{movimentacoes} movimentações e {produtos} produtos desarquivados com sucesso.'
+            ))
+            return
+
+        limite = timezone.now() - timedelta(days=options['dias'])
+        arquivados = arquivar_deletados(limite, tamanho_lote=options['lote'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{arquivados['movimentacoes']} movimentações e {arquivados['produtos']} produtos deletados antes de "
+            f"{timezone.localtime(limite):%d/%m/%Y %H:%M} arquivados com sucesso."
+        ))
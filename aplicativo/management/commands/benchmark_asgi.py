@@ -0,0 +1,74 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, AsyncClient
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = ('Compara a latência da página inicial servida pelo WSGI (view index, consultas em sequência) e pelo '
+            'ASGI (view index_assincrono, consultas concorrentes) sob requisições simultâneas. O cache do painel '
+            'é desativado durante a medição. Utiliza os dados do banco configurado, que não é alterado; '
+            'para volumes maiores gere os dados com o comando gerar_dados_sinteticos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 8, 32],
+                            help='Quantidades de requisições simultâneas a serem medidas.')
+        parser.add_argument('--requisicoes', type=int, default=200,
+                            help='Total de requisições executadas em cada medição.')
+
+    def _medir_wsgi(self, concorrencia, requisicoes):
+
+        # Cada thread simula um worker WSGI com o seu próprio cliente e conexão com o banco
+        def requisitar(_):
+            inicio = time.perf_counter()
+            response = Client().get(reverse('index'))
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            return list(executor.map(requisitar, range(requisicoes)))
+
+    def _medir_asgi(self, concorrencia, requisicoes):
+
+        # As requisições são executadas em um único event loop, no máximo concorrencia ao mesmo tempo
+        async def executar():
+            limite = asyncio.Semaphore(concorrencia)
+            client = AsyncClient()
+
+            async def requisitar():
+                async with limite:
+                    inicio = time.perf_counter()
+                    response = await client.get(reverse('index_assincrono'))
+                    assert response.status_code == 200, response.status_code
+                    return time.perf_counter() - inicio
+
+            return await asyncio.gather(*(requisitar() for _ in range(requisicoes)))
+
+        return asyncio.run(executar())
+
+    def _exibir(self, servidor, concorrencia, tempos, duracao):
+        ordenados = sorted(tempos)
+        self.stdout.write(
+            f'{servidor} com {concorrencia} simultâneas: p50 {statistics.median(ordenados) * 1000:.1f}ms, '
+            f'p95 {ordenados[min(int(len(ordenados) * 0.95), len(ordenados) - 1)] * 1000:.1f}ms, '
+            f'{len(tempos) / duracao:.0f} requisições/s'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            # Sem cache todas as requisições calculam o painel, medindo o custo das consultas
+            caches = {**settings.CACHES, 'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            with override_settings(CACHES=caches, DEBUG=False):
+                for concorrencia in options['concorrencia']:
+                    for servidor, medir in (('WSGI', self._medir_wsgi), ('ASGI', self._medir_asgi)):
+                        inicio = time.perf_counter()
+                        tempos = medir(concorrencia, options['requisicoes'])
+                        self._exibir(servidor, concorrencia, tempos, time.perf_counter() - inicio)
+        finally:
+            teardown_test_environment()
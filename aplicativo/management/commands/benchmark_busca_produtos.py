@@ -0,0 +1,70 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from aplicativo.busca import buscar_produtos, autocompletar_produtos, PRODUTOS_POR_PAGINA
+from aplicativo.dados_sinteticos import gerar_produtos
+from aplicativo.monitoramento import RegistroConsultas
+
+
+class Command(BaseCommand):
+    help = ('Mede o tempo da busca de produtos da listagem (primeira página e contagem, como na view index_produto) '
+            'e do autocomplete com a quantidade informada de produtos sintéticos. Os produtos são gerados em um '
+            'banco de testes criado e removido pelo próprio comando, o banco configurado não é alterado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=100000, help='Quantidade de produtos sintéticos.')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Quantidade de execuções de cada busca.')
+        parser.add_argument('--termos', nargs='+',
+                            default=['Sintético 00012', 'acme', 'embalagem stark', 'produto inexistente', ''],
+                            help='Termos pesquisados, o termo vazio corresponde à listagem sem busca.')
+
+    def _medir(self, executar, repeticoes):
+        # A primeira execução aquece os caches do banco e não é considerada
+        executar()
+
+        tempos = []
+        for _ in range(repeticoes):
+            with RegistroConsultas() as registro:
+                inicio = time.perf_counter()
+                executar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+        ordenados = sorted(tempos)
+        return ordenados, registro.quantidade
+
+    def _exibir(self, alvo, termo, tempos, consultas):
+        self.stdout.write(
+            f"  {alvo} '{termo}': p50 {statistics.median(tempos):.1f}ms, "
+            f"p95 {tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)]:.1f}ms, {consultas} consultas"
+        )
+
+    def _executar(self, options):
+        inicio = time.perf_counter()
+        gerar_produtos(options['produtos'])
+        with connection.cursor() as cursor:
+            # Atualiza as estatísticas do banco para que o plano das consultas considere o volume gerado
+            cursor.execute('ANALYZE')
+        self.stdout.write(f"{options['produtos']} produtos gerados em {time.perf_counter() - inicio:.1f}s")
+
+        for termo in options['termos']:
+            def listagem():
+                pagina = Paginator(buscar_produtos(termo), PRODUTOS_POR_PAGINA).get_page(1)
+                list(pagina)
+
+            self._exibir('listagem', termo, *self._medir(listagem, options['repeticoes']))
+            self._exibir('autocomplete', termo,
+                         *self._medir(lambda: autocompletar_produtos(termo), options['repeticoes']))
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nome_banco = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            self._executar(options)
+        finally:
+            connection.creation.destroy_test_db(nome_banco, verbosity=0)
+            teardown_test_environment()
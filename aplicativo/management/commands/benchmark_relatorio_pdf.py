@@ -0,0 +1,36 @@
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from aplicativo.relatorios import gerar_relatorio_mensal
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de geração do relatório mensal em PDF para diferentes quantidades de linhas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, nargs='+', default=[10, 1000, 100000],
+                            help='Quantidades de linhas do relatório a serem medidas.')
+        parser.add_argument('--repeticoes', type=int, default=3,
+                            help='Quantidade de execuções de cada medição, é exibido o melhor tempo.')
+
+    def handle(self, *args, **options):
+        for quantidade in options['linhas']:
+
+            # Gera linhas sintéticas alternando meses com e sem entradas e saidas
+            linhas = [
+                [f'{(i % 12) + 1:02d}/{2000 + i // 12}', (i * 7) % 5 and i * 3, (i * 11) % 4 and i * 2]
+                for i in range(quantidade)
+            ]
+
+            tempos = []
+            for _ in range(options['repeticoes']):
+                with tempfile.TemporaryFile() as arquivo:
+                    inicio = time.perf_counter()
+                    gerar_relatorio_mensal(linhas, arquivo)
+                    tempos.append(time.perf_counter() - inicio)
+                    tamanho = arquivo.tell()
+
+            self.stdout.write(
+                f'{quantidade} linhas: melhor {min(tempos) * 1000:.1f}ms, '
+                f'média {sum(tempos) / len(tempos) * 1000:.1f}ms, {tamanho / 1024:.0f}KB'
+            )
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import setup_test_environment, teardown_test_environment
+from aplicativo.estoque import registrar_movimentacao, EstoqueInsuficiente
+from aplicativo.locais import obter_local
+from aplicativo.models import Produto, Movimentacao, EstoqueProduto
+
+
+class Command(BaseCommand):
+    help = ('Mede a vazão de saidas simultâneas do mesmo produto (reserva com UPDATE condicional, ver '
+            'estoque.reservar_saida) com diferentes quantidades de escritores e confirma que o estoque não fica '
+            'negativo. As saidas são gravadas em um banco de testes criado e removido pelo próprio comando, o banco '
+            'configurado não é alterado. Requer um banco que permita várias conexões ao banco de testes '
+            '(PostgreSQL).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, nargs='+', default=[1, 8, 32],
+                            help='Quantidades de escritores simultâneos a serem medidas.')
+        parser.add_argument('--estoque', type=int, default=200, help='Estoque inicial do produto.')
+        parser.add_argument('--saidas', type=int, default=400,
+                            help='Total de saidas tentadas, maior que o estoque para que os escritores disputem as '
+                                 'últimas unidades.')
+
+    def _preparar(self, medicao, estoque):
+        # Cada medição utiliza um produto novo, com o estoque inicial informado
+        produto = Produto.objects.create(
+            nome=f'Produto Benchmark {medicao}', fabricante='Fabricante', tipo='Tipo', ativo=True
+        )
+        local = obter_local('Estoque')
+        with transaction.atomic():
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=produto, quantidade=estoque, local=local, tipo_movimentacao=True
+            ))
+
+        return produto, local
+
+    def _efetuar_saidas(self, produto, local, tentativas):
+
+        # Mesmo caminho de gravação utilizado pela view create_movimentacao, cada thread com a sua conexão
+        aceitas = 0
+        try:
+            for _ in range(tentativas):
+                try:
+                    with transaction.atomic():
+                        registrar_movimentacao(Movimentacao.objects.create(
+                            produto=produto, quantidade=1, local=local, tipo_movimentacao=False
+                        ))
+                except EstoqueInsuficiente:
+                    continue
+                aceitas += 1
+        finally:
+            connection.close()
+
+        return aceitas
+
+    def _medir(self, medicao, escritores, options):
+        produto, local = self._preparar(medicao, options['estoque'])
+        tentativas = max(options['saidas'] // escritores, 1)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=escritores) as executor:
+            aceitas = sum(executor.map(lambda _: self._efetuar_saidas(produto, local, tentativas), range(escritores)))
+        duracao = time.perf_counter() - inicio
+
+        saldo = EstoqueProduto.objects.get(produto=produto)
+        total_saidas = Movimentacao.objects.filter(produto=produto, tipo_movimentacao=False).aggregate(
+            total=Sum('quantidade')
+        )['total'] or 0
+        if saldo.estoque < 0 or total_saidas != aceitas or aceitas != min(options['estoque'], escritores * tentativas):
+            raise CommandError(f'{escritores} escritores: {aceitas} saidas aceitas, {total_saidas} gravadas e '
+                               f'estoque final {saldo.estoque}.')
+
+        self.stdout.write(f'{escritores} escritores: {escritores * tentativas} saidas em {duracao:.3f}s '
+                          f'({escritores * tentativas / duracao:.0f} saidas/s), {aceitas} aceitas, '
+                          f'estoque final {saldo.estoque}')
+
+    def handle(self, *args, **options):
+        if not connection.features.test_db_allows_multiple_connections:
+            raise CommandError('O banco configurado não permite várias conexões ao banco de testes.')
+
+        setup_test_environment()
+        nome_banco = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            for medicao, escritores in enumerate(options['escritores']):
+                self._medir(medicao, escritores, options)
+        finally:
+            connection.creation.destroy_test_db(nome_banco, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,113 @@
+import copy
+import statistics
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import reverse
+from aplicativo.dados_sinteticos import gerar_dados
+from aplicativo.models import Produto, Movimentacao
+
+# Páginas medidas, pelo nome da URL em config/urls.py. As páginas de edição utilizam o primeiro registro gerado
+PAGINAS = (
+    'index', 'produto', 'create_produto', 'edit_produto', 'stock_produto', 'stock_produto_em', 'stock_local',
+    'movimentacao', 'create_movimentacao', 'edit_movimentacao', 'import_movimentacao',
+)
+
+
+def _templates_sem_cache():
+    # Configuração dos templates sem o loader em cache, cada renderização lê e compila os templates novamente
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for engine in templates:
+        loaders = engine.get('OPTIONS', {}).get('loaders')
+        if loaders:
+            engine['OPTIONS']['loaders'] = [
+                loader for item in loaders
+                for loader in (item[1] if item[0] == 'django.template.loaders.cached.Loader' else [item])
+            ]
+        else:
+            engine.setdefault('OPTIONS', {})['loaders'] = ['django.template.loaders.filesystem.Loader']
+            if engine.pop('APP_DIRS', False):
+                engine['OPTIONS']['loaders'].append('django.template.loaders.app_directories.Loader')
+
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Mede o tempo das páginas renderizadas com templates, sem cache (templates compilados a cada requisição '
+            'e layout renderizado sem os fragmentos em cache) e com o loader de templates em cache e os fragmentos '
+            'do layout em cache. Os dados são gerados em um banco de testes criado e removido pelo próprio comando, '
+            'o banco configurado não é alterado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=50, help='Quantidade de produtos sintéticos.')
+        parser.add_argument('--movimentacoes', type=int, default=1000,
+                            help='Quantidade de movimentações sintéticas.')
+        parser.add_argument('--repeticoes', type=int, default=50, help='Quantidade de execuções de cada página.')
+
+    def _urls(self):
+        argumentos = {
+            'edit_produto': [Produto.objects.order_by('pk').first().pk],
+            'edit_movimentacao': [Movimentacao.objects.order_by('pk').first().pk],
+        }
+        return {pagina: reverse(pagina, args=argumentos.get(pagina)) for pagina in PAGINAS}
+
+    def _medir(self, client, url, repeticoes):
+        # A primeira execução aquece os caches e não é considerada. O cache default é limpo a cada execução para
+        # que as páginas com cache (ex.: painel) sejam geradas novamente, o cache dos fragmentos do layout é mantido
+        client.get(url)
+
+        tempos = []
+        for _ in range(repeticoes):
+            caches['default'].clear()
+            inicio = time.perf_counter()
+            response = client.get(url)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code != 200:
+                raise ValueError(f'{url} retornou {response.status_code} no benchmark')
+
+        return statistics.median(tempos)
+
+    def _executar(self, options):
+        gerar_dados(options['produtos'], options['movimentacoes'], semente=1)
+        urls = self._urls()
+        client = Client()
+
+        cenarios = {
+            'sem cache': override_settings(
+                TEMPLATES=_templates_sem_cache(),
+                CACHES={**settings.CACHES, 'layout': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ),
+            'com cache': override_settings(),
+        }
+        resultados = {}
+        for cenario, configuracao in cenarios.items():
+            with configuracao:
+                resultados[cenario] = {
+                    pagina: self._medir(client, url, options['repeticoes']) for pagina, url in urls.items()
+                }
+
+        self.stdout.write(f"{'página':22} {'sem cache':>10} {'com cache':>10} {'ganho':>7}")
+        for pagina in PAGINAS:
+            sem_cache, com_cache = resultados['sem cache'][pagina], resultados['com cache'][pagina]
+            self.stdout.write(
+                f'{pagina:22} {sem_cache:8.2f}ms {com_cache:8.2f}ms {(1 - com_cache / sem_cache) * 100:6.1f}%'
+            )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nome_banco = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            caches_benchmark = {**settings.CACHES, 'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }}
+            with override_settings(CACHES=caches_benchmark, DEBUG=False):
+                self._executar(options)
+        finally:
+            connection.creation.destroy_test_db(nome_banco, verbosity=0)
+            teardown_test_environment()
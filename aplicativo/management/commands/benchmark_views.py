@@ -0,0 +1,142 @@
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from aplicativo.dados_sinteticos import gerar_dados
+from aplicativo.forms import MovimentacaoForm
+from aplicativo.models import Produto
+from aplicativo.monitoramento import RegistroConsultas
+
+
+class Command(BaseCommand):
+    help = ('Mede o tempo e a quantidade de consultas das principais views e da validação do MovimentacaoForm '
+            'com diferentes volumes de movimentações sintéticas. Os dados são gerados em um banco de testes '
+            'criado e removido pelo próprio comando, o banco configurado não é alterado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Quantidades de movimentações a serem medidas, em ordem crescente.')
+        parser.add_argument('--produtos', type=int, default=500, help='Quantidade de produtos sintéticos.')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Quantidade de execuções de cada medição.')
+        parser.add_argument('--semente', type=int, default=1, help='Semente do gerador de dados sintéticos.')
+        parser.add_argument('--saida', default='benchmark_views.json',
+                            help='Arquivo JSON onde os resultados são gravados, permitindo comparar execuções.')
+
+    def _alvos(self):
+
+        # Cada alvo é executado sem cache, medindo o custo de gerar a resposta a partir do banco
+        client = Client()
+
+        def view(nome_url, parametros=None):
+            def executar():
+                cache.clear()
+                response = client.get(reverse(nome_url), parametros or {})
+                # Respostas em arquivo ou streaming só são geradas quando o conteúdo é lido
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                response.close()
+            return executar
+
+        def relatorio_pdf():
+            # Remove os relatórios em cache para que o PDF seja gerado a cada execução
+            shutil.rmtree(self.diretorio_relatorios, ignore_errors=True)
+            view('export_pdf_movimentacao')()
+
+        produto = Produto.objects.filter(ativo=True, saldo__estoque__gt=0).first()
+
+        def validar_movimentacao():
+            form = MovimentacaoForm({
+                'produto': produto.pk, 'quantidade': 1, 'local': 'Estoque',
+                'tipo_movimentacao': 'False', 'data_hora': timezone.localtime().strftime('%Y-%m-%d %H:%M'),
+            })
+            if not form.is_valid():
+                raise ValueError(f'Formulário inválido no benchmark: {form.errors.as_json()}')
+
+        return {
+            'index': view('index'),
+            'stock_produto': view('stock_produto'),
+            'index_movimentacao': view('movimentacao'),
+            'grid_movimentacao': view('grid_movimentacao'),
+            'export_pdf_movimentacao': relatorio_pdf,
+            'MovimentacaoForm.is_valid': validar_movimentacao,
+        }
+
+    def _medir(self, executar, repeticoes):
+        # A primeira execução aquece os caches do banco e do processo e não é considerada
+        executar()
+
+        tempos = []
+        for _ in range(repeticoes):
+            with RegistroConsultas() as registro:
+                inicio = time.perf_counter()
+                executar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+        ordenados = sorted(tempos)
+        return {
+            'p50_ms': round(statistics.median(ordenados), 2),
+            'p95_ms': round(ordenados[min(int(len(ordenados) * 0.95), len(ordenados) - 1)], 2),
+            'media_ms': round(statistics.fmean(tempos), 2),
+            'consultas': registro.quantidade,
+        }
+
+    def _executar(self, options):
+        resultados = []
+        produto_ids = None
+        total = 0
+
+        for linhas in sorted(options['linhas']):
+            # Os volumes são gerados de forma incremental, cada etapa acrescenta somente as linhas que faltam
+            inicio = time.perf_counter()
+            produto_ids = gerar_dados(options['produtos'], linhas - total, semente=options['semente'] + linhas,
+                                      produto_ids=produto_ids)
+            total = linhas
+            self.stdout.write(f'{linhas} movimentações geradas em {time.perf_counter() - inicio:.1f}s')
+
+            for alvo, executar in self._alvos().items():
+                resultado = {'linhas': linhas, 'alvo': alvo, **self._medir(executar, options['repeticoes'])}
+                resultados.append(resultado)
+                self.stdout.write(
+                    f"  {alvo}: p50 {resultado['p50_ms']:.1f}ms, p95 {resultado['p95_ms']:.1f}ms, "
+                    f"{resultado['consultas']} consultas"
+                )
+
+        return resultados
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nome_banco = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        self.diretorio_relatorios = tempfile.mkdtemp()
+
+        try:
+            caches = {**settings.CACHES, 'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+            with override_settings(RELATORIOS_CACHE_DIR=self.diretorio_relatorios, CACHES=caches, DEBUG=False):
+                resultados = self._executar(options)
+        finally:
+            connection.creation.destroy_test_db(nome_banco, verbosity=0)
+            shutil.rmtree(self.diretorio_relatorios, ignore_errors=True)
+            teardown_test_environment()
+
+        with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'data': timezone.now().isoformat(),
+                'banco': connection.vendor,
+                'python': platform.python_version(),
+                'repeticoes': options['repeticoes'],
+                'produtos': options['produtos'],
+                'resultados': resultados,
+            }, arquivo, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['saida']}."))
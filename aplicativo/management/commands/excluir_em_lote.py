@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.html import strip_tags
+from aplicativo.models import Produto, Movimentacao
+from aplicativo.estoque import EstoqueInsuficiente
+from aplicativo.exclusao import (excluir_movimentacoes, restaurar_movimentacoes, excluir_produtos, restaurar_produtos,
+                                 NomeEmUso)
+from aplicativo.grid import filtrar_movimentacoes, ParametroInvalido, FILTROS
+
+
+class Command(BaseCommand):
+    help = ('Deleta (exclusão lógica) em lote as movimentações e os produtos informados ou, com --restaurar, '
+            'restaura os registros deletados. As movimentações podem ser informadas pelos ids e/ou pelos mesmos '
+            'filtros do grid de movimentações (ex.: para desfazer uma importação pelo período). A exclusão de um '
+            'produto deleta também as suas movimentações e a restauração do produto restaura as movimentações '
+            'deletadas junto com ele.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movimentacoes', type=int, nargs='+', default=[], help='Ids das movimentações.')
+        parser.add_argument('--produtos', type=int, nargs='+', default=[], help='Ids dos produtos.')
+        parser.add_argument('--produto', help='Filtra as movimentações pelo código do produto.')
+        parser.add_argument('--tipo', choices=('entrada', 'saida'), help='Filtra as movimentações pelo tipo.')
+        parser.add_argument('--local', help='Filtra as movimentações pelo inicio do nome do local.')
+        parser.add_argument('--data-inicio', help='Filtra as movimentações a partir da data (AAAA-MM-DD).')
+        parser.add_argument('--data-fim', help='Filtra as movimentações até a data (AAAA-MM-DD).')
+        parser.add_argument('--restaurar', action='store_true', help='Restaura os registros deletados.')
+
+    def _movimentacoes(self, options):
+        # Os ids e os filtros informados em conjunto devem ser atendidos pelas mesmas movimentações
+        filtros = {filtro: options[filtro] for filtro in FILTROS if options[filtro]}
+        if not options['movimentacoes'] and not filtros:
+            return None
+
+        movimentacoes = Movimentacao.todos.all()
+        if options['movimentacoes']:
+            movimentacoes = movimentacoes.filter(pk__in=options['movimentacoes'])
+        try:
+            return filtrar_movimentacoes(movimentacoes, filtros)
+        except ParametroInvalido as erro:
+            raise CommandError(erro)
+
+    def handle(self, *args, **options):
+        movimentacoes = self._movimentacoes(options)
+        produtos = Produto.todos.filter(pk__in=options['produtos']) if options['produtos'] else None
+        if movimentacoes is None and produtos is None:
+            raise CommandError('Informe os ids ou os filtros das movimentações, ou os ids dos produtos.')
+
+        total_produtos = total_movimentacoes = 0
+        if options['restaurar']:
+            # Os produtos são restaurados antes, as movimentações de produtos deletados não são restauradas
+            try:
+                if produtos is not None:
+                    total_produtos, total_movimentacoes = restaurar_produtos(produtos)
+                if movimentacoes is not None:
+                    total_movimentacoes += restaurar_movimentacoes(movimentacoes)
+            except (EstoqueInsuficiente, NomeEmUso) as erro:
+                raise CommandError(strip_tags(str(erro)))
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{total_movimentacoes} movimentações e {total_produtos} produtos restaurados com sucesso.'
+            ))
+            return
+
+        if movimentacoes is not None:
+            total_movimentacoes = excluir_movimentacoes(movimentacoes)
+        if produtos is not None:
+            total_produtos, movimentacoes_produtos = excluir_produtos(produtos)
+            total_movimentacoes += movimentacoes_produtos
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_movimentacoes} movimentações e {total_produtos} produtos deletados com sucesso.'
+        ))
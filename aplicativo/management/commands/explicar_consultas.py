@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from aplicativo.forms import ProdutoForm
+from aplicativo.models import Produto
+
+
+class _RegistroParametros:
+
+    # Registra o SQL e os parâmetros de cada consulta, necessários para executar o EXPLAIN da mesma consulta
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Executa as consultas de cada view e exibe o plano de execução (EXPLAIN ANALYZE no PostgreSQL), '
+            'permitindo confirmar a utilização dos índices. Execute em um banco com dados de volume realista.')
+
+    def _consultas_views(self):
+
+        # Views de leitura e os parâmetros mais utilizados do grid e das exportações
+        produto = Produto.objects.values_list('pk', flat=True).first()
+        parametros_produto = {'produto': str(produto)} if produto else {}
+
+        yield 'index', {}
+        yield 'produto', {}
+        yield 'stock_produto', {}
+        yield 'movimentacao', {}
+        yield 'grid_movimentacao', {}
+        yield 'grid_movimentacao', parametros_produto
+        yield 'grid_movimentacao', {'tipo': 'entrada', 'data_inicio': '2023-01-01', 'ordem': 'data_hora'}
+        yield 'export_csv_movimentacao', parametros_produto
+        yield 'api_autocomplete_produto', {'q': 'par'}
+        yield 'api_autocomplete_produto', {}
+
+    def _executar_view(self, nome_url, parametros):
+        request = RequestFactory().get(reverse(nome_url), parametros)
+        response = resolve(request.path_info).func(request)
+
+        # Respostas em streaming só executam as consultas quando o conteúdo é consumido
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    def _validar_nome_produto(self):
+        # Consulta de nome único executada pelo formulário de cadastro de produtos
+        ProdutoForm({'nome': 'Produto Inexistente', 'fabricante': 'Fabricante', 'tipo': 'Tipo'}).is_valid()
+
+    def _explicar(self, sql, params):
+        # O ANALYZE executa a consulta, por isso somente consultas de leitura são explicadas
+        try:
+            prefixo = connection.ops.explain_query_prefix(analyze=True)
+        except ValueError:
+            prefixo = connection.ops.explain_query_prefix()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefixo} {sql}', params)
+            return [' '.join(str(coluna) for coluna in linha) for linha in cursor.fetchall()]
+
+    def _exibir(self, titulo, executar):
+        registro = _RegistroParametros()
+        with connection.execute_wrapper(registro):
+            executar()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'==== {titulo} ({len(registro.consultas)} consultas) ===='))
+        for sql, params in registro.consultas:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            self.stdout.write(self.style.SQL_KEYWORD(sql))
+            self.stdout.write(f'    parâmetros: {params}')
+            for linha in self._explicar(sql, params):
+                self.stdout.write(f'    {linha}')
+            self.stdout.write('')
+
+    def handle(self, *args, **options):
+        for nome_url, parametros in self._consultas_views():
+            titulo = f"{nome_url} {'&'.join(f'{chave}={valor}' for chave, valor in parametros.items())}".strip()
+            self._exibir(titulo, lambda: self._executar_view(nome_url, parametros))
+
+        self._exibir('ProdutoForm.clean_nome', self._validar_nome_produto)
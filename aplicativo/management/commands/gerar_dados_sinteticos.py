@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from aplicativo.dados_sinteticos import gerar_dados
+
+
+class Command(BaseCommand):
+    help = ('Cadastra produtos e movimentações sintéticos com bulk_create para testes de desempenho, '
+            'reconstruindo os saldos, o resumo mensal e os saldos periódicos ao final.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=200, help='Quantidade de produtos a serem cadastrados.')
+        parser.add_argument('--movimentacoes', type=int, default=10000,
+                            help='Quantidade de movimentações a serem cadastradas.')
+        parser.add_argument('--anos', type=int, default=3, help='Período, em anos, das datas das movimentações.')
+        parser.add_argument('--semente', type=int, default=None,
+                            help='Semente do gerador aleatório, permite repetir os mesmos dados.')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        gerar_dados(options['produtos'], options['movimentacoes'], anos=options['anos'], semente=options['semente'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['produtos']} produtos e {options['movimentacoes']} movimentações cadastrados "
+            f"em {time.perf_counter() - inicio:.1f}s."
+        ))
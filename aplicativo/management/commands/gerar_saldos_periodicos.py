@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from aplicativo.estoque import recalcular_saldos_periodicos, PERIODOS_SALDO
+
+
+class Command(BaseCommand):
+    help = ('Reconstrói os saldos periódicos (SaldoPeriodico) de cada produto a partir das movimentações, '
+            'utilizados na consulta do estoque em uma data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', choices=list(PERIODOS_SALDO), default='mensal',
+                            help='Intervalo entre os saldos registrados.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            quantidade = recalcular_saldos_periodicos(options['periodo'])
+
+        self.stdout.write(self.style.SUCCESS(f'{quantidade} saldos periódicos gerados com sucesso.'))
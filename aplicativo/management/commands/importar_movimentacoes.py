@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from aplicativo.importacao import importar_movimentacoes, ArquivoInvalido, TAMANHO_LOTE_PADRAO
+
+
+class Command(BaseCommand):
+    help = 'Importa movimentações em massa a partir de um arquivo CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV.')
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                            help='Quantidade de linhas validadas e gravadas em cada transação.')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do arquivo.')
+        parser.add_argument('--max-rejeitadas', type=int, default=50,
+                            help='Quantidade máxima de linhas rejeitadas exibidas no resumo.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], encoding=options['encoding'], newline='') as arquivo:
+                resultado = importar_movimentacoes(arquivo, tamanho_lote=options['tamanho_lote'])
+        except (OSError, ArquivoInvalido) as erro:
+            raise CommandError(erro)
+
+        for numero_linha, motivo in resultado.rejeitadas[:options['max_rejeitadas']]:
+            self.stdout.write(self.style.WARNING(f'Linha {numero_linha}: {motivo}'))
+        if len(resultado.rejeitadas) > options['max_rejeitadas']:
+            self.stdout.write(self.style.WARNING(
+                f"... e mais {len(resultado.rejeitadas) - options['max_rejeitadas']} linhas rejeitadas."))
+
+        self.stdout.write(self.style.SUCCESS(resultado.resumo()))
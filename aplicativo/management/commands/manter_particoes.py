@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from aplicativo.particionamento import (tabela_particionada, criar_particoes_futuras, desanexar_particoes_expiradas,
+                                        nome_particao)
+
+
+class Command(BaseCommand):
+    help = ('Cria as partições mensais da tabela de movimentações para o mês atual e os próximos meses e desanexa as '
+            'partições mais antigas que o período de retenção. Somente no PostgreSQL com MOVIMENTACAO_PARTICIONADA '
+            'ativo, deve ser agendado para executar ao menos uma vez por mês. Antes de desanexar é registrado o '
+            'saldo de abertura de cada produto, a partir do qual os comandos recalcular_* e gerar_saldos_periodicos '
+            'reconstroem os totais sem as movimentações das partições desanexadas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-futuros', type=int, default=settings.MOVIMENTACAO_MESES_FUTUROS,
+                            help='Quantidade de meses futuros com partições criadas antecipadamente.')
+        parser.add_argument('--meses-retencao', type=int, default=settings.MOVIMENTACAO_MESES_RETENCAO,
+                            help='Partições de meses anteriores a este período são desanexadas. '
+                                 'Sem este valor nenhuma partição é desanexada.')
+        parser.add_argument('--remover', action='store_true',
+                            help='Apaga as tabelas das partições desanexadas.')
+
+    def handle(self, *args, **options):
+        if not tabela_particionada():
+            self.stdout.write(self.style.WARNING(
+                'A tabela de movimentações não está particionada, nenhuma alteração foi feita.'
+            ))
+            return
+
+        for mes in criar_particoes_futuras(options['meses_futuros']):
+            self.stdout.write(f'Partição {nome_particao(mes)} criada.')
+
+        if options['meses_retencao'] is not None:
+            acao = 'removida' if options['remover'] else 'desanexada'
+            for mes in desanexar_particoes_expiradas(options['meses_retencao'], remover=options['remover']):
+                self.stdout.write(f'Partição {nome_particao(mes)} {acao}.')
+
+        self.stdout.write(self.style.SUCCESS('Partições atualizadas com sucesso.'))
@@ -0,0 +1,84 @@
+import math
+import os
+import re
+from pathlib import Path
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from aplicativo.estaticos import PACOTES, comprimir, montar_pacote, nome_pacote
+
+# Arquivos css e js que todas as páginas carregavam antes dos pacotes, mantidos para a comparação
+ARQUIVOS_ANTERIORES = (
+    'vendor/bootstrap/css/bootstrap.min.css',
+    'vendor/bootstrap-icons/bootstrap-icons.css',
+    'vendor/boxicons/css/boxicons.min.css',
+    'vendor/quill/quill.snow.css',
+    'vendor/quill/quill.bubble.css',
+    'vendor/remixicon/remixicon.css',
+    'vendor/simple-datatables/style.css',
+    'css/style.css',
+    'vendor/apexcharts/apexcharts.min.js',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js',
+    'vendor/chart.js/chart.umd.js',
+    'vendor/echarts/echarts.min.js',
+    'vendor/quill/quill.min.js',
+    'vendor/simple-datatables/simple-datatables.js',
+    'vendor/tinymce/tinymce.min.js',
+    'vendor/php-email-form/validate.js',
+    'js/main.js',
+)
+
+PACOTE_TEMPLATE = re.compile(r"\{%\s*pacote_js\s+'(\w+)'\s*%\}")
+CONEXOES_PARALELAS = 6
+
+
+def _abrir(arquivo):
+    return open(finders.find(arquivo), 'rb')
+
+
+class Command(BaseCommand):
+    help = ('Compara, para cada página, a quantidade e o tamanho dos arquivos css e js carregados antes dos pacotes '
+            '(todas as bibliotecas, sem compressão) e com os pacotes de ESTATICOS_COMPACTADOS (um css e um js por '
+            'página, comprimidos). O tempo é uma estimativa da transferência na primeira visita em uma conexão de '
+            'referência, sem o cache do navegador. O tempo até a página ficar interativa (TTI) também depende da '
+            'execução dos scripts no navegador e deve ser medido com um navegador (ex.: Lighthouse).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--banda', type=float, default=1.6,
+                            help='Banda da conexão de referência em Mbit/s (padrão: Fast 3G).')
+        parser.add_argument('--latencia', type=float, default=150,
+                            help='Latência (ida e volta) da conexão de referência em milissegundos.')
+
+    def _estimar(self, requisicoes, tamanho, options):
+        # As requisições são feitas em até CONEXOES_PARALELAS conexões, cada rodada custa uma latência
+        rodadas = math.ceil(requisicoes / CONEXOES_PARALELAS)
+        return rodadas * options['latencia'] + tamanho * 8 / (options['banda'] * 1000)
+
+    def _pacote(self, nome):
+        # Tamanho transferido de cada arquivo do pacote, com a melhor compressão disponível
+        tamanhos = []
+        for extensao, arquivos in PACOTES[nome].items():
+            conteudo = montar_pacote(arquivos, extensao, nome_pacote(nome, extensao), _abrir)
+            versoes = comprimir(conteudo.encode('utf-8'))
+            tamanhos.append(min(len(comprimido) for comprimido in versoes.values()))
+        return tamanhos
+
+    def handle(self, *args, **options):
+        anterior = sum(os.path.getsize(finders.find(arquivo)) for arquivo in ARQUIVOS_ANTERIORES)
+        tempo_anterior = self._estimar(len(ARQUIVOS_ANTERIORES), anterior, options)
+        pacotes = {nome: self._pacote(nome) for nome in PACOTES}
+
+        templates = Path(__file__).resolve().parents[2] / 'templates'
+        self.stdout.write(f"{'página':30} {'antes':>24} {'depois':>24}")
+        for template in sorted(templates.glob('*/*.html')):
+            # As páginas que não substituem o bloco js de base.html utilizam o pacote padrao
+            encontrado = PACOTE_TEMPLATE.search(template.read_text(encoding='utf-8'))
+            pacote = encontrado[1] if encontrado else 'padrao'
+
+            tamanhos = pacotes[pacote]
+            depois = sum(tamanhos)
+            self.stdout.write(
+                f"{str(template.relative_to(templates)):30} "
+                f"{len(ARQUIVOS_ANTERIORES):2} arq {anterior / 1024:7.0f} KiB {tempo_anterior:5.0f}ms "
+                f"{len(tamanhos):2} arq {depois / 1024:7.0f} KiB "
+                f"{self._estimar(len(tamanhos), depois, options):5.0f}ms ({pacote})"
+            )
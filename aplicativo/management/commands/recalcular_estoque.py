@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from aplicativo.painel import invalidar_painel
+from aplicativo import versoes
+from aplicativo.versoes import incrementar_versao
+from aplicativo.estoque import recalcular_saldos
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela de saldos de estoque (EstoqueProduto) a partir das movimentações.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            incrementar_versao(versoes.MOVIMENTACAO)
+            quantidade = recalcular_saldos()
+            invalidar_painel()
+
+        self.stdout.write(self.style.SUCCESS(f'Saldo de {quantidade} produtos recalculado com sucesso.'))
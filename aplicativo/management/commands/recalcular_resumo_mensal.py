@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from aplicativo.painel import invalidar_painel
+from aplicativo import versoes
+from aplicativo.versoes import incrementar_versao
+from aplicativo.estoque import recalcular_resumos_mensais
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo mensal de movimentações (MovimentacaoMensal) a partir do histórico.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            incrementar_versao(versoes.MOVIMENTACAO)
+            quantidade = recalcular_resumos_mensais()
+            invalidar_painel()
+
+        self.stdout.write(self.style.SUCCESS(f'Resumo de {quantidade} meses recalculado com sucesso.'))
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Q, Sum
+
+
+def popular_saldos(apps, schema_editor):
+    # Preenche os saldos com o histórico já existente de movimentações
+    Movimentacao = apps.get_model('aplicativo', 'Movimentacao')
+    EstoqueProduto = apps.get_model('aplicativo', 'EstoqueProduto')
+
+    totais = (
+        Movimentacao.objects
+        .filter(deletado=False)
+        .values('produto_id')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+            contagem_entradas=Count('id', filter=Q(tipo_movimentacao=True)),
+            contagem_saidas=Count('id', filter=Q(tipo_movimentacao=False)),
+            ultima_movimentacao=Max('data_hora'),
+        )
+        .order_by()
+    )
+
+    EstoqueProduto.objects.bulk_create([
+        EstoqueProduto(
+            produto_id=total['produto_id'],
+            total_entradas=total['total_entradas'] or 0,
+            total_saidas=total['total_saidas'] or 0,
+            estoque=(total['total_entradas'] or 0) - (total['total_saidas'] or 0),
+            contagem_entradas=total['contagem_entradas'],
+            contagem_saidas=total['contagem_saidas'],
+            ultima_movimentacao=total['ultima_movimentacao'],
+        )
+        for total in totais
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0009_auto_20230516_0039'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstoqueProduto',
+            fields=[
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='aplicativo.produto')),
+                ('total_entradas', models.BigIntegerField(default=0)),
+                ('total_saidas', models.BigIntegerField(default=0)),
+                ('estoque', models.BigIntegerField(default=0)),
+                ('contagem_entradas', models.PositiveIntegerField(default=0)),
+                ('contagem_saidas', models.PositiveIntegerField(default=0)),
+                ('ultima_movimentacao', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(popular_saldos, migrations.RunPython.noop),
+    ]
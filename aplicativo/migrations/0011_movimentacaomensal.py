@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:36
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def popular_resumo_mensal(apps, schema_editor):
+    # Preenche o resumo mensal com o histórico já existente de movimentações
+    Movimentacao = apps.get_model('aplicativo', 'Movimentacao')
+    MovimentacaoMensal = apps.get_model('aplicativo', 'MovimentacaoMensal')
+
+    totais = (
+        Movimentacao.objects
+        .filter(deletado=False)
+        .annotate(mes=TruncMonth('data_hora', output_field=DateField()))
+        .values('mes')
+        .annotate(
+            total_entradas=Sum('quantidade', filter=Q(tipo_movimentacao=True)),
+            total_saidas=Sum('quantidade', filter=Q(tipo_movimentacao=False)),
+            contagem=Count('id'),
+        )
+        .order_by()
+    )
+
+    MovimentacaoMensal.objects.bulk_create([
+        MovimentacaoMensal(
+            mes=total['mes'],
+            total_entradas=total['total_entradas'] or 0,
+            total_saidas=total['total_saidas'] or 0,
+            contagem=total['contagem'],
+        )
+        for total in totais
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0010_estoqueproduto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentacaoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(unique=True)),
+                ('total_entradas', models.BigIntegerField(default=0)),
+                ('total_saidas', models.BigIntegerField(default=0)),
+                ('contagem', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(popular_resumo_mensal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0011_movimentacaomensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorAlteracao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('versao', models.BigIntegerField(default=0)),
+                ('alterado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
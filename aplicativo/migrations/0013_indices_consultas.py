@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:50
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def renomear_duplicados(apps, schema_editor):
+
+    # O índice único não pode ser criado enquanto houver produtos não deletados com o mesmo nome (sem diferenciar
+    # maiúsculas e minúsculas). O produto mais antigo (menor id) mantém o nome e os demais recebem o próprio id no
+    # nome, ex.: "Caneta (12)", podendo ser renomeados depois pela tela de edição do produto
+    Produto = apps.get_model('aplicativo', 'Produto')
+    ativos = Produto.objects.filter(deletado=False).annotate(nome_minusculo=Lower('nome'))
+
+    repetidos = ativos.values('nome_minusculo').annotate(total=Count('id')).filter(total__gt=1)
+    for nome in [repetido['nome_minusculo'] for repetido in repetidos]:
+        for produto in ativos.filter(nome_minusculo=nome).order_by('pk')[1:]:
+            sufixo = f' ({produto.pk})'
+            produto.nome = produto.nome[:255 - len(sufixo)] + sufixo
+            produto.save(update_fields=['nome'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0012_contadoralteracao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['produto', 'tipo_movimentacao'], name='movimentacao_produto_tipo'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['data_hora', 'id'], name='movimentacao_data_hora'),
+        ),
+        # Índice funcional único, o Django 3.2 não permite declarar UniqueConstraint com expressões no modelo.
+        # A sintaxe é aceita tanto pelo PostgreSQL quanto pelo SQLite. Bancos existentes com nomes repetidos
+        # têm os produtos repetidos renomeados antes da criação do índice
+        migrations.RunPython(renomear_duplicados, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX produto_nome_unico_ativo ON aplicativo_produto (lower(nome)) WHERE NOT deletado',
+            reverse_sql='DROP INDEX produto_nome_unico_ativo',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0013_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoPeriodico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('total_entradas', models.BigIntegerField(default=0)),
+                ('total_saidas', models.BigIntegerField(default=0)),
+                ('estoque', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['produto', 'data_hora'], name='movimentacao_produto_data'),
+        ),
+        migrations.AddField(
+            model_name='saldoperiodico',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='aplicativo.produto'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldoperiodico',
+            constraint=models.UniqueConstraint(fields=('produto', 'data'), name='saldo_periodico_produto_data'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0014_saldoperiodico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Local',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255)),
+                ('chave', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        # Coluna temporária, preenchida pela migração 0016 e renomeada para local na migração 0017
+        migrations.AddField(
+            model_name='movimentacao',
+            name='local_normalizado',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='aplicativo.local'),
+        ),
+    ]
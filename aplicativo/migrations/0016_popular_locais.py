@@ -0,0 +1,48 @@
+import unicodedata
+from django.db import migrations
+from django.db.models import Count
+
+
+def _normalizar_local(nome):
+    # Cópia de locais.normalizar_local, as migrações não devem depender do código atual da aplicação
+    decomposto = unicodedata.normalize('NFKD', nome)
+    sem_acentos = unicodedata.normalize('NFC', ''.join(c for c in decomposto if not unicodedata.combining(c)))
+
+    return ' '.join(sem_acentos.split()).casefold()
+
+
+def popular_locais(apps, schema_editor):
+
+    # Cadastra um local por nome normalizado, utilizando como nome a grafia mais frequente entre as variações,
+    # e associa as movimentações com um UPDATE por grafia distinta
+    Local = apps.get_model('aplicativo', 'Local')
+    Movimentacao = apps.get_model('aplicativo', 'Movimentacao')
+
+    grafias = Movimentacao.objects.values('local').annotate(quantidade=Count('id')).order_by('-quantidade', 'local')
+
+    locais = {}
+    for grafia in grafias:
+        # Um local sem chave (ex.: somente acentos) é mantido com o próprio nome como chave
+        chave = _normalizar_local(grafia['local']) or grafia['local']
+        if chave not in locais:
+            locais[chave] = Local.objects.create(nome=' '.join(grafia['local'].split()), chave=chave)
+        Movimentacao.objects.filter(local=grafia['local']).update(local_normalizado=locais[chave])
+
+
+def reverter_locais(apps, schema_editor):
+    Local = apps.get_model('aplicativo', 'Local')
+    Movimentacao = apps.get_model('aplicativo', 'Movimentacao')
+
+    for local in Local.objects.all():
+        Movimentacao.objects.filter(local_normalizado=local).update(local=local.nome)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0015_local'),
+    ]
+
+    operations = [
+        migrations.RunPython(popular_locais, reverter_locais),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0016_popular_locais'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='movimentacao',
+            name='local',
+        ),
+        migrations.RenameField(
+            model_name='movimentacao',
+            old_name='local_normalizado',
+            new_name='local',
+        ),
+        migrations.AlterField(
+            model_name='movimentacao',
+            name='local',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='aplicativo.local'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['local', 'produto'], name='movimentacao_local_produto'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0017_movimentacao_local'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=255)),
+                ('fabricante', models.CharField(max_length=255)),
+                ('tipo', models.CharField(max_length=255)),
+                ('descricao', models.CharField(max_length=255, null=True)),
+                ('ativo', models.BooleanField()),
+                ('deletado_em', models.DateTimeField(null=True)),
+                ('arquivado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movimentacao',
+            name='deletado_em',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='deletado_em',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.CreateModel(
+            name='MovimentacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('produto_id', models.BigIntegerField(db_index=True)),
+                ('data_hora', models.DateTimeField()),
+                ('quantidade', models.PositiveIntegerField()),
+                ('tipo_movimentacao', models.BooleanField()),
+                ('deletado_em', models.DateTimeField(null=True)),
+                ('arquivado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('local', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='aplicativo.local')),
+            ],
+        ),
+    ]
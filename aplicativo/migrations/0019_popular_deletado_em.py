@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def popular_deletado_em(apps, schema_editor):
+
+    # A data da exclusão dos registros deletados antes desta migração não é conhecida, é utilizada a data da
+    # migração, assim eles só são arquivados depois de passado o mesmo prazo dos registros deletados a partir de agora
+    agora = timezone.now()
+    for nome_modelo in ('Produto', 'Movimentacao'):
+        modelo = apps.get_model('aplicativo', nome_modelo)
+        modelo.objects.filter(deletado=True, deletado_em__isnull=True).update(deletado_em=agora)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0018_arquivamento'),
+    ]
+
+    operations = [
+        migrations.RunPython(popular_deletado_em, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,124 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# Conversão opcional da tabela de movimentações em uma tabela particionada por mês de data_hora, somente no
+# PostgreSQL e com MOVIMENTACAO_PARTICIONADA ativo. Nos demais casos a migração não altera o banco.
+# O PostgreSQL exige que a chave primária de uma tabela particionada contenha a coluna de particionamento, por isso
+# a chave primária passa a ser (id, data_hora). O id continua sendo gerado pela mesma sequência e único por registro.
+# As funções são cópias simplificadas de aplicativo.particionamento, as migrações não devem depender do código
+# atual da aplicação.
+
+TABELA = 'aplicativo_movimentacao'
+TABELA_ANTIGA = f'{TABELA}_antiga'
+
+
+def _proximo_mes(mes):
+    return (mes + timedelta(days=32)).replace(day=1)
+
+
+def _inicio_mes(mes):
+    return timezone.make_aware(datetime.combine(mes, time.min))
+
+
+def _particionada(cursor):
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [TABELA])
+    return cursor.fetchone()[0]
+
+
+def _criar_particoes(cursor):
+
+    # Uma partição por mês, desde o mês da movimentação mais antiga até os próximos meses configurados,
+    # e a partição padrão para as movimentações fora desse período
+    cursor.execute(f'SELECT min(data_hora) FROM {TABELA_ANTIGA}')
+    primeira = cursor.fetchone()[0]
+    mes = timezone.localtime(primeira).date() if primeira else timezone.localdate()
+    mes = mes.replace(day=1)
+
+    ultimo = timezone.localdate().replace(day=1)
+    for _ in range(settings.MOVIMENTACAO_MESES_FUTUROS):
+        ultimo = _proximo_mes(ultimo)
+
+    while mes <= ultimo:
+        cursor.execute(
+            f"CREATE TABLE {TABELA}_p{mes:%Y%m} PARTITION OF {TABELA} "
+            f"FOR VALUES FROM ('{_inicio_mes(mes).isoformat()}') TO ('{_inicio_mes(_proximo_mes(mes)).isoformat()}')"
+        )
+        mes = _proximo_mes(mes)
+
+    cursor.execute(f'CREATE TABLE {TABELA}_padrao PARTITION OF {TABELA} DEFAULT')
+
+
+def _recriar_tabela(schema_editor, particionar):
+
+    # Recria a tabela com as mesmas colunas, dados, índices e chaves estrangeiras, particionada ou não.
+    # Os índices e as chaves estrangeiras são criados depois da cópia dos dados, o que também é mais rápido
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT replace(indexdef, ' ON ONLY ', ' ON ') FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p')",
+            [TABELA, TABELA],
+        )
+        indices = [indice for indice, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABELA],
+        )
+        chaves_estrangeiras = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABELA])
+        sequencia = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {TABELA} RENAME TO {TABELA_ANTIGA}')
+        cursor.execute(
+            f'CREATE TABLE {TABELA} (LIKE {TABELA_ANTIGA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            + (' PARTITION BY RANGE (data_hora)' if particionar else '')
+        )
+        if particionar:
+            _criar_particoes(cursor)
+
+        # A sequência do id pertence à coluna da tabela antiga e seria apagada junto com ela
+        cursor.execute(f'ALTER SEQUENCE {sequencia} OWNED BY {TABELA}.id')
+        cursor.execute(f'INSERT INTO {TABELA} SELECT * FROM {TABELA_ANTIGA}')
+        cursor.execute(f'DROP TABLE {TABELA_ANTIGA}')
+
+        cursor.execute(f"ALTER TABLE {TABELA} ADD PRIMARY KEY ({'id, data_hora' if particionar else 'id'})")
+        for indice in indices:
+            cursor.execute(indice)
+        for nome, definicao in chaves_estrangeiras:
+            cursor.execute(f'ALTER TABLE {TABELA} ADD CONSTRAINT {nome} {definicao}')
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or not settings.MOVIMENTACAO_PARTICIONADA:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if _particionada(cursor):
+            return
+
+    _recriar_tabela(schema_editor, particionar=True)
+
+
+def desparticionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if not _particionada(cursor):
+            return
+
+    _recriar_tabela(schema_editor, particionar=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0019_popular_deletado_em'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+# Índices de trigramas (extensão pg_trgm) das buscas por parte do nome e do fabricante do autocomplete de produtos,
+# somente no PostgreSQL. As expressões são as mesmas geradas pelo Django para o filtro icontains (UPPER(campo::text))
+INDICES_TRIGRAMAS = {
+    'produto_nome_trgm': 'nome',
+    'produto_fabricante_trgm': 'fabricante',
+}
+
+
+def criar_indices_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nome, campo in INDICES_TRIGRAMAS.items():
+        schema_editor.execute(
+            f'CREATE INDEX {nome} ON aplicativo_produto USING gin (upper({campo}::text) gin_trgm_ops) '
+            f'WHERE NOT deletado'
+        )
+
+
+def remover_indices_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for nome in INDICES_TRIGRAMAS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0020_particionar_movimentacoes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('ativo', True), ('deletado', False)), fields=['nome'], name='produto_nome_ativo'),
+        ),
+        migrations.RunPython(criar_indices_trigramas, remover_indices_trigramas),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+# Coluna busca (tsvector) com o nome, fabricante, tipo e descrição de cada produto, em ordem decrescente de peso,
+# e o índice GIN da busca textual da listagem de produtos, somente no PostgreSQL (12 ou superior).
+# A coluna é gerada pelo próprio banco (GENERATED ALWAYS ... STORED) e não faz parte do modelo Produto, assim não
+# é lida nem gravada pelo Django. Alterações nos tipos desses campos exigem remover e recriar a coluna.
+
+
+def criar_coluna_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        "ALTER TABLE aplicativo_produto ADD COLUMN busca tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(fabricante, '')), 'B') || "
+        "setweight(to_tsvector('portuguese', coalesce(tipo, '')), 'C') || "
+        "setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'D')) STORED"
+    )
+    schema_editor.execute('CREATE INDEX produto_busca ON aplicativo_produto USING gin (busca) WHERE NOT deletado')
+
+
+def remover_coluna_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('ALTER TABLE aplicativo_produto DROP COLUMN IF EXISTS busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0021_busca_produtos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['nome', 'id'], name='produto_nome_id'),
+        ),
+        migrations.RunPython(criar_coluna_busca, remover_coluna_busca),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0022_busca_textual_produtos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoqueproduto',
+            name='versao',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='movimentacaomensal',
+            name='versao',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
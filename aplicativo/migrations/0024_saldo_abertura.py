@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0023_versao_totais_painel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saldoperiodico',
+            name='abertura',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='saldoperiodico',
+            name='contagem_entradas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='saldoperiodico',
+            name='contagem_saidas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='saldoperiodico',
+            name='ultima_movimentacao',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+import unicodedata
+from django.db import migrations
+
+
+def _normalizar_local(nome):
+    # Cópia de locais.normalizar_local, as migrações não devem depender do código atual da aplicação
+    decomposto = unicodedata.normalize('NFKD', nome)
+    sem_acentos = unicodedata.normalize('NFC', ''.join(c for c in decomposto if not unicodedata.combining(c)))
+
+    return ' '.join(sem_acentos.split()).casefold()
+
+
+def recalcular_chaves(apps, schema_editor):
+
+    # A normalização anterior removia todos os caracteres fora do ASCII, nomes em outros alfabetos resultavam na
+    # mesma chave. As chaves são recalculadas a partir do nome, um local cuja nova chave já pertence a outro local
+    # mantém a chave anterior
+    Local = apps.get_model('aplicativo', 'Local')
+
+    locais = list(Local.objects.order_by('pk'))
+    chaves = {local.chave for local in locais}
+    for local in locais:
+        chave = _normalizar_local(local.nome)
+        if not chave or chave == local.chave or chave in chaves:
+            continue
+        chaves.discard(local.chave)
+        chaves.add(chave)
+        local.chave = chave
+        local.save(update_fields=['chave'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0024_saldo_abertura'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_chaves, migrations.RunPython.noop),
+    ]
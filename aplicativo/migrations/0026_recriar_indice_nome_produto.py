@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def renomear_duplicados(apps, schema_editor):
+
+    # Cópia de 0013_indices_consultas.renomear_duplicados, as migrações não devem depender umas das outras.
+    # O produto mais antigo (menor id) mantém o nome e os demais recebem o próprio id no nome
+    Produto = apps.get_model('aplicativo', 'Produto')
+    ativos = Produto.objects.filter(deletado=False).annotate(nome_minusculo=Lower('nome'))
+
+    repetidos = ativos.values('nome_minusculo').annotate(total=Count('id')).filter(total__gt=1)
+    for nome in [repetido['nome_minusculo'] for repetido in repetidos]:
+        for produto in ativos.filter(nome_minusculo=nome).order_by('pk')[1:]:
+            sufixo = f' ({produto.pk})'
+            produto.nome = produto.nome[:255 - len(sufixo)] + sufixo
+            produto.save(update_fields=['nome'])
+
+
+class Migration(migrations.Migration):
+
+    # No SQLite a migração 0018 recria a tabela de produtos ao adicionar a coluna deletado_em e o índice
+    # produto_nome_unico_ativo, criado por SQL na migração 0013 e desconhecido pelo Django, não é recriado.
+    # O índice é criado novamente caso não exista (no PostgreSQL ele já existe e nada é alterado), após renomear
+    # os nomes repetidos cadastrados enquanto o índice não existia
+    dependencies = [
+        ('aplicativo', '0025_recalcular_chave_locais'),
+    ]
+
+    operations = [
+        migrations.RunPython(renomear_duplicados, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX IF NOT EXISTS produto_nome_unico_ativo ON aplicativo_produto (lower(nome)) '
+                'WHERE NOT deletado',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
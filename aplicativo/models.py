@@ -1,7 +1,16 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
+class RegistrosAtivosManager(models.Manager):
+
+    # Manager padrão dos modelos com exclusão lógica, retorna somente os registros não deletados.
+    # Os registros deletados continuam acessíveis pelo manager todos (ex.: arquivamento)
+    def get_queryset(self):
+        return super().get_queryset().filter(deletado=False)
+
+
 class Produto(models.Model):
 
     nome = models.CharField(max_length=255)
@@ -10,6 +19,32 @@ class Produto(models.Model):
     descricao = models.CharField(max_length=255, null=True)
     ativo = models.BooleanField()
     deletado = models.BooleanField(default=False)
+    deletado_em = models.DateTimeField(null=True)
+
+    objects = RegistrosAtivosManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Lista dos produtos ativos em ordem alfabética (autocomplete sem termo digitado)
+            models.Index(fields=['nome'], condition=Q(deletado=False, ativo=True), name='produto_nome_ativo'),
+            # Listagem paginada dos produtos em ordem alfabética
+            models.Index(fields=['nome', 'id'], condition=Q(deletado=False), name='produto_nome_id'),
+        ]
+
+    # O nome é único (sem diferenciar maiúsculas e minúsculas) entre os produtos não deletados através do índice
+    # produto_nome_unico_ativo, criado na migração 0013, pois o Django 3.2 não suporta restrições com expressões
+
+    def __str__(self):
+        return self.nome
+
+
+class Local(models.Model):
+
+    # Local das movimentações (depósitos, lojas, etc.). A chave é o nome normalizado (sem acentos, sem diferenciar
+    # maiúsculas e minúsculas e sem espaços repetidos), assim variações de digitação do mesmo local são unificadas
+    nome = models.CharField(max_length=255)
+    chave = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
         return self.nome
@@ -21,11 +56,135 @@ class Movimentacao(models.Model):
     data_hora = models.DateTimeField(default=timezone.now)
     quantidade = models.PositiveIntegerField()
     tipo_movimentacao = models.BooleanField()
-    local = models.CharField(max_length=255)
+    local = models.ForeignKey(Local, on_delete=models.PROTECT)
     deletado = models.BooleanField(default=False)
+    deletado_em = models.DateTimeField(null=True)
+
+    objects = RegistrosAtivosManager()
+    todos = models.Manager()
+
+    class Meta:
+        # Índices parciais, somente das movimentações não deletadas, que são as únicas consultadas pelas telas
+        indexes = [
+            # Totais por produto e tipo de movimentação
+            models.Index(fields=['produto', 'tipo_movimentacao'], condition=Q(deletado=False),
+                         name='movimentacao_produto_tipo'),
+            # Ordenação e paginação do grid por data e hora, o id é o critério de desempate do cursor
+            models.Index(fields=['data_hora', 'id'], condition=Q(deletado=False), name='movimentacao_data_hora'),
+            # Soma das movimentações de um produto a partir de uma data (estoque em uma data)
+            models.Index(fields=['produto', 'data_hora'], condition=Q(deletado=False),
+                         name='movimentacao_produto_data'),
+            # Estoque por local e produto
+            models.Index(fields=['local', 'produto'], condition=Q(deletado=False), name='movimentacao_local_produto'),
+        ]
 
     def __str__(self):
         return f"{self.quantidade} unidades do produto {self.produto.nome} movimentadas em {self.data_horahora} para " \
                f"{self.local}"
 
 
+class ProdutoArquivado(models.Model):
+
+    # Produtos deletados retirados da tabela de produtos pelo comando arquivar_deletados. O id é o mesmo do produto
+    # original, assim o produto pode ser restaurado (desarquivado) com o mesmo id
+    id = models.BigIntegerField(primary_key=True)
+    nome = models.CharField(max_length=255)
+    fabricante = models.CharField(max_length=255)
+    tipo = models.CharField(max_length=255)
+    descricao = models.CharField(max_length=255, null=True)
+    ativo = models.BooleanField()
+    deletado_em = models.DateTimeField(null=True)
+    arquivado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.nome
+
+
+class MovimentacaoArquivada(models.Model):
+
+    # Movimentações deletadas retiradas da tabela de movimentações pelo comando arquivar_deletados, com o mesmo id.
+    # O produto é guardado somente pelo id, pois ele também pode ter sido arquivado
+    id = models.BigIntegerField(primary_key=True)
+    produto_id = models.BigIntegerField(db_index=True)
+    data_hora = models.DateTimeField()
+    quantidade = models.PositiveIntegerField()
+    tipo_movimentacao = models.BooleanField()
+    local = models.ForeignKey(Local, on_delete=models.PROTECT)
+    deletado_em = models.DateTimeField(null=True)
+    arquivado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.quantidade} unidades do produto {self.produto_id} arquivadas em {self.arquivado_em}"
+
+
+class EstoqueProduto(models.Model):
+
+    # Saldo materializado de cada produto, atualizado na mesma transação de cada movimentação
+    # para que as telas de estoque não precisem somar todo o histórico de movimentações
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, primary_key=True, related_name='saldo')
+    total_entradas = models.BigIntegerField(default=0)
+    total_saidas = models.BigIntegerField(default=0)
+    estoque = models.BigIntegerField(default=0)
+    contagem_entradas = models.PositiveIntegerField(default=0)
+    contagem_saidas = models.PositiveIntegerField(default=0)
+    ultima_movimentacao = models.DateTimeField(null=True)
+    # Versão das movimentações (ver versoes.MOVIMENTACAO) em que os totais foram alterados pela última vez,
+    # utilizada para enviar ao painel somente os produtos alterados (ver painel.delta_painel)
+    versao = models.BigIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.estoque} unidades em estoque do produto {self.produto.nome}"
+
+
+class MovimentacaoMensal(models.Model):
+
+    # Totais de movimentações agrupados por mês (sempre o primeiro dia do mês), atualizados a cada movimentação
+    # para que o gráfico de Entradas x Saidas e o relatório mensal não precisem percorrer todo o histórico
+    mes = models.DateField(unique=True)
+    total_entradas = models.BigIntegerField(default=0)
+    total_saidas = models.BigIntegerField(default=0)
+    contagem = models.PositiveIntegerField(default=0)
+    # Versão das movimentações em que os totais do mês foram alterados pela última vez (ver EstoqueProduto.versao)
+    versao = models.BigIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.mes.strftime('%m/%Y')}: {self.total_entradas} entradas e {self.total_saidas} saidas"
+
+
+class ContadorAlteracao(models.Model):
+
+    # Versão dos dados de cada modelo, incrementada a cada gravação, utilizada para identificar
+    # se relatórios e páginas já gerados ainda estão atualizados
+    nome = models.CharField(max_length=50, unique=True)
+    versao = models.BigIntegerField(default=0)
+    alterado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nome} na versão {self.versao}"
+
+
+class SaldoPeriodico(models.Model):
+
+    # Saldo de cada produto no inicio do dia informado em data (todas as movimentações anteriores à meia-noite
+    # desse dia, no fuso horário do projeto). Gerado pelo comando gerar_saldos_periodicos ao final de cada período
+    # com movimentações e utilizado como ponto de partida para consultar o estoque em uma data passada
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
+    data = models.DateField()
+    total_entradas = models.BigIntegerField(default=0)
+    total_saidas = models.BigIntegerField(default=0)
+    estoque = models.BigIntegerField(default=0)
+    # Saldo de abertura registrado ao desanexar as partições antigas de movimentações (ver
+    # particionamento.desanexar_particoes_expiradas). Os recálculos partem do saldo de abertura mais recente,
+    # as contagens e a última movimentação só são preenchidas nos saldos de abertura
+    abertura = models.BooleanField(default=False)
+    contagem_entradas = models.PositiveIntegerField(default=0)
+    contagem_saidas = models.PositiveIntegerField(default=0)
+    ultima_movimentacao = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'data'], name='saldo_periodico_produto_data'),
+        ]
+
+    def __str__(self):
+        return f"{self.estoque} unidades do produto {self.produto.nome} em {self.data.strftime('%d/%m/%Y')}"
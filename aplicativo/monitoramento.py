@@ -0,0 +1,120 @@
+import logging
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection
+from django.urls import resolve, reverse
+
+logger = logging.getLogger(__name__)
+
+# Monitoramento das consultas SQL executadas por requisição, agrupadas pelo nome da URL (config/urls.py).
+# O orçamento de consultas de cada view é declarado em settings.ORCAMENTO_CONSULTAS, o middleware registra
+# um aviso quando ele é ultrapassado e os testes falham através do OrcamentoConsultasMixin.
+
+# Estatísticas acumuladas por nome de URL desde o inicio do processo
+ESTATISTICAS_POR_VIEW = defaultdict(lambda: {'requisicoes': 0, 'consultas': 0, 'tempo': 0.0, 'maximo_consultas': 0})
+
+
+class RegistroConsultas:
+
+    # Registra todas as consultas executadas na conexão padrão enquanto o bloco with estiver ativo
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self._wrapper.__exit__(*args)
+
+    @property
+    def quantidade(self):
+        return len(self.consultas)
+
+    @property
+    def tempo_total(self):
+        return sum(duracao for _, duracao in self.consultas)
+
+    @property
+    def duplicadas(self):
+        # SQL executado mais de uma vez na mesma requisição, normalmente indica um padrão N+1
+        return {sql: vezes for sql, vezes in Counter(sql for sql, _ in self.consultas).items() if vezes > 1}
+
+
+def obter_orcamento(nome_url):
+    return getattr(settings, 'ORCAMENTO_CONSULTAS', {}).get(nome_url)
+
+
+class MonitorConsultasMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with RegistroConsultas() as registro:
+            response = self.get_response(request)
+
+        # Requisições que não correspondem a nenhuma URL (ex.: 404) não são contabilizadas
+        nome_url = request.resolver_match.url_name if request.resolver_match else None
+        if nome_url is None:
+            return response
+
+        estatisticas = ESTATISTICAS_POR_VIEW[nome_url]
+        estatisticas['requisicoes'] += 1
+        estatisticas['consultas'] += registro.quantidade
+        estatisticas['tempo'] += registro.tempo_total
+        estatisticas['maximo_consultas'] = max(estatisticas['maximo_consultas'], registro.quantidade)
+
+        logger.debug('%s: %d consultas em %.1fms', nome_url, registro.quantidade, registro.tempo_total * 1000)
+
+        orcamento = obter_orcamento(nome_url)
+        if orcamento is not None and registro.quantidade > orcamento:
+            logger.warning(
+                '%s executou %d consultas, acima do orçamento de %d. Consultas duplicadas: %s',
+                nome_url, registro.quantidade, orcamento, registro.duplicadas or 'nenhuma',
+            )
+
+        if settings.DEBUG:
+            response['X-Consultas-Banco'] = str(registro.quantidade)
+            response['X-Tempo-Banco'] = f'{registro.tempo_total * 1000:.1f}ms'
+
+        return response
+
+
+class OrcamentoConsultasMixin:
+
+    # Mixin para TestCase que executa uma requisição e falha caso a view ultrapasse o orçamento de consultas
+    # declarado em settings.ORCAMENTO_CONSULTAS ou execute o mesmo SQL mais de uma vez
+    def assertOrcamentoConsultas(self, nome_url, kwargs=None, metodo='get', dados=None, permitir_duplicadas=False):
+        orcamento = obter_orcamento(nome_url)
+        if orcamento is None:
+            self.fail(f'A view {nome_url} não possui orçamento declarado em ORCAMENTO_CONSULTAS.')
+
+        url = reverse(nome_url, kwargs=kwargs)
+        self.assertEqual(resolve(url).url_name, nome_url)
+
+        with RegistroConsultas() as registro:
+            response = getattr(self.client, metodo)(url, dados or {})
+            # As consultas de uma resposta em streaming só são executadas durante a leitura do conteúdo,
+            # que é lido aqui e devolvido na resposta para as verificações do teste
+            if response.streaming:
+                response.streaming_content = [b''.join(response.streaming_content)]
+
+        consultas = '\n'.join(sql for sql, _ in registro.consultas)
+        self.assertLessEqual(
+            registro.quantidade, orcamento,
+            f'{nome_url} executou {registro.quantidade} consultas, orçamento de {orcamento}:\n{consultas}'
+        )
+        if not permitir_duplicadas:
+            self.assertFalse(registro.duplicadas, f'{nome_url} executou consultas duplicadas: {registro.duplicadas}')
+
+        return response
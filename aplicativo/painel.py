@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Produto, Movimentacao, EstoqueProduto, MovimentacaoMensal
+from .indicadores import saldos_por_produto, resumo_mensal, indicadores_painel
+from . import versoes
+
+logger = logging.getLogger(__name__)
+
+# Cache dos dados calculados da página inicial (totais, gráficos de pizza por produto e série mensal).
+# A chave dos dados contém a geração atual do painel, que é incrementada sempre que uma movimentação ou um produto
+# é gravado, assim os dados antigos deixam de ser utilizados sem precisar removê-los do cache.
+# O tempo de expiração (PAINEL_CACHE_TIMEOUT) limita o tempo em que os dados podem ficar desatualizados caso uma
+# gravação não passe pelos sinais do Django (ex.: update() direto no banco) ou o cache seja local de cada processo.
+
+CHAVE_GERACAO = 'painel:geracao'
+
+# Quantidade de acertos e faltas do cache desde o inicio do processo
+ESTATISTICAS_PAINEL = Counter()
+
+
+def _obter_geracao():
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        # add não sobrescreve a geração caso outro processo tenha acabado de criá-la
+        cache.add(CHAVE_GERACAO, 1, timeout=None)
+        geracao = cache.get(CHAVE_GERACAO, 1)
+
+    return geracao
+
+
+def invalidar_painel():
+
+    # A geração só é incrementada após o commit, caso contrário uma requisição simultânea poderia calcular o painel
+    # com os dados ainda não gravados e guardá-lo na nova geração
+    def incrementar():
+        try:
+            cache.incr(CHAVE_GERACAO)
+        except ValueError:
+            # A geração ainda não existe no cache (ou expirou), qualquer valor novo invalida os dados anteriores
+            cache.set(CHAVE_GERACAO, 2, timeout=None)
+
+    transaction.on_commit(incrementar)
+
+
+# Consultas independentes que compõem o painel, uma por formato de indicador (por produto e por mês)
+CONSULTAS_PAINEL = (saldos_por_produto, resumo_mensal)
+
+
+def calcular_painel():
+    # O cursor é lido antes das consultas, assim uma gravação concluída durante o cálculo é enviada novamente
+    # na próxima atualização incremental em vez de ser perdida
+    cursor = obter_cursor_painel()
+
+    return {**indicadores_painel(*(consulta() for consulta in CONSULTAS_PAINEL)), 'cursor': cursor}
+
+
+def executar_em_thread(consulta):
+    # Cada thread utiliza a sua própria conexão com o banco, que é fechada ao final conforme o CONN_MAX_AGE,
+    # assim como acontece ao final de cada requisição
+    try:
+        return consulta()
+    finally:
+        close_old_connections()
+
+
+async def calcular_painel_concorrente():
+
+    # O Django 3.2 não possui ORM assincrono, cada consulta é executada em uma thread do pool do asgiref
+    # (thread_sensitive=False) e todas aguardadas em conjunto, assim o tempo total é o da consulta mais lenta.
+    # Cada requisição utiliza uma conexão com o banco por consulta simultânea
+    cursor = await sync_to_async(executar_em_thread, thread_sensitive=False)(obter_cursor_painel)
+    resultados = await asyncio.gather(*(
+        sync_to_async(executar_em_thread, thread_sensitive=False)(consulta) for consulta in CONSULTAS_PAINEL
+    ))
+
+    return {**indicadores_painel(*resultados), 'cursor': cursor}
+
+
+def _chave_painel():
+    return f'painel:dados:{_obter_geracao()}'
+
+
+def _registrar_acesso(painel):
+    if painel is not None:
+        ESTATISTICAS_PAINEL['acertos'] += 1
+    else:
+        ESTATISTICAS_PAINEL['faltas'] += 1
+        logger.debug('Painel calculado (%d acertos, %d faltas)', ESTATISTICAS_PAINEL['acertos'],
+                     ESTATISTICAS_PAINEL['faltas'])
+
+
+def obter_painel():
+
+    # Retorna os dados do painel da geração atual, calculando-os somente quando ainda não estão no cache
+    chave = _chave_painel()
+    painel = cache.get(chave)
+    _registrar_acesso(painel)
+    if painel is None:
+        painel = calcular_painel()
+        cache.set(chave, painel, timeout=settings.PAINEL_CACHE_TIMEOUT)
+
+    return painel
+
+
+async def obter_painel_assincrono():
+
+    # Mesmo comportamento de obter_painel, calculando as consultas do painel de forma concorrente
+    chave = await sync_to_async(_chave_painel)()
+    painel = await sync_to_async(cache.get)(chave)
+    _registrar_acesso(painel)
+    if painel is None:
+        painel = await calcular_painel_concorrente()
+        await sync_to_async(cache.set)(chave, painel, timeout=settings.PAINEL_CACHE_TIMEOUT)
+
+    return painel
+
+
+# ---- Inicio Atualização incremental do painel ----
+# A página inicial recebe um cursor com as versões das movimentações e dos produtos (versoes.MOVIMENTACAO e
+# versoes.PRODUTO) utilizadas no cálculo. A cada gravação as linhas de EstoqueProduto e MovimentacaoMensal alteradas
+# são marcadas com a versão das movimentações (ver estoque._incrementar), assim o painel é atualizado somente com os
+# produtos e meses alterados desde o cursor, sem consultar todo o histórico.
+# Os valores enviados são os totais atuais de cada produto e mês (e não a diferença), repetir uma atualização
+# não altera o resultado.
+
+
+class CursorInvalido(ValueError):
+    # Lançada quando o cursor recebido não foi gerado por obter_cursor_painel
+    pass
+
+
+def _versoes_painel():
+    contadores = versoes.obter_versoes([versoes.MOVIMENTACAO, versoes.PRODUTO])
+
+    return contadores[versoes.MOVIMENTACAO].versao, contadores[versoes.PRODUTO].versao
+
+
+def _codificar_cursor(versao_movimentacao, versao_produto):
+    return f'{versao_movimentacao}.{versao_produto}'
+
+
+def _decodificar_cursor(cursor):
+    try:
+        versao_movimentacao, versao_produto = (int(parte) for parte in cursor.split('.'))
+    except ValueError:
+        raise CursorInvalido('Cursor inválido.')
+
+    return versao_movimentacao, versao_produto
+
+
+def obter_cursor_painel():
+    return _codificar_cursor(*_versoes_painel())
+
+
+def delta_painel(cursor=None):
+
+    # Retorna os totais gerais e os produtos e meses alterados desde o cursor, ou None caso nada tenha sido alterado.
+    # Sem cursor, ou com um cursor à frente das versões atuais (ex.: banco restaurado), são retornados todos os
+    # produtos e meses com movimentações e o campo completo indica que os dados do painel devem ser substituídos
+    versao_movimentacao, versao_produto = _versoes_painel()
+    completo = cursor is None
+    if not completo:
+        cursor_movimentacao, cursor_produto = _decodificar_cursor(cursor)
+        if (cursor_movimentacao, cursor_produto) == (versao_movimentacao, versao_produto):
+            return None
+        completo = cursor_movimentacao > versao_movimentacao or cursor_produto > versao_produto
+
+    saldos = EstoqueProduto.objects.all()
+    meses = MovimentacaoMensal.objects.order_by('mes')
+    if completo:
+        saldos = saldos.filter(Q(total_entradas__gt=0) | Q(total_saidas__gt=0))
+        meses = meses.filter(contagem__gt=0)
+    else:
+        # A gravação de um produto pode ter alterado o nome exibido nos gráficos, nesse caso todos os produtos
+        # são enviados
+        if cursor_produto == versao_produto:
+            saldos = saldos.filter(versao__gt=cursor_movimentacao)
+        meses = meses.filter(versao__gt=cursor_movimentacao)
+
+    totais = EstoqueProduto.objects.aggregate(
+        total_entradas=Sum('total_entradas'), total_saidas=Sum('total_saidas'),
+        contagem_entradas=Sum('contagem_entradas'), contagem_saidas=Sum('contagem_saidas'),
+    )
+    totais = {campo: valor or 0 for campo, valor in totais.items()}
+    totais['total_estoque'] = totais['total_entradas'] - totais['total_saidas']
+
+    return {
+        'cursor': _codificar_cursor(versao_movimentacao, versao_produto),
+        'completo': completo,
+        'totais': totais,
+        # Produtos e meses que ficaram sem entradas ou saidas (estorno) são enviados zerados para serem removidos
+        'produtos': [
+            {'id': saldo['produto__pk'], 'nome': saldo['produto__nome'], 'total_entradas': saldo['total_entradas'],
+             'total_saidas': saldo['total_saidas']}
+            for saldo in saldos.values('produto__pk', 'produto__nome', 'total_entradas', 'total_saidas')
+        ],
+        'meses': [
+            {'mes_ano': mes.mes.strftime('%m/%Y'), 'total_entradas': mes.total_entradas,
+             'total_saidas': mes.total_saidas, 'contagem': mes.contagem}
+            for mes in meses
+        ],
+    }
+
+# ---- Fim Atualização incremental do painel ----
+
+
+# Inicio - Invalidação a cada gravação, a exclusão de produtos e movimentações é feita pelo campo deletado (post_save)
+@receiver(post_save, sender=Movimentacao)
+@receiver(post_delete, sender=Movimentacao)
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def _invalidar_painel_ao_gravar(sender, instance, signal, **kwargs):
+    # A remoção de registros já deletados (arquivamento) não altera o painel
+    if signal is post_delete and instance.deletado:
+        return
+
+    invalidar_painel()
+# Fim
@@ -0,0 +1,129 @@
+import re
+from datetime import date, datetime, time, timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .estoque import registrar_saldos_abertura
+
+# Manutenção das partições mensais da tabela de movimentações no PostgreSQL (ver MOVIMENTACAO_PARTICIONADA em
+# config/settings.py e a migração 0020). Cada partição contém as movimentações de um mês, pelo campo data_hora no
+# fuso horário do projeto, e a partição padrão recebe as movimentações de meses que ainda não possuem partição.
+# As consultas filtradas por data_hora (grid, exportações e estoque em uma data) leem somente as partições
+# dos meses do filtro (partition pruning).
+
+TABELA = 'aplicativo_movimentacao'
+PARTICAO_PADRAO = f'{TABELA}_padrao'
+FORMATO_PARTICAO = re.compile(rf'^{TABELA}_p(\d{{4}})(\d{{2}})$')
+
+
+def proximo_mes(mes):
+    return (mes.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def nome_particao(mes):
+    return f'{TABELA}_p{mes:%Y%m}'
+
+
+def inicio_mes(mes):
+    # Inicio do mês no fuso horário do projeto, o mesmo utilizado pelo resumo mensal
+    return timezone.make_aware(datetime.combine(mes.replace(day=1), time.min))
+
+
+def tabela_particionada():
+    # Indica se a tabela de movimentações foi convertida em uma tabela particionada
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+                       [TABELA])
+        return cursor.fetchone()[0]
+
+
+def listar_particoes():
+    # Retorna o mês de cada partição mensal anexada à tabela de movimentações, em ordem cronológica
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT particao.relname FROM pg_inherits heranca '
+            'JOIN pg_class particao ON particao.oid = heranca.inhrelid WHERE heranca.inhparent = to_regclass(%s)',
+            [TABELA],
+        )
+        nomes = [nome for nome, in cursor.fetchall()]
+
+    encontrados = (FORMATO_PARTICAO.match(nome) for nome in nomes)
+    return sorted(date(int(encontrado[1]), int(encontrado[2]), 1) for encontrado in encontrados if encontrado)
+
+
+def criar_particao(mes):
+
+    # Cria a partição do mês caso ainda não exista, retornando se ela foi criada. As movimentações do mês gravadas
+    # na partição padrão enquanto a partição não existia são transferidas para a nova partição, pois o PostgreSQL
+    # não permite criar uma partição cujas linhas estejam na partição padrão
+    nome = nome_particao(mes)
+    inicio, fim = inicio_mes(mes), inicio_mes(proximo_mes(mes))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [nome])
+        if cursor.fetchone()[0]:
+            return False
+
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {PARTICAO_PADRAO} WHERE data_hora >= %s AND data_hora < %s)',
+                       [inicio, fim])
+        pendentes = cursor.fetchone()[0]
+        if pendentes:
+            # As chaves estrangeiras são verificadas imediatamente até o fim da transação, o PostgreSQL não permite
+            # alterar uma tabela com verificações adiadas pendentes
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'ALTER TABLE {TABELA} DETACH PARTITION {PARTICAO_PADRAO}')
+
+        cursor.execute(f"CREATE TABLE {nome} PARTITION OF {TABELA} "
+                       f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')")
+
+        if pendentes:
+            cursor.execute(f'INSERT INTO {TABELA} SELECT * FROM {PARTICAO_PADRAO} '
+                           f'WHERE data_hora >= %s AND data_hora < %s', [inicio, fim])
+            cursor.execute(f'DELETE FROM {PARTICAO_PADRAO} WHERE data_hora >= %s AND data_hora < %s', [inicio, fim])
+            cursor.execute(f'ALTER TABLE {TABELA} ATTACH PARTITION {PARTICAO_PADRAO} DEFAULT')
+
+    return True
+
+
+def criar_particoes_futuras(meses_futuros):
+    # Garante as partições do mês atual e dos próximos meses, retornando os meses criados
+    mes = timezone.localdate().replace(day=1)
+    criados = []
+    for _ in range(meses_futuros + 1):
+        if criar_particao(mes):
+            criados.append(mes)
+        mes = proximo_mes(mes)
+
+    return criados
+
+
+def desanexar_particoes_expiradas(meses_retencao, remover=False):
+
+    # Desanexa as partições dos meses anteriores ao período de retenção (contado a partir do mês atual), que deixam
+    # de fazer parte da tabela de movimentações, e com remover=True apaga as tabelas desanexadas.
+    # Os saldos materializados (EstoqueProduto, MovimentacaoMensal e SaldoPeriodico) continuam contabilizando essas
+    # movimentações. Antes de desanexar é registrado o saldo de abertura de cada produto no inicio do período
+    # retido, do qual partem os recálculos (recalcular_estoque, recalcular_resumo_mensal e gerar_saldos_periodicos)
+    limite = timezone.localdate().replace(day=1)
+    for _ in range(meses_retencao):
+        limite = (limite - timedelta(days=1)).replace(day=1)
+
+    expirados = [mes for mes in listar_particoes() if mes < limite]
+    if not expirados:
+        return expirados
+
+    # Os recálculos só somam as movimentações a partir do saldo de abertura, assim uma falha ao desanexar
+    # alguma das partições não faz com que as suas movimentações sejam contabilizadas duas vezes
+    with transaction.atomic():
+        registrar_saldos_abertura(limite)
+
+    with connection.cursor() as cursor:
+        for mes in expirados:
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE {TABELA} DETACH PARTITION {nome_particao(mes)}')
+                if remover:
+                    cursor.execute(f'DROP TABLE {nome_particao(mes)}')
+
+    return expirados
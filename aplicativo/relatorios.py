@@ -0,0 +1,204 @@
+import os
+import tempfile
+import time
+from functools import lru_cache
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph)
+
+# Geração do relatório mensal de movimentações em PDF.
+# O logo e a folha de estilos são carregados uma única vez por processo e reutilizados em todos os relatórios.
+
+# Obtenha o caminho absoluto da imagem do logo dentro da pasta static
+CAMINHO_LOGO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'img', 'pdf-logo-min.png'
+)
+LARGURA_LOGO = 300
+ALTURA_LOGO = 125
+
+# Estilo fixo do cabeçalho da tabela em cinza
+ESTILO_CABECALHO = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.gray),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+]
+
+# Estilo fixo das linhas da tabela em bege com grade
+ESTILO_LINHAS = [
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+]
+
+# A tabela é dividida em blocos menores, pois o reportlab recria a tabela restante a cada quebra de página,
+# o que torna uma única tabela com muitas linhas quadraticamente mais lenta
+LINHAS_POR_TABELA = 100
+
+# Espaçamento horizontal padrão das células do reportlab (LEFTPADDING e RIGHTPADDING)
+ESPACAMENTO_CELULA = 6
+
+
+@lru_cache(maxsize=None)
+def obter_logo():
+    # A imagem é lida e decodificada somente na primeira chamada
+    return ImageReader(CAMINHO_LOGO)
+
+
+@lru_cache(maxsize=None)
+def obter_estilos():
+    return getSampleStyleSheet()
+
+
+def _desenhar_logo(canvas, doc):
+    # Desenha o logo centralizado no topo da primeira página
+    largura_pagina, altura_pagina = doc.pagesize
+    canvas.drawImage(
+        obter_logo(),
+        (largura_pagina - LARGURA_LOGO) / 2,
+        altura_pagina - doc.topMargin - ALTURA_LOGO,
+        width=LARGURA_LOGO,
+        height=ALTURA_LOGO,
+        mask='auto',
+    )
+
+
+def estilo_linhas(linhas, inicio=0):
+
+    # Calcula em uma única passada as cores das colunas de entradas (verde) e saidas (vermelho).
+    # A coluna inteira recebe a cor e somente as células zeradas são sobrescritas com preto,
+    # inicio indica a posição da primeira linha de dados na tabela
+    estilo = [
+        ('TEXTCOLOR', (1, inicio), (1, -1), colors.green),
+        ('TEXTCOLOR', (2, inicio), (2, -1), colors.red),
+    ]
+    for linha, (_, entradas, saidas) in enumerate(linhas, start=inicio):
+        if entradas <= 0:
+            estilo.append(('TEXTCOLOR', (1, linha), (1, linha), colors.black))
+        if saidas <= 0:
+            estilo.append(('TEXTCOLOR', (2, linha), (2, linha), colors.black))
+
+    return estilo
+
+
+def larguras_colunas(cabecalho, linhas):
+
+    # Largura de cada coluna pelo maior texto entre o cabeçalho e todas as linhas, calculada uma única vez
+    # para que todos os blocos da tabela tenham as mesmas colunas
+    larguras = [stringWidth(str(titulo), 'Helvetica-Bold', 12) for titulo in cabecalho]
+    for linha in linhas:
+        larguras = [max(largura, stringWidth(str(valor), 'Helvetica', 10)) for largura, valor in zip(larguras, linha)]
+
+    return [largura + 2 * ESPACAMENTO_CELULA for largura in larguras]
+
+
+def _tabelas(linhas):
+
+    # O primeiro bloco contém o cabeçalho, repetido caso o bloco continue na página seguinte,
+    # os demais continuam logo abaixo com as mesmas larguras de coluna formando uma única grade
+    cabecalho = ['Mês/Ano', 'Entradas', 'Saídas']
+    larguras = larguras_colunas(cabecalho, linhas)
+    primeiro_bloco = linhas[:LINHAS_POR_TABELA]
+    yield Table(
+        [cabecalho] + primeiro_bloco, colWidths=larguras, repeatRows=1,
+        style=TableStyle(ESTILO_LINHAS + ESTILO_CABECALHO + estilo_linhas(primeiro_bloco, inicio=1)),
+    )
+
+    for inicio in range(LINHAS_POR_TABELA, len(linhas), LINHAS_POR_TABELA):
+        bloco = linhas[inicio:inicio + LINHAS_POR_TABELA]
+        yield Table(bloco, colWidths=larguras, style=TableStyle(ESTILO_LINHAS + estilo_linhas(bloco)))
+
+
+def gerar_relatorio_mensal(linhas, destino):
+
+    # Gera o relatório no destino informado (arquivo ou stream), linhas é uma lista de (mês/ano, entradas, saidas)
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    title_style = obter_estilos()['Title']
+
+    elements = [
+        # Espaço reservado para o logo desenhado no topo da primeira página
+        Spacer(1, ALTURA_LOGO + 12),
+        Paragraph('<u><b>Total de movimentações</b></u>', title_style),
+        Spacer(1, 12),
+    ]
+    elements.extend(_tabelas(linhas))
+
+    doc.build(elements, onFirstPage=_desenhar_logo)
+
+
+def obter_relatorio_mensal_em_cache(chave, obter_linhas):
+
+    # Retorna o caminho do relatório mensal gerado para a chave (versão dos dados) informada, gerando o arquivo
+    # somente caso ele ainda não exista. obter_linhas só é chamado quando o relatório precisa ser gerado
+    diretorio = settings.RELATORIOS_CACHE_DIR
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f'movimentacoes_mensal_{chave}.pdf')
+
+    if not os.path.exists(caminho):
+        # O arquivo é gerado com um nome temporário e renomeado ao final, assim uma requisição simultânea
+        # nunca encontra um relatório gerado pela metade. Em caso de erro o arquivo temporário é removido
+        with tempfile.NamedTemporaryFile(dir=diretorio, suffix='.tmp', delete=False) as arquivo:
+            try:
+                gerar_relatorio_mensal(obter_linhas(), arquivo)
+            except BaseException:
+                arquivo.close()
+                os.remove(arquivo.name)
+                raise
+        os.replace(arquivo.name, caminho)
+
+        limpar_cache_relatorios(manter=caminho)
+
+    return caminho
+
+
+def limpar_cache_relatorios(manter=None):
+
+    # Remove os relatórios mais antigos que RELATORIOS_CACHE_IDADE_MAXIMA e, caso o total ainda ultrapasse
+    # RELATORIOS_CACHE_TAMANHO_MAXIMO, remove os menos recentes até respeitar o limite
+    diretorio = settings.RELATORIOS_CACHE_DIR
+    limite_idade = time.time() - settings.RELATORIOS_CACHE_IDADE_MAXIMA
+
+    arquivos = []
+    removidos = 0
+    for entrada in os.scandir(diretorio):
+        if not entrada.is_file() or entrada.path == manter:
+            continue
+        try:
+            informacoes = entrada.stat()
+        except FileNotFoundError:
+            continue
+
+        # Relatórios ainda em geração (.tmp) não são removidos, exceto os mais antigos que a idade máxima,
+        # deixados por um processo interrompido durante a geração
+        if entrada.name.endswith('.tmp'):
+            if informacoes.st_mtime < limite_idade:
+                _remover(entrada.path)
+                removidos += 1
+            continue
+        arquivos.append((informacoes.st_mtime, informacoes.st_size, entrada.path))
+
+    tamanho_total = sum(tamanho for _, tamanho, _ in arquivos)
+    if manter and os.path.exists(manter):
+        tamanho_total += os.path.getsize(manter)
+
+    for modificado_em, tamanho, caminho in sorted(arquivos):
+        if modificado_em >= limite_idade and tamanho_total <= settings.RELATORIOS_CACHE_TAMANHO_MAXIMO:
+            break
+        _remover(caminho)
+        tamanho_total -= tamanho
+        removidos += 1
+
+    return removidos
+
+
+def _remover(caminho):
+    # O arquivo pode ter sido removido por outro processo no mesmo instante
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from ..estaticos import PACOTES, nome_pacote
+
+register = template.Library()
+
+# Inclusão do css e do js de um pacote da página (ver aplicativo.estaticos.PACOTES), ex.: {% pacote_js 'estoque' %}.
+# Com ESTATICOS_COMPACTADOS é incluído o arquivo do pacote gerado pelo collectstatic, caso contrário os arquivos
+# do pacote são incluídos separadamente
+
+
+def _arquivos(nome, extensao):
+    if settings.ESTATICOS_COMPACTADOS:
+        return [static(nome_pacote(nome, extensao))]
+    return [static(arquivo) for arquivo in PACOTES[nome][extensao]]
+
+
+@register.simple_tag
+def pacote_css(nome):
+    return format_html_join('\n', '<link href="{}" rel="stylesheet">', ((url,) for url in _arquivos(nome, 'css')))
+
+
+@register.simple_tag
+def pacote_js(nome):
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in _arquivos(nome, 'js')))
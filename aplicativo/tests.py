@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import time
+import copy
+import csv
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q, Sum
+from django.contrib.staticfiles import finders
+from django.http import HttpResponseNotFound
+from django.template import Context, Template
+from django.test import (AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings, skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from .models import (Produto, Movimentacao, EstoqueProduto, MovimentacaoMensal, Local, ProdutoArquivado,
+                     MovimentacaoArquivada, SaldoPeriodico)
+from .estoque import (registrar_movimentacao, atualizar_movimentacao, EstoqueInsuficiente,
+                      recalcular_saldos_periodicos, obter_saldo_em, recalcular_saldos, recalcular_resumos_mensais,
+                      registrar_saldos_abertura, obter_corte_historico, reservar_saida)
+from .dados_sinteticos import gerar_dados
+from .exclusao import (excluir_movimentacoes, restaurar_movimentacoes, excluir_produtos, restaurar_produtos,
+                       NomeEmUso)
+from .forms import MovimentacaoForm
+from .busca import buscar_produtos
+from .monitoramento import OrcamentoConsultasMixin, RegistroConsultas, obter_orcamento
+from .locais import obter_local, resolver_locais, LocalInvalido
+from .importacao import importar_movimentacoes
+from .indicadores import (saldos_por_produto, resumo_mensal, indicadores_painel, linhas_relatorio_mensal,
+                          saldos_por_local)
+from .arquivamento import arquivar_deletados, desarquivar_movimentacoes
+from .particionamento import (tabela_particionada, criar_particao, listar_particoes, desanexar_particoes_expiradas,
+                              nome_particao, inicio_mes, PARTICAO_PADRAO)
+from .painel import ESTATISTICAS_PAINEL, CONSULTAS_PAINEL, CursorInvalido
+from .layout import identificador_implantacao
+from .relatorios import (gerar_relatorio_mensal, obter_relatorio_mensal_em_cache, limpar_cache_relatorios, _tabelas,
+                         LINHAS_POR_TABELA)
+from .estaticos import PACOTES, EstaticosMiddleware, montar_pacote
+from .eventos import CAMINHO_EVENTOS, aplicacao_com_eventos
+from . import versoes
+from .versoes import incrementar_versao, obter_versao
 
-# Create your tests here.
+# Os testes utilizam o cache em memória, evitando reaproveitar dados gravados no cache em arquivos
+CACHE_TESTES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'layout': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'layout'},
+}
+
+
+# ---- Inicio Estoque ----
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ReservaSaidaConcorrenteTest(TransactionTestCase):
+
+    # Estoque inicial do produto e quantidade de saidas tentadas por cada thread, o total de tentativas
+    # é sempre maior que o estoque para que as threads disputem as últimas unidades
+    estoque_inicial = 200
+    saidas_por_thread = 400
+
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        self.local = obter_local('Estoque')
+        with transaction.atomic():
+            entrada = Movimentacao.objects.create(
+                produto=self.produto, quantidade=self.estoque_inicial, local=self.local, tipo_movimentacao=True
+            )
+            registrar_movimentacao(entrada)
+
+    def _efetuar_saida(self):
+        # Mesmo caminho de gravação utilizado pela view create_movimentacao
+        try:
+            with transaction.atomic():
+                saida = Movimentacao.objects.create(
+                    produto=self.produto, quantidade=1, local=self.local, tipo_movimentacao=False
+                )
+                registrar_movimentacao(saida)
+        except EstoqueInsuficiente:
+            return False
+
+        return True
+
+    def _executar_thread(self, tentativas):
+        try:
+            return sum(self._efetuar_saida() for _ in range(tentativas))
+        finally:
+            connection.close()
+
+    def _executar_concorrente(self, escritores):
+        # A vazão das saidas simultâneas é medida pelo comando benchmark_saidas_concorrentes
+        tentativas = max(self.saidas_por_thread // escritores, 1)
+        with ThreadPoolExecutor(max_workers=escritores) as executor:
+            return sum(executor.map(self._executar_thread, [tentativas] * escritores))
+
+    def _verificar_sem_estoque_negativo(self, aceitas):
+        saldo = EstoqueProduto.objects.get(produto=self.produto)
+        total_saidas = Movimentacao.objects.filter(
+            produto=self.produto, tipo_movimentacao=False, deletado=False
+        ).aggregate(total=Sum('quantidade'))['total']
+
+        self.assertEqual(aceitas, self.estoque_inicial)
+        self.assertEqual(total_saidas, self.estoque_inicial)
+        self.assertEqual(saldo.total_saidas, self.estoque_inicial)
+        self.assertEqual(saldo.estoque, 0)
+
+    def test_1_escritor(self):
+        self._verificar_sem_estoque_negativo(self._executar_concorrente(1))
+
+    def test_8_escritores(self):
+        self._verificar_sem_estoque_negativo(self._executar_concorrente(8))
+
+    def test_32_escritores(self):
+        self._verificar_sem_estoque_negativo(self._executar_concorrente(32))
+
+
+
+class ReservaSaidaTest(TestCase):
+
+    # Executado em qualquer banco: a verificação do estoque e a baixa acontecem no mesmo UPDATE condicional, uma
+    # saida maior que o estoque no momento da gravação não altera nenhuma linha
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        with transaction.atomic():
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=self.produto, quantidade=5, local=obter_local('Estoque'), tipo_movimentacao=True
+            ))
+
+    def test_update_condicional(self):
+        with CaptureQueriesContext(connection) as consultas:
+            with self.assertRaises(EstoqueInsuficiente):
+                reservar_saida(self.produto.pk, 6)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('"estoque" >=', consultas[0]['sql'])
+
+        # Após a baixa de 3 itens uma nova saida de 3 itens não encontra estoque suficiente
+        reservar_saida(self.produto.pk, 3)
+        with self.assertRaises(EstoqueInsuficiente):
+            reservar_saida(self.produto.pk, 3)
+
+        saldo = EstoqueProduto.objects.get(produto=self.produto)
+        self.assertEqual((saldo.estoque, saldo.total_saidas, saldo.contagem_saidas), (2, 3, 1))
+
+        # O estoque pode chegar a zero, nunca ficar negativo
+        reservar_saida(self.produto.pk, 2)
+        with self.assertRaises(EstoqueInsuficiente):
+            reservar_saida(self.produto.pk, 1)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produto).estoque, 0)
+
+# ---- Fim Estoque ----
+
+
+# ---- Inicio Orçamento de consultas ----
+
+
+class OrcamentoConsultasTest(OrcamentoConsultasMixin, TestCase):
+
+    # Cada view é executada com vários produtos e movimentações cadastrados, assim uma consulta por linha
+    # (N+1) ultrapassa o orçamento declarado em settings.ORCAMENTO_CONSULTAS ou aparece como consulta duplicada
+    def setUp(self):
+        # Os relatórios gerados durante os testes são gravados em um diretório temporário
+        diretorio_relatorios = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio_relatorios.cleanup)
+        configuracao = self.settings(RELATORIOS_CACHE_DIR=diretorio_relatorios.name, CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(3)
+        ]
+        for produto in self.produtos:
+            for mes in range(1, 4):
+                for tipo_movimentacao, quantidade in ((True, 10), (False, 2)):
+                    with transaction.atomic():
+                        movimentacao = Movimentacao.objects.create(
+                            produto=produto, quantidade=quantidade, local=obter_local('Estoque'),
+                            tipo_movimentacao=tipo_movimentacao,
+                            data_hora=datetime(2023, mes, 10, 10, tzinfo=timezone.utc),
+                        )
+                        registrar_movimentacao(movimentacao)
+
+        self.produto = self.produtos[0]
+        self.movimentacao = Movimentacao.objects.filter(produto=self.produto, tipo_movimentacao=True).first()
+
+    def _dados_movimentacao(self, **dados):
+        return {
+            'produto': self.produto.pk, 'quantidade': 1, 'local': 'Estoque',
+            'tipo_movimentacao': 'False', 'data_hora': '2023-03-15 10:00', **dados
+        }
+
+    def test_listagens(self):
+        for nome_url in ('index', 'produto', 'stock_produto', 'movimentacao', 'grid_movimentacao',
+                         'create_produto', 'create_movimentacao', 'export_pdf_movimentacao',
+                         'export_csv_movimentacao', 'export_xlsx_movimentacao', 'stock_produto_em', 'stock_local',
+                         'api_autocomplete_produto'):
+            with self.subTest(nome_url=nome_url):
+                response = self.assertOrcamentoConsultas(nome_url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_produto(self):
+        dados = {'nome': 'Produto Novo', 'fabricante': 'Fabricante', 'tipo': 'Tipo', 'ativo': 'on'}
+        self.assertOrcamentoConsultas('create_produto', metodo='post', dados=dados)
+        self.assertOrcamentoConsultas('edit_produto', kwargs={'pk': self.produto.pk})
+        self.assertOrcamentoConsultas('edit_produto', kwargs={'pk': self.produto.pk}, metodo='post',
+                                      dados={**dados, 'nome': 'Produto Editado'})
+        # A exclusão do produto exclui as suas movimentações, executando um incremento por mês do resumo mensal
+        self.assertOrcamentoConsultas('delete_produto', kwargs={'pk': self.produto.pk}, permitir_duplicadas=True)
+
+    def test_movimentacao(self):
+        response = self.assertOrcamentoConsultas('create_movimentacao', metodo='post', dados=self._dados_movimentacao())
+        self.assertEqual(response.status_code, 302)
+
+        # Primeira movimentação de um mês ainda sem resumo
+        self.assertOrcamentoConsultas('create_movimentacao', metodo='post',
+                                      dados=self._dados_movimentacao(data_hora='2023-09-15 10:00'))
+
+        self.assertOrcamentoConsultas('edit_movimentacao', kwargs={'pk': self.movimentacao.pk})
+
+        # A edição estorna e registra a movimentação, executando os mesmos comandos com valores diferentes
+        response = self.assertOrcamentoConsultas(
+            'edit_movimentacao', kwargs={'pk': self.movimentacao.pk}, metodo='post',
+            dados=self._dados_movimentacao(tipo_movimentacao='True', data_hora='2023-10-15 10:00'),
+            permitir_duplicadas=True,
+        )
+        self.assertEqual(response.status_code, 302)
+
+        self.assertOrcamentoConsultas('delete_movimentacao', kwargs={'pk': self.movimentacao.pk})
+
+    def test_estoque_em(self):
+        response = self.assertOrcamentoConsultas('stock_produto_em', dados={'produto': self.produto.pk,
+                                                                             'data': '2023-02-15'})
+        self.assertEqual(response.context['saldo']['estoque'], 16)
+
+        response = self.assertOrcamentoConsultas('api_stock_produto_em', kwargs={'pk': self.produto.pk},
+                                                 dados={'data': '2023-03-31'})
+        self.assertEqual(response.json()['estoque'], 24)
+
+    def test_listagens_condicionais(self):
+        for nome_url in ('produto', 'stock_produto', 'movimentacao'):
+            with self.subTest(nome_url=nome_url):
+                etag = self.client.get(reverse(nome_url))['ETag']
+
+                # Sem alterações a resposta 304 consulta somente os contadores de alteração
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse(nome_url), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+        # Após cadastrar um produto as páginas que dependem dos produtos são renderizadas novamente
+        etag = self.client.get(reverse('produto'))['ETag']
+        self.client.post(reverse('create_produto'),
+                         {'nome': 'Produto Novo', 'fabricante': 'Fabricante', 'tipo': 'Tipo', 'ativo': 'on'})
+        response = self.client.get(reverse('produto'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Produto cadastrado com sucesso.')
+        self.assertNotEqual(self.client.get(reverse('produto'))['ETag'], etag)
+
+    def test_listagens_condicionais_implantacao_e_csrf(self):
+        response = self.client.get(reverse('produto'))
+        etag = response['ETag']
+        self.assertIn('Cookie', response['Vary'])
+
+        # Uma nova implantação (templates ou arquivos estáticos diferentes) invalida as páginas em cache
+        try:
+            with self.settings(VERSAO_IMPLANTACAO='nova-versao'):
+                identificador_implantacao.cache_clear()
+                response = self.client.get(reverse('produto'), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('nova-versao', response['ETag'])
+        finally:
+            identificador_implantacao.cache_clear()
+
+        # A renovação do cookie CSRF também invalida as páginas com formulários
+        etag = self.client.get(reverse('produto'))['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.client.get(reverse('produto'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Com o mesmo cookie a resposta 304 continua consultando somente os contadores de alteração
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('produto'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_importacao(self):
+        self.assertOrcamentoConsultas('import_movimentacao')
+
+        # Um lote com dois produtos e dois meses executa um incremento por produto e por mês
+        csv = '\n'.join([
+            'produto,tipo_movimentacao,quantidade,local,data_hora',
+            'Produto 1,entrada,10,Estoque,01/04/2023 10:00',
+            'Produto 1,saida,5,Estoque,02/04/2023 10:00',
+            'Produto 2,entrada,10,Estoque,01/05/2023 10:00',
+            'Produto 2,saida,50,Estoque,02/05/2023 10:00',
+        ])
+        response = self.assertOrcamentoConsultas(
+            'import_movimentacao', metodo='post', permitir_duplicadas=True,
+            dados={'arquivo': SimpleUploadedFile('movimentacoes.csv', csv.encode()), 'tamanho_lote': 100},
+        )
+        self.assertEqual(response.context['resultado'].importadas, 3)
+        self.assertEqual(response.context['resultado'].rejeitadas[0][0], 5)
+
+
+class OrcamentoPrimeiraGravacaoTest(OrcamentoConsultasMixin, TestCase):
+
+    def test_primeira_movimentacao(self):
+        # Em um banco sem movimentações, locais e contadores a primeira gravação cadastra o local, o contador de
+        # alteração, o saldo do produto e o resumo do mês, o pior caso do orçamento
+        produto = Produto.objects.create(nome='Produto 1', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        response = self.assertOrcamentoConsultas('create_movimentacao', metodo='post', dados={
+            'produto': produto.pk, 'quantidade': 1, 'local': 'Estoque', 'tipo_movimentacao': 'True',
+            'data_hora': '2023-03-15 10:00',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(EstoqueProduto.objects.get(produto=produto).estoque, 1)
+        self.assertEqual(MovimentacaoMensal.objects.get().contagem, 1)
+
+# ---- Fim Orçamento de consultas ----
+
+
+# ---- Inicio Cache do painel ----
+
+
+class PainelCacheTest(TestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+
+    def _registrar_entrada(self, quantidade):
+        # A invalidação do painel é executada após o commit da transação
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                registrar_movimentacao(Movimentacao.objects.create(
+                    produto=self.produto, quantidade=quantidade, local=obter_local('Estoque'), tipo_movimentacao=True
+                ))
+
+    def test_acerto_e_invalidacao(self):
+        self._registrar_entrada(10)
+        acertos, faltas = ESTATISTICAS_PAINEL['acertos'], ESTATISTICAS_PAINEL['faltas']
+
+        self.assertEqual(self.client.get(reverse('index')).context['total_entradas'], 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('index')).context['total_entradas'], 10)
+        self.assertEqual(ESTATISTICAS_PAINEL['faltas'] - faltas, 1)
+        self.assertEqual(ESTATISTICAS_PAINEL['acertos'] - acertos, 1)
+
+        # Uma nova movimentação invalida o painel em cache
+        self._registrar_entrada(5)
+        self.assertEqual(self.client.get(reverse('index')).context['total_entradas'], 15)
+
+# ---- Fim Cache do painel ----
+
+
+# ---- Inicio Saldos periódicos ----
+
+
+class SaldoPeriodicoTest(TestCase):
+
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        self.movimentacoes = [
+            self._registrar(True, 100, datetime(2023, 1, 10, 12, tzinfo=timezone.utc)),
+            self._registrar(False, 30, datetime(2023, 2, 10, 12, tzinfo=timezone.utc)),
+            self._registrar(True, 50, datetime(2023, 3, 10, 12, tzinfo=timezone.utc)),
+            self._registrar(False, 20, datetime(2023, 4, 10, 12, tzinfo=timezone.utc)),
+        ]
+        recalcular_saldos_periodicos('mensal')
+
+    def _registrar(self, tipo_movimentacao, quantidade, data_hora):
+        with transaction.atomic():
+            movimentacao = Movimentacao.objects.create(
+                produto=self.produto, quantidade=quantidade, local=obter_local('Estoque'),
+                tipo_movimentacao=tipo_movimentacao, data_hora=data_hora
+            )
+            registrar_movimentacao(movimentacao)
+
+        return movimentacao
+
+    def _saldo_completo(self, data):
+        # Soma de todo o histórico até o final do dia, utilizada para conferir o saldo a partir dos saldos periódicos
+        return sum(
+            movimentacao.quantidade if movimentacao.tipo_movimentacao else -movimentacao.quantidade
+            for movimentacao in Movimentacao.objects.filter(produto=self.produto, deletado=False)
+            if movimentacao.data_hora.date() <= data
+        )
+
+    def _verificar(self, *datas):
+        for data in datas:
+            with self.subTest(data=data):
+                self.assertEqual(obter_saldo_em(self.produto.pk, data)['estoque'], self._saldo_completo(data))
+
+    def test_saldo_em(self):
+        saldo = obter_saldo_em(self.produto.pk, date(2023, 3, 20))
+        self.assertEqual(saldo['estoque'], 120)
+        self.assertEqual(saldo['saldo_periodico'], date(2023, 3, 1))
+        self.assertEqual(saldo['movimentacoes_somadas'], 1)
+        self._verificar(date(2022, 12, 31), date(2023, 1, 31), date(2023, 2, 28), date(2023, 5, 1))
+
+    def test_edicao_retroativa(self):
+        # A saida de abril é editada para janeiro, alterando os saldos periódicos de fevereiro em diante
+        with transaction.atomic():
+            movimentacao = self.movimentacoes[3]
+            anterior = copy.copy(movimentacao)
+            movimentacao.data_hora = datetime(2023, 1, 20, 12, tzinfo=timezone.utc)
+            movimentacao.save()
+            atualizar_movimentacao(anterior, movimentacao)
+
+        self._verificar(date(2023, 1, 15), date(2023, 1, 31), date(2023, 2, 28), date(2023, 3, 31), date(2023, 4, 30))
+
+# ---- Fim Saldos periódicos ----
+
+
+# ---- Inicio Locais ----
+
+
+class LocalTest(TestCase):
+
+    def test_grafias_equivalentes(self):
+        # Acentos, maiúsculas e espaços não criam locais duplicados, o primeiro nome informado é mantido
+        # (com os espaços repetidos removidos)
+        local = obter_local('Depósito  Central')
+        for nome in ('deposito central', ' DEPÓSITO CENTRAL ', 'Deposito Central'):
+            with self.subTest(nome=nome):
+                self.assertEqual(obter_local(nome).pk, local.pk)
+
+        self.assertEqual(Local.objects.count(), 1)
+        self.assertEqual(Local.objects.get().nome, 'Depósito Central')
+
+        locais = resolver_locais(['Loja 01', 'loja 01', 'Depósito Central'])
+        self.assertEqual(locais['Loja 01'], locais['loja 01'])
+        self.assertEqual(locais['Depósito Central'], local.pk)
+        self.assertEqual(Local.objects.count(), 2)
+
+    def test_outros_alfabetos(self):
+        # Somente os acentos são removidos, locais em outros alfabetos não são unificados entre si
+        nomes = ('Склад', 'Магазин', '倉庫', '店舗', 'Straße')
+        locais = {nome: obter_local(nome).pk for nome in nomes}
+        self.assertEqual(len(set(locais.values())), len(nomes))
+        self.assertEqual(obter_local('СКЛАД').pk, locais['Склад'])
+        self.assertEqual(obter_local('STRASSE').pk, locais['Straße'])
+        self.assertEqual(resolver_locais(['倉庫', '店舗']), {'倉庫': locais['倉庫'], '店舗': locais['店舗']})
+
+        # Um nome sem nenhum caractere além de acentos não resulta em uma chave
+        with self.assertRaises(LocalInvalido):
+            obter_local('\u0301')
+        produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        form = MovimentacaoForm({'produto': produto.pk, 'quantidade': 1, 'local': '\u0301\u0301',
+                                 'tipo_movimentacao': 'True', 'data_hora': '2023-03-15 10:00'})
+        self.assertIn('local', form.errors)
+
+    def test_migracao_recalcula_chaves(self):
+        # Locais cadastrados com a normalização anterior, que removia os caracteres fora do ASCII
+        migracao = importlib.import_module('aplicativo.migrations.0025_recalcular_chave_locais')
+        Local.objects.create(nome='Склад', chave='')
+        Local.objects.create(nome='Depósito', chave='deposito')
+        Local.objects.create(nome='Straße', chave='strae')
+        Local.objects.create(nome='Strasse', chave='strasse')
+
+        migracao.recalcular_chaves(django_apps, None)
+        self.assertEqual(
+            dict(Local.objects.values_list('nome', 'chave')),
+            {'Склад': 'склад', 'Depósito': 'deposito', 'Straße': 'strae', 'Strasse': 'strasse'},
+        )
+
+    def test_estoque_por_local(self):
+        produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        for nome, tipo_movimentacao, quantidade in (('Loja 01', True, 10), ('Loja 01', False, 4), ('Loja 02', True, 7)):
+            Movimentacao.objects.create(produto=produto, quantidade=quantidade, local=obter_local(nome),
+                                        tipo_movimentacao=tipo_movimentacao)
+
+        self.assertEqual(
+            [(saldo['local'], saldo['estoque']) for saldo in saldos_por_local()], [('Loja 01', 6), ('Loja 02', 7)]
+        )
+        self.assertEqual(
+            [saldo['estoque'] for saldo in saldos_por_local(obter_local('loja 02').pk)], [7]
+        )
+
+# ---- Fim Locais ----
+
+
+# ---- Inicio Arquivamento ----
+
+
+class ArquivamentoTest(TestCase):
+
+    def setUp(self):
+        self.local = obter_local('Estoque')
+        self.antigo = datetime(2023, 1, 10, 12, tzinfo=timezone.utc)
+        self.limite = datetime(2023, 6, 1, tzinfo=timezone.utc)
+
+        # Produto deletado sem movimentações restantes, produto deletado com uma movimentação não deletada
+        # e produto deletado depois da data limite
+        self.produto_sem_movimentacoes = self._produto('Produto Antigo', self.antigo)
+        self.produto_com_movimentacao = self._produto('Produto Com Movimentação', self.antigo)
+        self.produto_recente = self._produto('Produto Recente', datetime(2023, 7, 1, tzinfo=timezone.utc))
+
+        self.movimentacao_ativa = self._movimentacao(self.produto_com_movimentacao, None)
+        self.movimentacao_deletada = self._movimentacao(self.produto_sem_movimentacoes, self.antigo)
+
+    def _produto(self, nome, deletado_em):
+        return Produto.objects.create(nome=nome, fabricante='Fabricante', tipo='Tipo', ativo=True,
+                                      deletado=True, deletado_em=deletado_em)
+
+    def _movimentacao(self, produto, deletado_em):
+        return Movimentacao.objects.create(produto=produto, quantidade=10, local=self.local, tipo_movimentacao=True,
+                                           deletado=deletado_em is not None, deletado_em=deletado_em)
+
+    def test_manager_padrao(self):
+        self.assertFalse(Produto.objects.filter(pk=self.produto_recente.pk).exists())
+        self.assertTrue(Produto.todos.filter(pk=self.produto_recente.pk).exists())
+        self.assertEqual(list(Movimentacao.objects.all()), [self.movimentacao_ativa])
+        # O produto deletado continua acessível pela movimentação
+        self.assertEqual(Movimentacao.objects.get().produto, self.produto_com_movimentacao)
+
+    def test_arquivar_e_desarquivar(self):
+        self.assertEqual(arquivar_deletados(self.limite, tamanho_lote=1), {'movimentacoes': 1, 'produtos': 1})
+
+        self.assertEqual(
+            set(Produto.todos.values_list('pk', flat=True)),
+            {self.produto_com_movimentacao.pk, self.produto_recente.pk},
+        )
+        self.assertEqual(list(Movimentacao.todos.all()), [self.movimentacao_ativa])
+        self.assertEqual(MovimentacaoArquivada.objects.get().produto_id, self.produto_sem_movimentacoes.pk)
+
+        # A movimentação volta com o mesmo id, ainda deletada, junto do seu produto arquivado
+        self.assertEqual(desarquivar_movimentacoes([self.movimentacao_deletada.pk]), 1)
+        movimentacao = Movimentacao.todos.get(pk=self.movimentacao_deletada.pk)
+        self.assertTrue(movimentacao.deletado)
+        self.assertEqual(movimentacao.deletado_em, self.antigo)
+        self.assertEqual(movimentacao.produto.nome, 'Produto Antigo')
+        self.assertTrue(movimentacao.produto.deletado)
+        self.assertFalse(ProdutoArquivado.objects.exists())
+        self.assertFalse(MovimentacaoArquivada.objects.exists())
+
+    def test_produto_com_saldo_de_abertura(self):
+        # Após desanexar as partições antigas o saldo de abertura é o único registro do histórico do produto,
+        # o produto não é arquivado para que o saldo não seja removido junto com ele
+        SaldoPeriodico.objects.create(produto=self.produto_sem_movimentacoes, data=date(2023, 1, 1), abertura=True,
+                                      total_entradas=10, estoque=10, contagem_entradas=1)
+        self.assertEqual(arquivar_deletados(self.limite), {'movimentacoes': 1, 'produtos': 0})
+        self.assertTrue(Produto.todos.filter(pk=self.produto_sem_movimentacoes.pk).exists())
+        self.assertEqual(SaldoPeriodico.objects.get(produto=self.produto_sem_movimentacoes).estoque, 10)
+
+        # Saldos periódicos comuns são recalculados a partir das movimentações e não impedem o arquivamento
+        SaldoPeriodico.objects.update(abertura=False)
+        self.assertEqual(arquivar_deletados(self.limite), {'movimentacoes': 0, 'produtos': 1})
+
+# ---- Fim Arquivamento ----
+
+
+# ---- Inicio Particionamento ----
+
+
+class ParticionamentoTest(TestCase):
+
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        self.local = obter_local('Estoque')
+
+    def test_sem_particionamento(self):
+        # No SQLite (ou sem MOVIMENTACAO_PARTICIONADA) a tabela não é particionada e o comando não altera o banco
+        if tabela_particionada():
+            self.skipTest('A tabela de movimentações está particionada.')
+
+        saida = io.StringIO()
+        call_command('manter_particoes', stdout=saida)
+        self.assertIn('não está particionada', saida.getvalue())
+
+    def test_particoes(self):
+        # Executado somente no PostgreSQL com MOVIMENTACAO_PARTICIONADA ativo, ex.: com um banco local de testes
+        if not tabela_particionada():
+            self.skipTest('A tabela de movimentações não está particionada.')
+
+        # A movimentação de um mês ainda sem partição é gravada na partição padrão e transferida ao criar a partição
+        mes = date(2099, 1, 1)
+        movimentacao = Movimentacao.objects.create(
+            produto=self.produto, quantidade=10, local=self.local, tipo_movimentacao=True,
+            data_hora=datetime(2099, 1, 15, 12, tzinfo=timezone.utc),
+        )
+        self.assertTrue(criar_particao(mes))
+        self.assertFalse(criar_particao(mes))
+        self.assertIn(mes, listar_particoes())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {nome_particao(mes)}')
+            self.assertEqual(cursor.fetchall(), [(movimentacao.pk,)])
+
+        # O filtro por data lê somente a partição do mês
+        plano = Movimentacao.objects.filter(
+            data_hora__gte=inicio_mes(mes), data_hora__lt=inicio_mes(date(2099, 2, 1))
+        ).explain()
+        self.assertIn(nome_particao(mes), plano)
+        self.assertNotIn(PARTICAO_PADRAO, plano)
+
+        # Partições anteriores ao período de retenção são desanexadas
+        antigo = date(2000, 1, 1)
+        criar_particao(antigo)
+        self.assertIn(antigo, desanexar_particoes_expiradas(12))
+        self.assertNotIn(antigo, listar_particoes())
+        self.assertIn(mes, listar_particoes())
+        # O saldo de abertura é registrado no inicio do período retido
+        self.assertGreater(obter_corte_historico(), antigo)
+
+
+class SaldoAberturaTest(TestCase):
+
+    def setUp(self):
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(2)
+        ]
+        for produto, tipo_movimentacao, quantidade, mes in (
+            (self.produtos[0], True, 10, 1), (self.produtos[0], False, 2, 1), (self.produtos[1], True, 7, 1),
+            (self.produtos[0], True, 5, 2), (self.produtos[0], False, 1, 3),
+        ):
+            self._registrar(produto, tipo_movimentacao, quantidade, mes)
+        recalcular_saldos_periodicos()
+
+    def _registrar(self, produto, tipo_movimentacao, quantidade, mes):
+        with transaction.atomic():
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=produto, quantidade=quantidade, local=obter_local('Estoque'),
+                tipo_movimentacao=tipo_movimentacao, data_hora=datetime(2023, mes, 10, 10, tzinfo=timezone.utc)
+            ))
+
+    def _desanexar(self, corte):
+        # Simula desanexar_particoes_expiradas, que só está disponível no PostgreSQL particionado: as movimentações
+        # anteriores ao saldo de abertura deixam de fazer parte da tabela
+        registrar_saldos_abertura(corte)
+        Movimentacao.todos.filter(data_hora__lt=datetime.combine(corte, datetime.min.time(), timezone.utc)).delete()
+
+    def _totais(self):
+        return (
+            list(EstoqueProduto.objects.order_by('produto_id').values_list(
+                'produto_id', 'total_entradas', 'total_saidas', 'estoque', 'contagem_entradas', 'contagem_saidas',
+                'ultima_movimentacao')),
+            list(MovimentacaoMensal.objects.filter(contagem__gt=0).order_by('mes').values_list(
+                'mes', 'total_entradas', 'total_saidas', 'contagem')),
+            list(SaldoPeriodico.objects.order_by('produto_id', 'data').values_list(
+                'produto_id', 'data', 'total_entradas', 'total_saidas', 'estoque')),
+        )
+
+    def assertRecalculoMantemTotais(self):
+        totais = self._totais()
+        recalcular_saldos()
+        recalcular_resumos_mensais()
+        recalcular_saldos_periodicos()
+        self.assertEqual(totais, self._totais())
+
+    def test_recalculo_apos_desanexar(self):
+        self._desanexar(date(2023, 2, 1))
+        self.assertEqual(obter_corte_historico(), date(2023, 2, 1))
+        self.assertEqual(Movimentacao.objects.count(), 2)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[1]).estoque, 7)
+        self.assertRecalculoMantemTotais()
+
+        # Uma movimentação retroativa anterior ao saldo de abertura (gravada na partição padrão) altera o saldo
+        # de abertura, inclusive as contagens
+        self._registrar(self.produtos[1], False, 3, 1)
+        self.assertEqual(
+            SaldoPeriodico.objects.filter(produto=self.produtos[1], data=date(2023, 2, 1), abertura=True)
+            .values_list('estoque', 'contagem_entradas', 'contagem_saidas').get(),
+            (4, 1, 1)
+        )
+        self.assertRecalculoMantemTotais()
+
+        # Um novo saldo de abertura parte do anterior, um saldo anterior ao atual não é registrado
+        self._desanexar(date(2023, 3, 1))
+        self.assertEqual(registrar_saldos_abertura(date(2023, 2, 1)), 0)
+        self.assertEqual(Movimentacao.objects.count(), 1)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 12)
+        self.assertRecalculoMantemTotais()
+        self.assertEqual(obter_saldo_em(self.produtos[0].pk, date(2023, 3, 31))['estoque'], 12)
+
+# ---- Fim Particionamento ----
+
+
+# ---- Inicio Nome único dos produtos ----
+
+
+class NomeProdutoUnicoTest(TestCase):
+
+    def _criar(self, nome, deletado=False):
+        return Produto.objects.create(nome=nome, fabricante='Fabricante', tipo='Tipo', ativo=True, deletado=deletado)
+
+    def test_indice_unico(self):
+        # O índice produto_nome_unico_ativo existe em todos os bancos, inclusive no SQLite (ver migração 0026)
+        self._criar('Caneta')
+        self._criar('CANETA', deletado=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._criar('caneta')
+
+    def test_migracao_renomeia_duplicados(self):
+        # Banco existente com nomes repetidos cadastrados antes da criação do índice
+        migracao = importlib.import_module('aplicativo.migrations.0013_indices_consultas')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX produto_nome_unico_ativo')
+        produtos = [self._criar('Caneta'), self._criar('CANETA'), self._criar('caneta', deletado=True),
+                    self._criar('Lápis'), self._criar('x' * 255), self._criar('X' * 255)]
+
+        migracao.renomear_duplicados(django_apps, None)
+        self.assertEqual(
+            [Produto.todos.get(pk=produto.pk).nome for produto in produtos],
+            ['Caneta', f'CANETA ({produtos[1].pk})', 'caneta', 'Lápis', 'x' * 255,
+             'X' * (255 - len(f' ({produtos[5].pk})')) + f' ({produtos[5].pk})'],
+        )
+
+        # Sem nomes repetidos o índice é criado
+        with connection.cursor() as cursor:
+            cursor.execute(migracao.Migration.operations[-1].sql)
+
+# ---- Fim Nome único dos produtos ----
+
+
+# ---- Inicio Busca de produtos ----
+
+
+class AutocompleteProdutoTest(TestCase):
+
+    def setUp(self):
+        for nome, fabricante, ativo in (('Parafuso Sextavado', 'Acme', True), ('Arruela', 'Parafusos Brasil', True),
+                                        ('Parafuso Inativo', 'Acme', False), ('Porca', 'Globex', True)):
+            Produto.objects.create(nome=nome, fabricante=fabricante, tipo='Tipo', ativo=ativo)
+
+    def _buscar(self, **parametros):
+        response = self.client.get(reverse('api_autocomplete_produto'), parametros)
+        self.assertEqual(response.status_code, 200)
+
+        return [produto['nome'] for produto in response.json()['resultados']]
+
+    def test_busca(self):
+        # Os produtos cujo nome começa com o termo vêm antes dos que só contêm o termo (no fabricante)
+        self.assertEqual(self._buscar(q='parafuso'), ['Parafuso Sextavado', 'Arruela'])
+        self.assertEqual(self._buscar(q='GLOBEX'), ['Porca'])
+        self.assertEqual(self._buscar(), ['Arruela', 'Parafuso Sextavado', 'Porca'])
+        self.assertEqual(self._buscar(limite=1), ['Arruela'])
+
+    def test_formulario_com_produto_selecionado(self):
+        # A edição renderiza somente a opção do produto da movimentação, mesmo que ele esteja inativo
+        inativo = Produto.objects.get(nome='Parafuso Inativo')
+        movimentacao = Movimentacao.objects.create(produto=inativo, quantidade=1, local=obter_local('Estoque'),
+                                                   tipo_movimentacao=True)
+        html = str(MovimentacaoForm(instance=movimentacao)['produto'])
+        self.assertIn('Parafuso Inativo', html)
+        self.assertNotIn('Porca', html)
+        self.assertIn(reverse('api_autocomplete_produto'), html)
+
+        self.assertEqual(str(MovimentacaoForm()['produto']).count('<option'), 1)
+
+
+class BuscaProdutoTest(TestCase):
+
+    def setUp(self):
+        for nome, fabricante, tipo, descricao in (
+            ('Parafuso Sextavado', 'Acme', 'Fixação', None),
+            ('Arruela Lisa', 'Parafusos Brasil', 'Fixação', None),
+            ('Cola Branca', 'Globex', 'Adesivo', 'Indicada para parafusos de madeira'),
+            ('Porca', 'Globex', 'Fixação', None),
+        ):
+            Produto.objects.create(nome=nome, fabricante=fabricante, tipo=tipo, descricao=descricao, ativo=True)
+        Produto.objects.create(nome='Parafuso Deletado', fabricante='Acme', tipo='Fixação', ativo=True, deletado=True)
+
+    def test_relevancia(self):
+        # O nome tem prioridade sobre o fabricante e a descrição, produtos deletados não são encontrados
+        nomes = [produto.nome for produto in buscar_produtos('parafuso')]
+        self.assertEqual(nomes[0], 'Parafuso Sextavado')
+        self.assertEqual(set(nomes), {'Parafuso Sextavado', 'Arruela Lisa', 'Cola Branca'})
+
+        # Todas as palavras devem ser encontradas, em qualquer um dos campos
+        self.assertEqual([produto.nome for produto in buscar_produtos('globex fixação')], ['Porca'])
+        self.assertEqual(buscar_produtos('').count(), 4)
+
+    def test_listagem_paginada(self):
+        response = self.client.get(reverse('produto'), {'q': 'globex'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([produto.nome for produto in response.context['produtos']], ['Cola Branca', 'Porca'])
+        self.assertContains(response, 'value="globex"')
+
+# ---- Fim Busca de produtos ----
+
+
+# ---- Inicio Arquivos estáticos ----
+
+
+class EstaticosTest(SimpleTestCase):
+
+    def _montar(self, nome, extensao):
+        return montar_pacote(PACOTES[nome][extensao], extensao, f'pacotes/{nome}.{extensao}',
+                             lambda arquivo: open(finders.find(arquivo), 'rb'))
+
+    def test_pacotes(self):
+        # As urls relativas do css passam a partir da pasta do pacote e os source maps são removidos
+        css = self._montar('padrao', 'css')
+        self.assertIn('url("../vendor/bootstrap-icons/fonts/bootstrap-icons.woff2', css)
+        self.assertNotIn('sourceMappingURL', css)
+        self.assertNotIn('sourceMappingURL', self._montar('padrao', 'js'))
+
+    def test_template_tag(self):
+        template = Template("{% load pacotes %}{% pacote_js 'estoque' %}")
+        html = template.render(Context())
+        self.assertEqual(html.count('<script'), len(PACOTES['estoque']['js']))
+        self.assertIn('/static/js/main.js', html)
+
+        with override_settings(ESTATICOS_COMPACTADOS=True):
+            self.assertEqual(template.render(Context()), '<script src="/static/pacotes/estoque.js"></script>')
+
+    def test_collectstatic(self):
+        # O collectstatic grava os pacotes com hash no nome e as versões comprimidas, que o middleware serve
+        # com o cache de longa duração
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(
+            STATIC_ROOT=diretorio, ESTATICOS_COMPACTADOS=True,
+            STATICFILES_STORAGE='aplicativo.estaticos.ArmazenamentoEstaticos',
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = Template("{% load pacotes %}{% pacote_css 'padrao' %}").render(Context())
+            nome = url.split('"')[1][len('/static/'):]
+            self.assertRegex(nome, r'^pacotes/padrao\.[0-9a-f]{12}\.css$')
+
+            middleware = EstaticosMiddleware(lambda request: HttpResponseNotFound())
+            resposta = middleware(RequestFactory().get(f'/static/{nome}', HTTP_ACCEPT_ENCODING='gzip, deflate'))
+            with open(f'{diretorio}/{nome}', 'rb') as arquivo:
+                self.assertEqual(gzip.decompress(b''.join(resposta.streaming_content)), arquivo.read())
+            resposta.close()
+            self.assertEqual(resposta['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', resposta['Cache-Control'])
+
+            self.assertEqual(middleware(RequestFactory().get('/static/../manage.py')).status_code, 404)
+
+# ---- Fim Arquivos estáticos ----
+
+
+# ---- Inicio Layout ----
+
+
+class LayoutTest(TestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        caches['layout'].clear()
+
+    def test_menu_lateral(self):
+        # As páginas de estoque destacam o item Estoque do menu, aberto na seção de produtos
+        response = self.client.get(reverse('stock_local'))
+        self.assertContains(response, f'<a href="{reverse("stock_produto")}" class="active">', html=False)
+        self.assertContains(response, 'class="nav-content" data-bs-parent="#sidebar-nav"', count=1)
+        self.assertContains(response, '<title>MstarSupply - Gerênciar Produtos</title>')
+
+        response = self.client.get(reverse('import_movimentacao'))
+        self.assertNotContains(response, 'class="active"')
+
+    def test_fragmentos_em_cache(self):
+        # O cabeçalho é compartilhado por todas as páginas e o menu possui um fragmento por item destacado
+        self.client.get(reverse('stock_local'))
+        self.assertIsNotNone(caches['layout'].get(make_template_fragment_key('layout_cabecalho')))
+        self.assertIsNotNone(
+            caches['layout'].get(make_template_fragment_key('layout_menu', ['produtos', 'stock_produto']))
+        )
+        self.assertIsNone(caches['layout'].get(make_template_fragment_key('layout_menu', ['produtos', 'produto'])))
+
+# ---- Fim Layout ----
+
+
+# ---- Inicio Atualização incremental do painel ----
+
+
+class PainelDeltaTest(OrcamentoConsultasMixin, TestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(2)
+        ]
+        for produto in self.produtos:
+            self._registrar(produto, True, 10, datetime(2023, 1, 10, 10, tzinfo=timezone.utc))
+
+    def _registrar(self, produto, tipo_movimentacao, quantidade, data_hora):
+        # Mesma ordem das views, a versão é incrementada antes de atualizar os saldos
+        with transaction.atomic():
+            incrementar_versao(versoes.MOVIMENTACAO)
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=produto, quantidade=quantidade, local=obter_local('Estoque'),
+                tipo_movimentacao=tipo_movimentacao, data_hora=data_hora,
+            ))
+
+    def test_alteracoes_desde_o_cursor(self):
+        cursor = self.client.get(reverse('index')).context['cursor']
+        self.assertEqual(self.client.get(reverse('api_painel_delta'), {'cursor': cursor}).status_code, 204)
+
+        # Somente o produto e o mês da nova movimentação são enviados, com os totais atuais
+        self._registrar(self.produtos[1], False, 4, datetime(2023, 2, 10, 10, tzinfo=timezone.utc))
+        delta = self.assertOrcamentoConsultas('api_painel_delta', dados={'cursor': cursor}).json()
+        self.assertFalse(delta['completo'])
+        self.assertEqual(delta['totais'], {'total_entradas': 20, 'total_saidas': 4, 'total_estoque': 16,
+                                           'contagem_entradas': 2, 'contagem_saidas': 1})
+        self.assertEqual(delta['produtos'], [{'id': self.produtos[1].pk, 'nome': 'Produto 1',
+                                              'total_entradas': 10, 'total_saidas': 4}])
+        self.assertEqual(delta['meses'], [{'mes_ano': '02/2023', 'total_entradas': 0, 'total_saidas': 4,
+                                           'contagem': 1}])
+        self.assertEqual(self.client.get(reverse('api_painel_delta'), {'cursor': delta['cursor']}).status_code, 204)
+
+        # A alteração de um produto pode mudar os nomes dos gráficos, todos os produtos são enviados
+        with transaction.atomic():
+            Produto.objects.filter(pk=self.produtos[0].pk).update(nome='Produto Editado')
+            incrementar_versao(versoes.PRODUTO)
+        delta = self.client.get(reverse('api_painel_delta'), {'cursor': delta['cursor']}).json()
+        self.assertEqual({produto['nome'] for produto in delta['produtos']}, {'Produto Editado', 'Produto 1'})
+        self.assertEqual(delta['meses'], [])
+
+    def test_cursor_ausente_ou_invalido(self):
+        delta = self.client.get(reverse('api_painel_delta')).json()
+        self.assertTrue(delta['completo'])
+        self.assertEqual(len(delta['produtos']), 2)
+        self.assertEqual([mes['mes_ano'] for mes in delta['meses']], ['01/2023'])
+
+        # Um cursor à frente das versões atuais não pode ser continuado e o painel é enviado completo
+        self.assertTrue(self.client.get(reverse('api_painel_delta'), {'cursor': '999.999'}).json()['completo'])
+        self.assertEqual(self.client.get(reverse('api_painel_delta'), {'cursor': 'abc'}).status_code, 400)
+
+
+class PainelEventosTest(TransactionTestCase):
+
+    @override_settings(PAINEL_EVENTOS_INTERVALO=0.01)
+    def test_eventos(self):
+        produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        with transaction.atomic():
+            incrementar_versao(versoes.MOVIMENTACAO)
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=produto, quantidade=5, local=obter_local('Estoque'), tipo_movimentacao=True
+            ))
+
+        async def executar():
+            # O navegador se desconecta após receber o primeiro evento
+            mensagens = []
+            evento_recebido = asyncio.Event()
+
+            async def receive():
+                await evento_recebido.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(mensagem):
+                mensagens.append(mensagem)
+                if b'event: delta' in mensagem.get('body', b''):
+                    evento_recebido.set()
+
+            async def aplicacao_django(scope, receive, send):
+                raise AssertionError('A requisição de eventos não deve chegar ao Django')
+
+            scope = {'type': 'http', 'method': 'GET', 'path': CAMINHO_EVENTOS, 'query_string': b'', 'headers': []}
+            await asyncio.wait_for(aplicacao_com_eventos(aplicacao_django)(scope, receive, send), timeout=10)
+            return mensagens
+
+        mensagens = async_to_sync(executar)()
+        self.assertEqual(mensagens[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), mensagens[0]['headers'])
+
+        evento = dict(
+            linha.split(': ', 1) for linha in mensagens[-1]['body'].decode().strip().split('\n')
+        )
+        delta = json.loads(evento['data'])
+        self.assertEqual(evento['event'], 'delta')
+        self.assertEqual(evento['id'], delta['cursor'])
+        self.assertTrue(delta['completo'])
+        self.assertEqual(delta['totais']['total_entradas'], 5)
+
+
+class EventosPainelAsgiTest(SimpleTestCase):
+
+    # A aplicação ASGI dos eventos com painel.delta_painel substituído, sem acesso ao banco, assim o fluxo dos eventos
+    # é testado em qualquer banco
+    def _executar(self, scope, respostas):
+        cursores = []
+        mensagens = []
+
+        def delta_painel(cursor):
+            cursores.append(cursor)
+            resposta = respostas[len(cursores) - 1] if len(cursores) <= len(respostas) else None
+            if isinstance(resposta, Exception):
+                raise resposta
+            return resposta
+
+        async def executar():
+            # O navegador se desconecta após receber o primeiro heartbeat
+            heartbeat = asyncio.Event()
+
+            async def receive():
+                await heartbeat.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(mensagem):
+                mensagens.append(mensagem)
+                if b': heartbeat' in mensagem.get('body', b''):
+                    heartbeat.set()
+
+            async def aplicacao_django(scope, receive, send):
+                mensagens.append({'django': scope['path']})
+
+            await asyncio.wait_for(aplicacao_com_eventos(aplicacao_django)(scope, receive, send), timeout=10)
+
+        with mock.patch('aplicativo.eventos.delta_painel', delta_painel):
+            async_to_sync(executar)()
+
+        return cursores, mensagens
+
+    def _scope(self, caminho=CAMINHO_EVENTOS, metodo='GET', query_string=b'', headers=()):
+        return {'type': 'http', 'method': metodo, 'path': caminho, 'query_string': query_string,
+                'headers': list(headers)}
+
+    @override_settings(PAINEL_EVENTOS_INTERVALO=0.01, PAINEL_EVENTOS_HEARTBEAT=0)
+    def test_eventos(self):
+        # O Last-Event-ID da reconexão tem prioridade sobre o cursor da página, um cursor inválido reinicia o painel
+        cursores, mensagens = self._executar(
+            self._scope(query_string=b'cursor=pagina', headers=[(b'last-event-id', b'1.1')]),
+            [CursorInvalido(), {'cursor': '2.2', 'completo': True}, None],
+        )
+        self.assertEqual(cursores, ['1.1', None, '2.2'])
+
+        self.assertEqual(mensagens[0]['status'], 200)
+        self.assertIn((b'x-accel-buffering', b'no'), mensagens[0]['headers'])
+        self.assertEqual(
+            [mensagem['body'] for mensagem in mensagens[1:]],
+            [b'retry: 10\n\n', b'id: 2.2\nevent: delta\ndata: {"cursor": "2.2", "completo": true}\n\n',
+             b': heartbeat\n\n'],
+        )
+        self.assertTrue(all(mensagem['more_body'] for mensagem in mensagens[1:]))
+
+    @override_settings(PAINEL_EVENTOS_DURACAO=0)
+    def test_fim_da_duracao(self):
+        # Após a duração máxima a resposta é encerrada e o navegador reconecta
+        cursores, mensagens = self._executar(self._scope(query_string=b'cursor=pagina'), [])
+        self.assertEqual(cursores, [])
+        self.assertEqual(mensagens[-1], {'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    def test_demais_requisicoes(self):
+        # Somente o GET do caminho dos eventos é atendido fora do Django
+        for scope in (self._scope(caminho='/'), self._scope(metodo='POST')):
+            with self.subTest(scope=scope):
+                self.assertEqual(self._executar(scope, []), ([], [{'django': scope['path']}]))
+
+# ---- Fim Atualização incremental do painel ----
+
+
+# ---- Inicio Exclusão em lote ----
+
+
+class ExclusaoLoteTest(OrcamentoConsultasMixin, TestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(2)
+        ]
+        for produto in self.produtos:
+            for mes, tipo_movimentacao, quantidade in ((1, True, 10), (2, True, 10), (2, False, 5)):
+                with transaction.atomic():
+                    incrementar_versao(versoes.MOVIMENTACAO)
+                    registrar_movimentacao(Movimentacao.objects.create(
+                        produto=produto, quantidade=quantidade, local=obter_local('Estoque'),
+                        tipo_movimentacao=tipo_movimentacao, data_hora=datetime(2023, mes, 10, 10, tzinfo=timezone.utc)
+                    ))
+
+    def _totais(self):
+        return (
+            list(EstoqueProduto.objects.filter(Q(total_entradas__gt=0) | Q(total_saidas__gt=0)).order_by('pk')
+                 .values('produto_id', 'total_entradas', 'total_saidas', 'estoque', 'contagem_entradas',
+                         'contagem_saidas', 'ultima_movimentacao')),
+            list(MovimentacaoMensal.objects.filter(contagem__gt=0).order_by('mes')
+                 .values('mes', 'total_entradas', 'total_saidas', 'contagem')),
+        )
+
+    def assertTotaisRecalculados(self):
+        # Os totais ajustados em lote devem ser iguais aos reconstruídos a partir do histórico
+        totais = self._totais()
+        recalcular_saldos()
+        recalcular_resumos_mensais()
+        self.assertEqual(totais, self._totais())
+
+    def test_excluir_movimentacoes(self):
+        # Os totais são ajustados com um incremento por produto e por mês do lote, independente da quantidade
+        # de movimentações, por isso as consultas se repetem para cada mês
+        ids = list(Movimentacao.objects.filter(produto=self.produtos[0]).values_list('pk', flat=True))
+        response = self.assertOrcamentoConsultas('delete_movimentacao_lote', metodo='post', dados={'ids': ids},
+                                                 permitir_duplicadas=True)
+        self.assertRedirects(response, reverse('movimentacao'), fetch_redirect_response=False)
+        self.assertFalse(Movimentacao.objects.filter(produto=self.produtos[0]).exists())
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 0)
+        self.assertTotaisRecalculados()
+
+        # Sem seleção são excluídas as movimentações que correspondem aos filtros do grid
+        self.assertOrcamentoConsultas('delete_movimentacao_lote', metodo='post',
+                                      dados={'data_inicio': '2023-02-01', 'tipo': 'saida'}, permitir_duplicadas=True)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[1]).estoque, 20)
+        self.assertTotaisRecalculados()
+
+        # Sem seleção e sem filtros nada é excluído
+        self.client.post(reverse('delete_movimentacao_lote'))
+        self.assertEqual(Movimentacao.objects.count(), 2)
+
+    def test_parametros_invalidos(self):
+        # Ids e datas inválidos retornam para a listagem com a mensagem de erro, sem excluir nada
+        for nome_url, nome_url_listagem, dados in (
+            ('delete_movimentacao_lote', 'movimentacao', {'ids': ['²']}),
+            ('delete_movimentacao_lote', 'movimentacao', {'data_inicio': '2023-02-31'}),
+            ('delete_movimentacao_lote', 'movimentacao', {'data_fim': 'ontem'}),
+            ('delete_produto_lote', 'produto', {'ids': ['1', '²']}),
+        ):
+            with self.subTest(nome_url=nome_url, dados=dados):
+                response = self.client.post(reverse(nome_url), dados, follow=True)
+                self.assertRedirects(response, reverse(nome_url_listagem))
+                self.assertEqual(len(response.context['messages']), 1)
+                self.assertEqual(list(response.context['messages'])[0].level_tag, 'error')
+                self.assertEqual(Movimentacao.objects.count(), 6)
+                self.assertEqual(Produto.objects.count(), 2)
+
+    def test_excluir_e_restaurar_produto(self):
+        entrada = Movimentacao.objects.filter(produto=self.produtos[0], tipo_movimentacao=True).first()
+        self.assertEqual(excluir_movimentacoes(Movimentacao.objects.filter(pk=entrada.pk)), 1)
+
+        # A exclusão do produto exclui as suas movimentações e as remove dos totais
+        response = self.assertOrcamentoConsultas('delete_produto_lote', metodo='post',
+                                                 dados={'ids': [self.produtos[0].pk]}, permitir_duplicadas=True)
+        self.assertRedirects(response, reverse('produto'), fetch_redirect_response=False)
+        self.assertFalse(Movimentacao.objects.filter(produto=self.produtos[0]).exists())
+        self.assertEqual(self.client.get(reverse('index')).context['total_entradas'], 20)
+        self.assertTotaisRecalculados()
+
+        # A restauração do produto restaura somente as movimentações excluídas junto com ele
+        self.assertEqual(restaurar_produtos(Produto.todos.filter(pk=self.produtos[0].pk)), (1, 2))
+        self.assertTrue(Movimentacao.todos.get(pk=entrada.pk).deletado)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 5)
+        self.assertTotaisRecalculados()
+
+    def test_restaurar_sem_estoque(self):
+        excluir_movimentacoes(Movimentacao.objects.filter(produto=self.produtos[0]))
+
+        # Restaurar somente a saida deixaria o estoque negativo, nada é restaurado
+        saida = Movimentacao.todos.filter(produto=self.produtos[0], tipo_movimentacao=False)
+        with self.assertRaises(EstoqueInsuficiente):
+            restaurar_movimentacoes(saida)
+        self.assertFalse(Movimentacao.objects.filter(produto=self.produtos[0]).exists())
+
+        self.assertEqual(restaurar_movimentacoes(Movimentacao.todos.filter(produto=self.produtos[0])), 3)
+        self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 15)
+        self.assertTotaisRecalculados()
+
+    def test_restaurar_nome_em_uso(self):
+        # O nome do produto excluído foi reutilizado, a restauração violaria o índice produto_nome_unico_ativo
+        excluir_produtos(Produto.objects.filter(pk=self.produtos[0].pk))
+        Produto.objects.create(nome='PRODUTO 0', fabricante='Fabricante', tipo='Tipo', ativo=True)
+
+        with self.assertRaisesMessage(NomeEmUso, 'Produto 0'):
+            restaurar_produtos(Produto.todos.filter(pk=self.produtos[0].pk))
+        self.assertTrue(Produto.todos.get(pk=self.produtos[0].pk).deletado)
+        self.assertFalse(Movimentacao.objects.filter(produto=self.produtos[0]).exists())
+
+        with self.assertRaisesMessage(CommandError, 'nome já está em uso'):
+            call_command('excluir_em_lote', '--restaurar', '--produtos', str(self.produtos[0].pk), stdout=io.StringIO())
+
+    def test_sem_registros_nao_altera_versao(self):
+        # Uma exclusão ou restauração que não encontra registros não invalida as páginas, relatórios e o painel
+        versao_movimentacao = obter_versao(versoes.MOVIMENTACAO).versao
+        versao_produto = obter_versao(versoes.PRODUTO).versao
+
+        self.assertEqual(excluir_movimentacoes(Movimentacao.objects.filter(quantidade=999)), 0)
+        self.assertEqual(restaurar_movimentacoes(Movimentacao.todos.all()), 0)
+        self.assertEqual(excluir_produtos(Produto.objects.filter(nome='Inexistente')), (0, 0))
+        self.assertEqual(restaurar_produtos(Produto.todos.all()), (0, 0))
+
+        self.assertEqual(obter_versao(versoes.MOVIMENTACAO).versao, versao_movimentacao)
+        self.assertEqual(obter_versao(versoes.PRODUTO).versao, versao_produto)
+
+    def test_lotes(self):
+        # Com lotes menores que a quantidade de registros o resultado é o mesmo de um único lote
+        with mock.patch('aplicativo.exclusao.TAMANHO_LOTE', 2):
+            self.assertEqual(excluir_produtos(Produto.objects.all()), (2, 6))
+            self.assertTotaisRecalculados()
+            self.assertEqual(restaurar_produtos(Produto.todos.all()), (2, 6))
+            self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 15)
+
+            self.assertEqual(excluir_movimentacoes(Movimentacao.objects.filter(tipo_movimentacao=False)), 2)
+            self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 20)
+            self.assertEqual(restaurar_movimentacoes(Movimentacao.todos.all()), 2)
+            self.assertEqual(EstoqueProduto.objects.get(produto=self.produtos[0]).estoque, 15)
+            self.assertTotaisRecalculados()
+
+# ---- Fim Exclusão em lote ----
+
+
+# ---- Inicio Grid de movimentações ----
+
+
+class GridMovimentacaoTest(TestCase):
+
+    def setUp(self):
+        # Poucos valores distintos em cada coluna, assim as páginas terminam no meio de registros empatados
+        produtos = [
+            Produto.objects.create(nome=nome, fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for nome in ('Produto A', 'Produto B')
+        ]
+        locais = [obter_local('Estoque'), obter_local('Loja')]
+        for i in range(14):
+            with transaction.atomic():
+                registrar_movimentacao(Movimentacao.objects.create(
+                    produto=produtos[i % 2], quantidade=(i % 3) + 1, local=locais[i % 2 if i < 7 else 0],
+                    tipo_movimentacao=i % 4 != 3, data_hora=datetime(2023, 1 + i % 3, 10, 10, tzinfo=timezone.utc)
+                ))
+        self.produtos = produtos
+
+    def _consultar(self, **parametros):
+        return self.client.get(reverse('grid_movimentacao'), parametros)
+
+    def _percorrer(self, **parametros):
+        # Percorre todas as páginas guardando os cursores, como o grid faz para voltar às páginas anteriores
+        paginas, cursores, cursor = [], [], None
+        while True:
+            consulta = {**parametros, 'cursor': cursor} if cursor else parametros
+            response = self._consultar(**consulta)
+            self.assertEqual(response.status_code, 200)
+            pagina = response.json()
+            paginas.append([movimentacao['id'] for movimentacao in pagina['resultados']])
+            cursores.append(cursor)
+            cursor = pagina['proximo_cursor']
+            if not cursor:
+                return paginas, cursores
+
+    def _esperado(self, campo, descendente, movimentacoes=None):
+        registros = (movimentacoes or Movimentacao.objects).values_list(campo, 'pk')
+        return [pk for _, pk in sorted(registros, reverse=descendente)]
+
+    def test_ordenacao_e_paginacao(self):
+        campos = {'id': 'pk', 'tipo': 'tipo_movimentacao', 'produto': 'produto__nome', 'quantidade': 'quantidade',
+                  'local': 'local__nome', 'data_hora': 'data_hora'}
+        for ordem, campo in campos.items():
+            for direcao in ('asc', 'desc'):
+                with self.subTest(ordem=ordem, direcao=direcao):
+                    paginas, cursores = self._percorrer(ordem=ordem, direcao=direcao, limite=3)
+
+                    # Nenhum registro é repetido ou pulado entre as páginas, mesmo com valores empatados
+                    self.assertEqual([pk for pagina in paginas for pk in pagina],
+                                     self._esperado(campo, direcao == 'desc'))
+                    self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 3, 3, 2])
+
+                    # Voltar a uma página anterior com o seu cursor retorna os mesmos registros
+                    consulta = {'ordem': ordem, 'direcao': direcao, 'limite': 3, 'cursor': cursores[2]}
+                    self.assertEqual([movimentacao['id'] for movimentacao in self._consultar(**consulta)
+                                      .json()['resultados']], paginas[2])
+
+    def test_filtros(self):
+        filtros = {'produto': str(self.produtos[0].pk), 'tipo': 'entrada', 'local': 'est',
+                   'data_inicio': '2023-02-01', 'data_fim': '2023-03-31'}
+        movimentacoes = Movimentacao.objects.filter(
+            produto=self.produtos[0], tipo_movimentacao=True, local__nome='Estoque',
+            data_hora__gte=datetime(2023, 2, 1, tzinfo=timezone.utc),
+        )
+        paginas, _ = self._percorrer(ordem='data_hora', limite=2, **filtros)
+        self.assertTrue(movimentacoes.exists())
+        self.assertEqual([pk for pagina in paginas for pk in pagina],
+                         self._esperado('data_hora', True, movimentacoes))
+
+    def test_parametros_invalidos(self):
+        def cursor(valor, pk):
+            return base64.urlsafe_b64encode(json.dumps([valor, pk]).encode()).decode()
+
+        parametros_invalidos = [
+            {'ordem': 'nome'}, {'direcao': 'baixo'}, {'limite': 'abc'}, {'tipo': 'troca'},
+            {'produto': 'abc'}, {'produto': '²'}, {'data_inicio': '10/01/2023'}, {'data_inicio': '2025-13-01'},
+            {'data_fim': '2023-02-30'}, {'cursor': 'abc'},
+            {'ordem': 'id', 'cursor': cursor('x', 'abc')},
+            {'ordem': 'id', 'cursor': cursor(1, True)},
+            {'ordem': 'quantidade', 'cursor': cursor('abc', 1)},
+            {'ordem': 'tipo', 'cursor': cursor(1, 1)},
+            {'ordem': 'produto', 'cursor': cursor(['Produto A'], 1)},
+            {'ordem': 'data_hora', 'cursor': cursor(5, 1)},
+            {'ordem': 'data_hora', 'cursor': cursor('2023-13-01T10:00:00', 1)},
+            {'ordem': 'data_hora', 'cursor': cursor('abc', 1)},
+        ]
+        for parametros in parametros_invalidos:
+            with self.subTest(parametros=parametros):
+                response = self._consultar(**parametros)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('erro', response.json())
+
+# ---- Fim Grid de movimentações ----
+
+
+# ---- Inicio Exportação ----
+
+
+class ExportacaoTest(OrcamentoConsultasMixin, TestCase):
+
+    def setUp(self):
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(2)
+        ]
+        for produto in self.produtos:
+            for mes, tipo_movimentacao, quantidade in ((1, True, 10), (2, True, 10), (2, False, 5)):
+                with transaction.atomic():
+                    registrar_movimentacao(Movimentacao.objects.create(
+                        produto=produto, quantidade=quantidade, local=obter_local('Loja; Centro'),
+                        tipo_movimentacao=tipo_movimentacao, data_hora=datetime(2023, mes, 10, 10, tzinfo=timezone.utc)
+                    ))
+
+    def _csv(self, **filtros):
+        # As consultas da exportação são executadas durante a leitura do conteúdo, contabilizadas pelo mixin
+        response = self.assertOrcamentoConsultas('export_csv_movimentacao', dados=filtros)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def _ids_grid(self, **filtros):
+        return [movimentacao['id'] for movimentacao in
+                self.client.get(reverse('grid_movimentacao'), {**filtros, 'limite': 100}).json()['resultados']]
+
+    def test_csv(self):
+        conteudo = self._csv()
+        self.assertTrue(conteudo.startswith('\ufeff'))
+
+        linhas = list(csv.reader(io.StringIO(conteudo[1:]), delimiter=';'))
+        self.assertEqual(linhas[0], ['id', 'produto', 'tipo_movimentacao', 'quantidade', 'local', 'data_hora'])
+        self.assertEqual(len(linhas) - 1, len(self._ids_grid()))
+
+        # O local com ; é exportado entre aspas e a data no formato aceito pela importação
+        primeira = Movimentacao.objects.order_by('data_hora', 'pk').first()
+        self.assertEqual(len(linhas) - 1, Movimentacao.objects.count())
+        self.assertEqual(linhas[1], [str(primeira.pk), 'Produto 0', 'entrada', '10', 'Loja; Centro',
+                                     '10/01/2023 10:00:00'])
+
+    def test_orcamento_conteudo_em_streaming(self):
+        # A consulta executada durante a leitura do CSV é contabilizada no orçamento
+        with self.settings(ORCAMENTO_CONSULTAS={'export_csv_movimentacao': 0}):
+            with self.assertRaises(AssertionError):
+                self._csv()
+
+    def test_csv_filtrado(self):
+        filtros = {'produto': str(self.produtos[1].pk), 'tipo': 'entrada', 'data_inicio': '2023-02-01'}
+        linhas = list(csv.reader(io.StringIO(self._csv(**filtros)[1:]), delimiter=';'))[1:]
+        self.assertEqual(sorted(int(linha[0]) for linha in linhas), sorted(self._ids_grid(**filtros)))
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual(linhas[0][1:4], ['Produto 1', 'entrada', '10'])
+
+        response = self.client.get(reverse('export_csv_movimentacao'), {'data_fim': '2023-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.assertOrcamentoConsultas('export_xlsx_movimentacao', dados={'tipo': 'saida'})
+        self.assertEqual(response.status_code, 200)
+        aba = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Movimentações']
+        linhas = list(aba.iter_rows(values_only=True))
+        self.assertEqual(linhas[0], ('id', 'produto', 'tipo_movimentacao', 'quantidade', 'local', 'data_hora'))
+        self.assertEqual(sorted(linha[0] for linha in linhas[1:]), sorted(self._ids_grid(tipo='saida')))
+        self.assertEqual({linha[2] for linha in linhas[1:]}, {'saida'})
+
+# ---- Fim Exportação ----
+
+
+# ---- Inicio Relatórios ----
+
+
+class RelatorioMensalCacheTest(TestCase):
+
+    def setUp(self):
+        diretorio_relatorios = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio_relatorios.cleanup)
+        self.diretorio = diretorio_relatorios.name
+        configuracao = self.settings(RELATORIOS_CACHE_DIR=self.diretorio, CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produto = Produto.objects.create(nome='Produto Teste', fabricante='Fabricante', tipo='Tipo', ativo=True)
+        self._registrar(10)
+
+    def _registrar(self, quantidade):
+        # Mesma ordem das views, a versão é incrementada antes de atualizar os saldos
+        with transaction.atomic():
+            incrementar_versao(versoes.MOVIMENTACAO)
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=self.produto, quantidade=quantidade, local=obter_local('Estoque'), tipo_movimentacao=True,
+                data_hora=datetime(2023, 1, 10, 10, tzinfo=timezone.utc)
+            ))
+
+    def _relatorios(self):
+        return sorted(os.listdir(self.diretorio))
+
+    def _exportar(self, **cabecalhos):
+        response = self.client.get(reverse('export_pdf_movimentacao'), **cabecalhos)
+        if response.status_code == 200:
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        return response
+
+    def test_reutilizacao_e_invalidacao(self):
+        with mock.patch('aplicativo.relatorios.gerar_relatorio_mensal', wraps=gerar_relatorio_mensal) as gerar:
+            etag = self._exportar()['ETag']
+            relatorios = self._relatorios()
+            self.assertEqual(len(relatorios), 1)
+
+            # O navegador com a versão atual recebe 304 e sem ela o arquivo gerado é reutilizado
+            self.assertEqual(self._exportar(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self._exportar()['ETag'], etag)
+            self.assertEqual(gerar.call_count, 1)
+
+            # Após uma gravação o relatório é gerado novamente com uma nova chave
+            self._registrar(5)
+            response = self._exportar(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(gerar.call_count, 2)
+            self.assertEqual(len(self._relatorios()), 2)
+
+    def _criar_relatorio(self, nome, tamanho, idade):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(b'0' * tamanho)
+        modificado_em = time.time() - idade
+        os.utime(caminho, (modificado_em, modificado_em))
+        return caminho
+
+    def test_remocao_por_idade_e_tamanho(self):
+        antigo = self._criar_relatorio('antigo.pdf', 10, 8 * 24 * 60 * 60)
+        recente = self._criar_relatorio('recente.pdf', 10, 60)
+        self._criar_relatorio('em_geracao.tmp', 10, 60)
+        # Arquivo temporário deixado por uma geração interrompida
+        self._criar_relatorio('interrompido.tmp', 10, 8 * 24 * 60 * 60)
+        self.assertEqual(limpar_cache_relatorios(), 2)
+        self.assertEqual(self._relatorios(), ['em_geracao.tmp', 'recente.pdf'])
+
+        # Acima do tamanho máximo os menos recentes são removidos, o relatório atual é mantido
+        mais_recente = self._criar_relatorio('mais_recente.pdf', 10, 30)
+        atual = self._criar_relatorio('atual.pdf', 10, 120)
+        with self.settings(RELATORIOS_CACHE_TAMANHO_MAXIMO=25):
+            self.assertEqual(limpar_cache_relatorios(manter=atual), 1)
+        self.assertFalse(os.path.exists(recente))
+        self.assertTrue(os.path.exists(mais_recente))
+        self.assertTrue(os.path.exists(atual))
+        self.assertFalse(os.path.exists(antigo))
+
+    def test_erro_na_geracao(self):
+        # O arquivo temporário não permanece no diretório quando a geração falha
+        with mock.patch('aplicativo.relatorios.gerar_relatorio_mensal', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                obter_relatorio_mensal_em_cache('v1', lambda: [])
+        self.assertEqual(self._relatorios(), [])
+
+        with self.assertRaises(RuntimeError):
+            obter_relatorio_mensal_em_cache('v1', mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(self._relatorios(), [])
+
+
+class RelatorioMensalTest(SimpleTestCase):
+
+    def test_blocos_com_as_mesmas_colunas(self):
+        # Um valor mais largo em um bloco não pode alterar as colunas somente daquele bloco
+        linhas = [[f'{mes % 12 + 1:02d}/{2000 + mes // 12}', mes, mes % 7] for mes in range(250)]
+        linhas[220][1] = 123456789
+        tabelas = list(_tabelas(linhas))
+        self.assertEqual(len(tabelas), 3)
+        self.assertEqual(tabelas[0].repeatRows, 1)
+        self.assertEqual(sum(len(tabela._cellvalues) for tabela in tabelas), len(linhas) + 1)
+        for tabela in tabelas[1:]:
+            self.assertEqual(tabela._colWidths, tabelas[0]._colWidths)
+        self.assertGreater(tabelas[0]._colWidths[1], stringWidth('123456789', 'Helvetica', 10))
+
+        destino = io.BytesIO()
+        gerar_relatorio_mensal(linhas, destino)
+        self.assertTrue(destino.getvalue().startswith(b'%PDF'))
+        self.assertGreater(len(linhas), LINHAS_POR_TABELA)
+
+# ---- Fim Relatórios ----
+
+
+# ---- Inicio Dados sintéticos ----
+
+
+class DadosSinteticosTest(TestCase):
+
+    def _totais(self):
+        return (
+            list(EstoqueProduto.objects.order_by('produto_id').values_list(
+                'produto_id', 'total_entradas', 'total_saidas', 'estoque', 'contagem_entradas', 'contagem_saidas',
+                'ultima_movimentacao')),
+            list(MovimentacaoMensal.objects.filter(contagem__gt=0).order_by('mes').values_list(
+                'mes', 'total_entradas', 'total_saidas', 'contagem')),
+            list(SaldoPeriodico.objects.order_by('produto_id', 'data').values_list(
+                'produto_id', 'data', 'total_entradas', 'total_saidas', 'estoque')),
+        )
+
+    def test_invariantes(self):
+        produto_ids = gerar_dados(40, 2000, anos=1, semente=3)
+        deletados = list(Produto.todos.filter(pk__in=produto_ids, deletado=True))
+        self.assertTrue(deletados)
+
+        # As movimentações dos produtos deletados foram deletadas junto com o produto
+        self.assertFalse(Movimentacao.objects.filter(produto__deletado=True).exists())
+        for produto in deletados:
+            self.assertFalse(
+                Movimentacao.todos.filter(produto=produto).exclude(deletado_em=produto.deletado_em).exists()
+            )
+
+        # O estoque de nenhum produto fica negativo em nenhum momento do histórico
+        estoques = {}
+        for produto_id, tipo_movimentacao, quantidade in (
+            Movimentacao.objects.order_by('data_hora', 'pk').values_list('produto_id', 'tipo_movimentacao',
+                                                                        'quantidade')
+        ):
+            estoques[produto_id] = estoques.get(produto_id, 0) + (quantidade if tipo_movimentacao else -quantidade)
+            self.assertGreaterEqual(estoques[produto_id], 0)
+
+        # Os saldos, o resumo mensal e os saldos periódicos correspondem ao histórico de movimentações
+        totais = self._totais()
+        self.assertEqual(dict((saldo[0], saldo[3]) for saldo in totais[0]), estoques)
+        recalcular_saldos()
+        recalcular_resumos_mensais()
+        recalcular_saldos_periodicos()
+        self.assertEqual(totais, self._totais())
+
+# ---- Fim Dados sintéticos ----
+
+
+# ---- Inicio Resumo mensal ----
+
+
+class ResumoMensalTest(TestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(2)
+        ]
+        for produto in self.produtos:
+            self._cadastrar(produto=produto.pk, tipo_movimentacao='True', quantidade=20, data_hora='2023-01-10 10:00')
+        self._cadastrar(produto=self.produtos[0].pk, tipo_movimentacao='False', quantidade=5,
+                        data_hora='2023-02-10 10:00')
+        self.saida = Movimentacao.objects.get(tipo_movimentacao=False)
+
+    def _dados(self, **dados):
+        return {'local': 'Estoque', **dados}
+
+    def _cadastrar(self, **dados):
+        response = self.client.post(reverse('create_movimentacao'), self._dados(**dados))
+        self.assertEqual(response.status_code, 302)
+
+    def _editar(self, **dados):
+        response = self.client.post(reverse('edit_movimentacao', kwargs={'pk': self.saida.pk}), self._dados(**{
+            'produto': self.saida.produto_id, 'tipo_movimentacao': 'False', 'quantidade': 5,
+            'data_hora': '2023-02-10 10:00', **dados,
+        }))
+        self.assertEqual(response.status_code, 302)
+
+    def assertResumo(self, esperado):
+        # O resumo ajustado a cada gravação deve ser o esperado e igual ao reconstruído a partir do histórico
+        resumo = {
+            mes.mes.strftime('%m/%Y'): (mes.total_entradas, mes.total_saidas, mes.contagem)
+            for mes in MovimentacaoMensal.objects.filter(contagem__gt=0)
+        }
+        self.assertEqual(resumo, esperado)
+        recalcular_resumos_mensais()
+        self.assertEqual({
+            mes.mes.strftime('%m/%Y'): (mes.total_entradas, mes.total_saidas, mes.contagem)
+            for mes in MovimentacaoMensal.objects.filter(contagem__gt=0)
+        }, esperado)
+
+    def test_cadastro(self):
+        self.assertResumo({'01/2023': (40, 0, 2), '02/2023': (0, 5, 1)})
+
+    def test_edicao_para_outro_mes(self):
+        self._editar(data_hora='2023-03-10 10:00')
+        self.assertResumo({'01/2023': (40, 0, 2), '03/2023': (0, 5, 1)})
+
+    def test_edicao_de_produto_e_tipo(self):
+        # A troca do produto não altera o resumo do mês, a troca do tipo move o total entre as colunas
+        self._editar(produto=self.produtos[1].pk, quantidade=7)
+        self.assertResumo({'01/2023': (40, 0, 2), '02/2023': (0, 7, 1)})
+        self._editar(tipo_movimentacao='True', quantidade=3, data_hora='2023-01-20 10:00')
+        self.assertResumo({'01/2023': (43, 0, 3)})
+
+    def test_exclusao(self):
+        self.client.get(reverse('delete_movimentacao', kwargs={'pk': self.saida.pk}))
+        self.assertResumo({'01/2023': (40, 0, 2)})
+
+        # A exclusão do produto exclui a sua entrada do resumo e a restauração a inclui novamente
+        self.client.get(reverse('delete_produto', kwargs={'pk': self.produtos[1].pk}))
+        self.assertResumo({'01/2023': (20, 0, 1)})
+        restaurar_produtos(Produto.todos.filter(pk=self.produtos[1].pk))
+        self.assertResumo({'01/2023': (40, 0, 2)})
+
+# ---- Fim Resumo mensal ----
+
+
+# ---- Inicio Painel assincrono ----
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class PainelAssincronoTest(TransactionTestCase):
+
+    def setUp(self):
+        configuracao = self.settings(CACHES=CACHE_TESTES)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        for i, quantidade in enumerate((10, 30)):
+            produto = Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            with transaction.atomic():
+                incrementar_versao(versoes.MOVIMENTACAO)
+                registrar_movimentacao(Movimentacao.objects.create(
+                    produto=produto, quantidade=quantidade, local=obter_local('Estoque'), tipo_movimentacao=True,
+                    data_hora=datetime(2023, 1, 10, 10, tzinfo=timezone.utc)
+                ))
+
+    def _consultar(self):
+        # As consultas do painel são executadas em outras threads, cada uma com a sua conexão, e são registradas
+        # junto com as consultas da própria requisição
+        registros = []
+
+        def executar_registrando(consulta):
+            with RegistroConsultas() as registro:
+                try:
+                    return consulta()
+                finally:
+                    registros.append(registro)
+                    connection.close()
+
+        async def consultar():
+            return await AsyncClient().get(reverse('index_assincrono'))
+
+        with mock.patch('aplicativo.painel.executar_em_thread', executar_registrando):
+            with RegistroConsultas() as registro:
+                response = async_to_sync(consultar)()
+        registros.append(registro)
+
+        return response, sum(registro.quantidade for registro in registros)
+
+    def test_painel(self):
+        # Sem o painel em cache são executadas as consultas do painel, registradas nas threads
+        response, consultas = self._consultar()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(consultas, len(CONSULTAS_PAINEL))
+        self.assertLessEqual(consultas, obter_orcamento('index_assincrono'))
+        self.assertEqual(response.context['total_entradas'], 40)
+        self.assertEqual(response.context['total_estoque'], 40)
+        self.assertEqual([produto['total_quantidade'] for produto in response.context['entradas_por_produto']],
+                         [10, 30])
+        self.assertContains(response, 'Produto 1')
+
+        # Os mesmos dados da página sincrona, a segunda requisição utiliza o painel em cache
+        self.assertEqual(self.client.get(reverse('index')).context['total_entradas'], 40)
+        response, consultas = self._consultar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(consultas, 0)
+
+# ---- Fim Painel assincrono ----
+
+
+# ---- Inicio Indicadores ----
+
+
+class IndicadoresTest(TestCase):
+
+    def _registrar(self, produto, tipo_movimentacao, quantidade, local, mes):
+        with transaction.atomic():
+            registrar_movimentacao(Movimentacao.objects.create(
+                produto=produto, quantidade=quantidade, local=obter_local(local), tipo_movimentacao=tipo_movimentacao,
+                data_hora=datetime(2023, mes, 10, 10, tzinfo=timezone.utc)
+            ))
+
+    def _cadastrar(self):
+        # Produto 0: entradas 10 + 5 e saida 3, Produto 1: entrada e saida de 8, Produto 2 sem movimentações
+        # e Produto 3 somente com uma movimentação deletada
+        produtos = [
+            Produto.objects.create(nome=f'Produto {i}', fabricante='Fabricante', tipo='Tipo', ativo=True)
+            for i in range(4)
+        ]
+        self._registrar(produtos[0], True, 10, 'Estoque', 1)
+        self._registrar(produtos[0], True, 5, 'Loja', 2)
+        self._registrar(produtos[0], False, 3, 'Estoque', 2)
+        self._registrar(produtos[1], True, 8, 'Loja', 2)
+        self._registrar(produtos[1], False, 8, 'Loja', 2)
+        self._registrar(produtos[3], True, 4, 'Loja', 3)
+        excluir_movimentacoes(Movimentacao.objects.filter(produto=produtos[3]))
+        return produtos
+
+    def test_indicadores(self):
+        produtos = self._cadastrar()
+
+        saldos = sorted(saldos_por_produto(), key=lambda saldo: saldo['produto__pk'])
+        self.assertEqual([
+            (saldo['produto__nome'], saldo['total_entradas'], saldo['total_saidas'], saldo['estoque'],
+             saldo['contagem_entradas'], saldo['contagem_saidas'])
+            for saldo in saldos
+        ], [('Produto 0', 15, 3, 12, 2, 1), ('Produto 1', 8, 8, 0, 1, 1)])
+
+        meses = resumo_mensal()
+        self.assertEqual(meses, [
+            {'mes_ano': '01/2023', 'total_entradas': 10, 'total_saidas': 0},
+            {'mes_ano': '02/2023', 'total_entradas': 13, 'total_saidas': 11},
+        ])
+        self.assertEqual(linhas_relatorio_mensal(meses), [['01/2023', 10, 0], ['02/2023', 13, 11]])
+
+        painel = indicadores_painel(saldos, meses)
+        self.assertEqual(painel['categorias_mes_ano'], ['01/2023', '02/2023'])
+        self.assertEqual(painel['entradas_mes_ano'], [10, 13])
+        self.assertEqual(painel['saidas_mes_ano'], [0, 11])
+        self.assertEqual((painel['total_entradas'], painel['total_saidas'], painel['total_estoque']), (23, 11, 12))
+        self.assertEqual((painel['contagem_entradas'], painel['contagem_saidas']), (3, 2))
+        self.assertEqual(painel['entradas_por_produto'], [
+            {'produto__pk': produtos[0].pk, 'produto__nome': 'Produto 0', 'total_quantidade': 15},
+            {'produto__pk': produtos[1].pk, 'produto__nome': 'Produto 1', 'total_quantidade': 8},
+        ])
+        self.assertEqual([produto['total_quantidade'] for produto in painel['saidas_por_produto']], [3, 8])
+
+        por_local = [(saldo['local'], saldo['produto'], saldo['total_entradas'], saldo['total_saidas'],
+                      saldo['estoque']) for saldo in saldos_por_local()]
+        self.assertEqual(por_local, [
+            ('Estoque', 'Produto 0', 10, 3, 7),
+            ('Loja', 'Produto 0', 5, 0, 5),
+            ('Loja', 'Produto 1', 8, 8, 0),
+        ])
+        loja = Local.objects.get(nome='Loja').pk
+        self.assertEqual([saldo['produto'] for saldo in saldos_por_local(loja)], ['Produto 0', 'Produto 1'])
+
+    def test_sem_movimentacoes(self):
+        Produto.objects.create(nome='Produto 0', fabricante='Fabricante', tipo='Tipo', ativo=True)
+
+        self.assertEqual(saldos_por_produto(), [])
+        self.assertEqual(resumo_mensal(), [])
+        self.assertEqual(linhas_relatorio_mensal([]), [])
+        self.assertEqual(saldos_por_local(), [])
+        self.assertEqual(indicadores_painel([], []), {
+            'categorias_mes_ano': [], 'entradas_mes_ano': [], 'saidas_mes_ano': [],
+            'total_entradas': 0, 'total_saidas': 0, 'total_estoque': 0,
+            'entradas_por_produto': [], 'saidas_por_produto': [], 'contagem_entradas': 0, 'contagem_saidas': 0,
+        })
+
+# ---- Fim Indicadores ----
+
+
+# ---- Inicio Importação ----
+
+
+class ImportacaoTest(TestCase):
+
+    def setUp(self):
+        Produto.objects.create(nome='Produto 1', fabricante='Fabricante', tipo='Tipo', ativo=True)
+
+    def _importar(self, conteudo, tamanho_lote=2):
+        return self.client.post(reverse('import_movimentacao'), {
+            'arquivo': SimpleUploadedFile('movimentacoes.csv', conteudo), 'tamanho_lote': tamanho_lote,
+        })
+
+    def test_erro_de_formato_no_meio_do_arquivo(self):
+        # Os lotes anteriores ao erro permanecem importados e o resumo informa a linha e o motivo da interrupção
+        linhas = ['produto,tipo_movimentacao,quantidade,local,data_hora']
+        linhas += ['Produto 1,entrada,1,Estoque,01/04/2023 10:00'] * 3
+        linhas += ['Produto 1,entrada,1,"' + 'x' * (csv.field_size_limit() + 1) + '",01/04/2023 10:00']
+        response = self._importar('\n'.join(linhas).encode())
+
+        resultado = response.context['resultado']
+        self.assertEqual(resultado.importadas, 3)
+        self.assertEqual(resultado.interrompida[0], 5)
+        self.assertIn('Formato CSV inválido', resultado.interrompida[1])
+        self.assertContains(response, 'Importação interrompida na linha 5')
+        self.assertEqual(Movimentacao.objects.count(), 3)
+
+    def test_erro_de_codificacao_no_meio_do_arquivo(self):
+        # O arquivo é decodificado em blocos, o erro interrompe a importação a partir da primeira linha não lida
+        linhas = ['produto,tipo_movimentacao,quantidade,local,data_hora']
+        linhas += ['Produto 1,entrada,1,Estoque,01/04/2023 10:00'] * 1000
+        conteudo = '\n'.join(linhas).encode() + b'\nProduto 1,entrada,1,Dep\xf3sito,01/04/2023 10:00'
+        response = self._importar(conteudo, tamanho_lote=100)
+
+        resultado = response.context['resultado']
+        self.assertGreater(resultado.importadas, 0)
+        self.assertEqual(resultado.interrompida[0], resultado.importadas + 2)
+        self.assertIn('UTF-8', resultado.interrompida[1])
+        self.assertEqual(Movimentacao.objects.count(), resultado.importadas)
+        self.assertFalse(Local.objects.filter(nome__startswith='Dep').exists())
+
+    def test_erro_de_codificacao_no_cabecalho(self):
+        response = self._importar(b'produto,tipo_movimenta\xe7\xe3o,quantidade,local,data_hora\n')
+        self.assertIsNone(response.context['resultado'])
+        self.assertIn('UTF-8', response.context['form'].errors['arquivo'][0])
+
+    def test_locais_desfeitos_com_o_lote(self):
+        # Um lote desfeito por erro não deixa cadastrados os locais criados por ele
+        conteudo = io.StringIO('produto,tipo_movimentacao,quantidade,local,data_hora\n'
+                               'Produto 1,entrada,1,Local Novo,01/04/2023 10:00\n')
+        with mock.patch('aplicativo.importacao.registrar_movimentacoes_em_lote', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                importar_movimentacoes(conteudo)
+
+        self.assertFalse(Local.objects.filter(nome='Local Novo').exists())
+        self.assertEqual(Movimentacao.objects.count(), 0)
+
+# ---- Fim Importação ----
@@ -0,0 +1,32 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import ContadorAlteracao
+
+# Contadores de alteração por modelo, a versão é incrementada a cada gravação e pode ser comparada
+# com a versão utilizada para gerar um relatório ou uma página para saber se eles ainda estão atualizados.
+# O incremento deve ser feito dentro da mesma transação que grava os dados.
+
+MOVIMENTACAO = 'movimentacao'
+PRODUTO = 'produto'
+
+
+def incrementar_versao(nome):
+    agora = timezone.now()
+    if not ContadorAlteracao.objects.filter(nome=nome).update(versao=F('versao') + 1, alterado_em=agora):
+        _, criado = ContadorAlteracao.objects.get_or_create(nome=nome, defaults={'versao': 1, 'alterado_em': agora})
+        if not criado:
+            ContadorAlteracao.objects.filter(nome=nome).update(versao=F('versao') + 1, alterado_em=agora)
+
+
+def obter_versao(nome):
+    # Retorna o contador do modelo, caso ainda não exista retorna a versão zero (não salva)
+    contador = ContadorAlteracao.objects.filter(nome=nome).first()
+
+    return contador or ContadorAlteracao(nome=nome, versao=0, alterado_em=None)
+
+
+def obter_versoes(nomes):
+    # Retorna os contadores de vários modelos em uma única consulta, indexados pelo nome
+    contadores = {contador.nome: contador for contador in ContadorAlteracao.objects.filter(nome__in=nomes)}
+
+    return {nome: contadores.get(nome) or ContadorAlteracao(nome=nome, versao=0, alterado_em=None) for nome in nomes}
@@ -1,146 +1,199 @@
-import os
+import copy
+import hashlib
+import io
+import tempfile
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import (render, get_object_or_404, redirect)
 from django.urls import reverse
 from django.contrib import messages
-from django.http import (HttpResponseRedirect, HttpResponse)
-from django.db.models import (Case, When, Sum, Value, IntegerField, F, Subquery, OuterRef, CharField)
-from django.db.models.functions import Concat, Cast
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Image, Spacer, Paragraph)
-from reportlab.lib.styles import getSampleStyleSheet
-from .models import Produto, Movimentacao
-from .forms import ProdutoForm, MovimentacaoForm
+from django.core.paginator import Paginator
+from django.http import (HttpResponse, HttpResponseRedirect, FileResponse, JsonResponse, StreamingHttpResponse)
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_POST
+from .models import Produto, Movimentacao, Local
+from .estoque import registrar_movimentacao, atualizar_movimentacao, EstoqueInsuficiente, obter_saldo_em
+from .indicadores import saldos_por_produto, saldos_por_local, resumo_mensal, linhas_relatorio_mensal
+from .forms import ProdutoForm, MovimentacaoForm, ImportacaoMovimentacaoForm, EstoqueEmForm
+from .grid import consultar_movimentacoes, filtrar_movimentacoes, ParametroInvalido, FILTROS
+from .busca import (autocompletar_produtos, buscar_produtos, LIMITE_AUTOCOMPLETE, LIMITE_AUTOCOMPLETE_MAXIMO,
+                    PRODUTOS_POR_PAGINA)
+from .importacao import importar_movimentacoes, ArquivoInvalido
+from .exportacao import consultar_exportacao, linhas_movimentacoes, gerar_csv, gerar_xlsx
+from .relatorios import obter_relatorio_mensal_em_cache
+from .painel import obter_painel, obter_painel_assincrono, delta_painel, CursorInvalido
+from .eventos import CAMINHO_EVENTOS
+from .exclusao import excluir_movimentacoes, excluir_produtos
+from .layout import identificador_implantacao
+from . import versoes
+from .versoes import incrementar_versao, obter_versao, obter_versoes
+
+# ---- Inicio Requisições condicionais ----
+
+
+def _versoes_listagem(request, nomes):
+    # Os contadores são consultados uma única vez por requisição e reutilizados pelo ETag e pelo Last-Modified
+    if not hasattr(request, 'versoes_listagem'):
+        request.versoes_listagem = obter_versoes(nomes)
+
+    return request.versoes_listagem
+
+
+def condicao_listagem(prefixo, *nomes):
+
+    # Decorator das páginas de listagem, que dependem somente dos dados dos modelos informados.
+    # Quando nenhum desses modelos foi alterado desde o último acesso o navegador recebe a resposta 304
+    # sem que a view seja executada, consultando apenas os contadores de alteração
+    def etag(request):
+        # Páginas com mensagens pendentes (ex.: após cadastrar um produto) sempre são renderizadas
+        if len(messages.get_messages(request)):
+            return None
+
+        # Além dos dados, a página depende da versão implantada (html e nomes dos arquivos estáticos) e do token
+        # CSRF que muda quando o cookie é renovado. O get_token gera o cookie no primeiro acesso, para que o ETag
+        # corresponda ao cookie enviado ao navegador junto com a resposta
+        get_token(request)
+        csrf = hashlib.sha256(request.META['CSRF_COOKIE'].encode()).hexdigest()[:12]
+        versoes_listagem = _versoes_listagem(request, nomes)
+        return f'{prefixo}-{identificador_implantacao()}-{csrf}' + ''.join(
+            f'-{versao.versao}.{int(versao.alterado_em.timestamp() * 1000000) if versao.alterado_em else 0}'
+            for versao in versoes_listagem.values()
+        )
+
+    def ultima_alteracao(request):
+        if len(messages.get_messages(request)):
+            return None
+
+        datas = [versao.alterado_em for versao in _versoes_listagem(request, nomes).values() if versao.alterado_em]
+        return max(datas) if datas else None
+
+    def decorator(view):
+        view_condicional = condition(etag_func=etag, last_modified_func=ultima_alteracao)(view)
+
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            # O navegador deve sempre revalidar a página antes de reutilizá-la, a página varia com o cookie CSRF
+            response = view_condicional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return _view
+
+    return decorator
+
+# ---- Fim Requisições condicionais ----
 
 # ---- Inicio Home page ----
 
 
+def _contexto_painel(painel):
+    # Endereço e intervalo utilizados pela página para receber as alterações do painel (ver aplicativo/eventos.py)
+    return {**painel, 'url_eventos': CAMINHO_EVENTOS, 'intervalo_atualizacao': settings.PAINEL_EVENTOS_INTERVALO}
+
+
 def index(request):
-    # Busca as movimentações que não estão deletadas, ordenado pela data
-    movimentacoes = Movimentacao.objects.filter(deletado=False).order_by('data_hora')
-
-    # Recupera os valores dos as movimentações de entradas e saidas baseadas no nome do produto,
-    # somando as quantidades em um novo campo chamado total_quantidade
-    entradas_por_produto = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=True)
-        .values('produto__nome')
-        .annotate(total_quantidade=Sum('quantidade'))
-    )
-
-    saidas_por_produto = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=False)
-        .values('produto__nome')
-        .annotate(total_quantidade=Sum('quantidade'))
-    )
-
-    # Obtem a contagem de movimentações de entradas e saidas
-    contagem_entradas = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=True)
-        .count()
-    )
-    contagem_saidas = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=False)
-        .count()
-    )
-
-    # Esse dicionário é utilizado no gráfico Entradas x Saidas
-    # Cria um dicionário um novo dicionário
-    entradas_e_saidas = {}
-    # Separa os valores em 2 campos, entradas ou saidas, formatando por mês e ano
-    for movimentacao in movimentacoes:
-        data = movimentacao.data_hora.strftime('%m/%Y')
-        if data not in entradas_e_saidas:
-            entradas_e_saidas[data] = {'entradas': 0, 'saidas': 0}
-        if movimentacao.tipo_movimentacao:
-            entradas_e_saidas[data]['entradas'] += movimentacao.quantidade
-        else:
-            entradas_e_saidas[data]['saidas'] += movimentacao.quantidade
-
-    # Cria as categorias disponíveis no dicionário para o gráfico Entradas x Saidas
-    categorias_mes_ano = list(entradas_e_saidas.keys())
-
-    # Atrela os dados de entrada e saida do dicionário a suas variaveis para possibilitar a renderização
-    entradas_mes_ano = [entradas_e_saidas[categoria]['entradas'] for categoria in categorias_mes_ano]
-    saidas_mes_ano = [entradas_e_saidas[categoria]['saidas'] for categoria in categorias_mes_ano]
-
-    # Soma os totais para exibição do total de entrada, estoque e saida.
-    total_entradas = sum(entradas_mes_ano)
-    total_saidas = sum(saidas_mes_ano)
-
-    # Calcula o estoque total
-    total_estoque = total_entradas - total_saidas
-
-    return render(request, 'home/index.html', {
-        'categorias_mes_ano': categorias_mes_ano,
-        'entradas_mes_ano': entradas_mes_ano,
-        'total_entradas': total_entradas,
-        'saidas_mes_ano': saidas_mes_ano,
-        'total_saidas': total_saidas,
-        'entradas_por_produto': entradas_por_produto,
-        'saidas_por_produto': saidas_por_produto,
-        'total_estoque': total_estoque,
-        'contagem_entradas': contagem_entradas,
-        'contagem_saidas': contagem_saidas,
-    })
+    # Os totais, os gráficos por produto e o gráfico Entradas x Saidas são calculados uma vez a cada alteração
+    # das movimentações ou produtos e reutilizados pelo cache nas demais requisições
+    return render(request, 'home/index.html', _contexto_painel(obter_painel()))
+
+
+async def index_assincrono(request):
+    # Versão assincrona da página inicial, servida pelo ASGI (config/asgi.py), que executa as consultas
+    # do painel de forma concorrente. A renderização utiliza o ORM (sessão e mensagens) e roda fora do event loop
+    painel = await obter_painel_assincrono()
+
+    return await sync_to_async(render)(request, 'home/index.html', _contexto_painel(painel))
+
+
+def api_painel_delta(request):
+
+    # Totais, produtos e meses do painel alterados desde o cursor recebido, utilizado pela página inicial para
+    # atualizar os gráficos sem recarregar a página. Sem alterações retorna 204 (sem conteúdo)
+    try:
+        delta = delta_painel(request.GET.get('cursor') or None)
+    except CursorInvalido as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    if delta is None:
+        return HttpResponse(status=204)
+
+    return JsonResponse(delta)
 
 # ---- Fim Home Page ----
 
 # ---- Inicio Produtos ----
 
 
+@condicao_listagem('produtos', versoes.PRODUTO)
 def index_produto(request):
-    # Busca todos os objetos do modelo Produto que não estão deletados
-    produtos = Produto.objects.filter(deletado=False)
+    # Busca no banco os produtos não deletados que correspondem ao termo pesquisado (parâmetro q), ordenados
+    # pela relevância, e exibe somente a página solicitada (parâmetro pagina)
+    termo = request.GET.get('q', '').strip()
+    pagina = Paginator(buscar_produtos(termo), PRODUTOS_POR_PAGINA).get_page(request.GET.get('pagina'))
 
-    # Renderiza a template 'produto/index.html' com a lista de produtos
-    return render(request, 'produto/index.html', {'produtos': produtos})
+    # Renderiza a template 'produto/index.html' com a página de produtos
+    return render(request, 'produto/index.html', {'produtos': pagina, 'termo': termo})
 
 
+@condicao_listagem('estoque', versoes.PRODUTO, versoes.MOVIMENTACAO)
 def stock_produto(request):
-    # Busca as movimentações que não estão deletadas, ordenado pela data
-    movimentacoes = Movimentacao.objects.filter(deletado=False).order_by('data_hora')
-
-    # Recupera os valores dos as movimentações de entradas e saidas baseadas no nome do produto,
-    # somando as quantidades em um novo campo chamado total_quantidade
-
-    saidas_por_produto = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=False)
-        .values('produto__nome', 'produto__pk')
-        .annotate(total_quantidade=Sum('quantidade'))
-    )
-
-    # Recupera os valores das entradas, em seguida cria 3 novos campos, total_entradas, total_saidas
-    # e estoque.
-    # O total de entradas é a soma das quantidades, o total de saidas é a referência do produto com o
-    # saidas_por_produto e o estoque é o calculo do total_entradas menos total_saidas
-    entradas_por_produto = (
-        Movimentacao.objects
-        .filter(deletado=False, tipo_movimentacao=True)
-        .values('produto__nome', 'produto__ativo', 'produto__pk')
-        .annotate(total_entradas=Sum('quantidade'))
-        .annotate(total_saidas=Subquery(
-            saidas_por_produto.filter(produto__pk=OuterRef('produto__pk'))
-            .values('total_quantidade')[:1]
-        ))
-        .annotate(estoque=Case(
-            When(total_saidas__isnull=True, then=F('total_entradas')),
-            default=F('total_entradas') - F('total_saidas'),
-            output_field=IntegerField(),
-        ))
-    )
-
-    # Renderiza a template 'produto/stock.html' com a lista de produtos
+    # Recupera o saldo materializado de cada produto já movimentado, contendo os campos
+    # total_entradas, total_saidas e estoque (total_entradas menos total_saidas)
     return render(request, 'produto/stock.html', {
-        'entradas_por_produto': entradas_por_produto,
-        'saidas_por_produto': saidas_por_produto,
+        'saldos': saldos_por_produto(),
+    })
+
+
+@condicao_listagem('estoque-local', versoes.PRODUTO, versoes.MOVIMENTACAO)
+def stock_local(request):
+    # Estoque de cada produto por local, podendo ser filtrado por um único local
+    local_id = request.GET.get('local')
+    local_id = int(local_id) if local_id and local_id.isdigit() else None
+
+    return render(request, 'produto/stock_local.html', {
+        'locais': Local.objects.order_by('nome'),
+        'local_selecionado': local_id,
+        'saldos': saldos_por_local(local_id),
     })
 
 
+def stock_produto_em(request):
+    # Consulta o estoque de um produto ao final da data informada, a partir do saldo periódico mais próximo
+    form = EstoqueEmForm(request.GET or None)
+    saldo = obter_saldo_em(form.cleaned_data['produto'].pk, form.cleaned_data['data']) if form.is_valid() else None
+
+    return render(request, 'produto/stock_em.html', {'form': form, 'saldo': saldo})
+
+
+def api_stock_produto_em(request, pk):
+    # Retorna em JSON o estoque do produto ao final da data recebida no parâmetro data (AAAA-MM-DD)
+    produto = get_object_or_404(Produto.objects.only('pk'), pk=pk)
+    try:
+        data = parse_date(request.GET.get('data', ''))
+    except ValueError:
+        data = None
+    if data is None:
+        return JsonResponse({'erro': 'O parâmetro data deve estar no formato AAAA-MM-DD.'}, status=400)
+
+    return JsonResponse(obter_saldo_em(produto.pk, data))
+
+
+def api_autocomplete_produto(request):
+    # Retorna em JSON os produtos ativos cujo nome ou fabricante contém o termo recebido no parâmetro q,
+    # utilizado pelo campo de produto do cadastro de movimentações
+    try:
+        limite = min(max(int(request.GET.get('limite', LIMITE_AUTOCOMPLETE)), 1), LIMITE_AUTOCOMPLETE_MAXIMO)
+    except ValueError:
+        return JsonResponse({'erro': 'O parâmetro limite deve ser um número.'}, status=400)
+
+    return JsonResponse({'resultados': autocompletar_produtos(request.GET.get('q', ''), limite)})
+
+
 def create_produto(request):
     # Verifica se o request é um metodo POST, se for POST irá executar as alterações do form
     if request.method == 'POST':
@@ -148,7 +201,9 @@ def create_produto(request):
         form = ProdutoForm(request.POST)
 
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                incrementar_versao(versoes.PRODUTO)
             messages.success(request, 'Produto cadastrado com sucesso.')
 
             return redirect('produto')
@@ -172,7 +227,9 @@ def edit_produto(request, pk):
         form = ProdutoForm(request.POST, instance=produto)
 
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                incrementar_versao(versoes.PRODUTO)
             messages.success(request, 'Produto editado com sucesso.')
             return redirect('produto')
     else:
@@ -180,29 +237,85 @@ def edit_produto(request, pk):
     return render(request, 'produto/edit.html', {'form': form, 'produto.pk': pk})
 
 
+def _mensagem_produtos_deletados(produtos, movimentacoes):
+    mensagem = 'Produto deletado com sucesso.' if produtos == 1 else f'{produtos} produtos deletados com sucesso.'
+    if movimentacoes:
+        mensagem += f' {movimentacoes} movimentações dos produtos também foram deletadas.'
+
+    return mensagem
+
+
 def delete_produto(request, pk):
 
     # Recupera o id para atualização do campo deletado do banco para true
-    # assim o dado será deletado de forma recuperável
-    produto = get_object_or_404(Produto, id=pk)
-    produto.deletado = True
-    produto.save()
-    messages.success(request, 'Produto deletado com sucesso.')
+    # assim o dado será deletado de forma recuperável, junto com as movimentações do produto
+    produto = get_object_or_404(Produto.objects.only('pk'), id=pk)
+    messages.success(request, _mensagem_produtos_deletados(*excluir_produtos(Produto.objects.filter(pk=produto.pk))))
 
     return HttpResponseRedirect(reverse('produto'))
 
+
+def _ids_selecionados(request):
+    # Ids dos registros selecionados na listagem (parâmetro ids, um para cada registro). O isdigit aceita dígitos
+    # unicode como '²', que o int não converte, por isso os ids devem ser somente dígitos ascii
+    ids = request.POST.getlist('ids')
+    if not all(pk.isascii() and pk.isdigit() for pk in ids):
+        raise ParametroInvalido('Os registros selecionados são inválidos.')
+
+    return [int(pk) for pk in ids]
+
+
+@require_POST
+def delete_produto_lote(request):
+
+    # Exclui os produtos selecionados na listagem ou, sem seleção, todos os produtos encontrados pela busca
+    # (parâmetro q), em um único UPDATE junto com as suas movimentações
+    try:
+        ids = _ids_selecionados(request)
+    except ParametroInvalido as erro:
+        messages.error(request, str(erro))
+        return redirect('produto')
+
+    termo = request.POST.get('q', '').strip()
+    if ids:
+        produtos = Produto.objects.filter(pk__in=ids)
+    elif termo:
+        produtos = buscar_produtos(termo)
+    else:
+        messages.error(request, 'Selecione os produtos ou informe o termo da busca.')
+        return redirect('produto')
+
+    messages.success(request, _mensagem_produtos_deletados(*excluir_produtos(produtos)))
+
+    return redirect('produto')
+
 # ---- Fim Produtos ----
 
 
 # ---- Inicio Movimentações ----
+@condicao_listagem('movimentacoes', versoes.PRODUTO)
 def index_movimentacao(request):
 
-    # Busca todos os objetos do modelo Produto que não estão deletados
-    movimentacoes = Movimentacao.objects.filter(deletado=False).annotate(
-        id_busca_grid=Concat(Value('#'), Cast(F('pk'), output_field=CharField()))
-    )
-    # Renderiza a template 'produto/index.html' com a lista de produtos
-    return render(request, 'movimentacao/index.html', {'movimentacoes': movimentacoes})
+    # As movimentações são carregadas sob demanda pelo grid através da view grid_movimentacao,
+    # aqui são enviados apenas os produtos utilizados no filtro do grid
+    produtos = Produto.objects.order_by('nome').only('pk', 'nome')
+
+    # Renderiza a template 'movimentacao/index.html' com a lista de produtos do filtro
+    return render(request, 'movimentacao/index.html', {'produtos': produtos})
+
+
+def grid_movimentacao(request):
+
+    # Retorna uma página de movimentações em JSON, filtrada, ordenada e paginada no banco
+    try:
+        pagina = consultar_movimentacoes(request.GET)
+    except ParametroInvalido as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    for movimentacao in pagina['resultados']:
+        movimentacao['url_edicao'] = reverse('edit_movimentacao', kwargs={'pk': movimentacao['id']})
+
+    return JsonResponse(pagina)
 
 
 def create_movimentacao(request):
@@ -214,10 +327,19 @@ def create_movimentacao(request):
         form = MovimentacaoForm(request.POST)
 
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Movimentação cadastrado com sucesso.')
-
-            return redirect('movimentacao')
+            # Grava a movimentação e atualiza o saldo do produto na mesma transação,
+            # caso o estoque tenha acabado durante a gravação a transação é desfeita
+            try:
+                with transaction.atomic():
+                    incrementar_versao(versoes.MOVIMENTACAO)
+                    movimentacao = form.save()
+                    registrar_movimentacao(movimentacao)
+            except EstoqueInsuficiente as erro:
+                form.add_error('quantidade', str(erro))
+            else:
+                messages.success(request, 'Movimentação cadastrado com sucesso.')
+
+                return redirect('movimentacao')
 
     else:
 
@@ -229,9 +351,12 @@ def create_movimentacao(request):
 def edit_movimentacao(request, pk):
 
     # Guarda o Id do produto em uma tempdata para utiliza-lo na sessão da atual view
-    movimentacao = get_object_or_404(Movimentacao, pk=pk)
+    movimentacao = get_object_or_404(Movimentacao.objects.select_related('local'), pk=pk)
     request.session['tempdata'] = pk
 
+    # Guarda uma cópia dos valores originais, pois o form altera a instância ao validar os dados
+    anterior = copy.copy(movimentacao)
+
     # Verifica se o request é um metodo POST, se for POST irá executar as alterações do form
     # caso contrário retornará a tela do form com os dados preenchidos
 
@@ -240,10 +365,19 @@ def edit_movimentacao(request, pk):
         form = MovimentacaoForm(request.POST, instance=movimentacao)
 
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Movimentação editado com sucesso.')
-
-            return redirect('movimentacao')
+            # Grava a movimentação e substitui os valores anteriores no saldo na mesma transação,
+            # caso o estoque tenha acabado durante a gravação a transação é desfeita
+            try:
+                with transaction.atomic():
+                    incrementar_versao(versoes.MOVIMENTACAO)
+                    form.save()
+                    atualizar_movimentacao(anterior, movimentacao)
+            except EstoqueInsuficiente as erro:
+                form.add_error('quantidade', str(erro))
+            else:
+                messages.success(request, 'Movimentação editado com sucesso.')
+
+                return redirect('movimentacao')
 
     else:
 
@@ -253,119 +387,136 @@ def edit_movimentacao(request, pk):
 
 
 def delete_movimentacao(request, pk):
-    movimentacao = get_object_or_404(Movimentacao, id=pk)
-    movimentacao.deletado = True
-    movimentacao.save()
+    movimentacao = get_object_or_404(Movimentacao.objects.only('pk'), id=pk)
+
+    # Marca a movimentação como deletada e remove ela do saldo do produto na mesma transação
+    excluir_movimentacoes(Movimentacao.objects.filter(pk=movimentacao.pk))
     messages.success(request, 'Movimentacao deletada com sucesso.')
 
     return HttpResponseRedirect(reverse('movimentacao'))
 
+
+@require_POST
+def delete_movimentacao_lote(request):
+
+    # Exclui as movimentações selecionadas no grid ou, sem seleção, todas as movimentações que correspondem
+    # aos filtros do grid, em um único UPDATE
+    try:
+        ids = _ids_selecionados(request)
+        if ids:
+            movimentacoes = Movimentacao.objects.filter(pk__in=ids)
+        elif any(request.POST.get(filtro) for filtro in FILTROS):
+            movimentacoes = filtrar_movimentacoes(Movimentacao.objects.all(), request.POST)
+        else:
+            raise ParametroInvalido('Selecione as movimentações ou informe ao menos um filtro.')
+    except ParametroInvalido as erro:
+        messages.error(request, str(erro))
+        return redirect('movimentacao')
+
+    messages.success(request, f'{excluir_movimentacoes(movimentacoes)} movimentações deletadas com sucesso.')
+
+    return redirect('movimentacao')
+
+
+def import_movimentacao(request):
+
+    # Importa um arquivo CSV de movimentações em lotes e exibe o resumo da importação na própria página
+    resultado = None
+    if request.method == 'POST':
+
+        form = ImportacaoMovimentacaoForm(request.POST, request.FILES)
+
+        if form.is_valid():
+            arquivo = io.TextIOWrapper(form.cleaned_data['arquivo'], encoding='utf-8-sig', newline='')
+            try:
+                resultado = importar_movimentacoes(arquivo, tamanho_lote=form.cleaned_data['tamanho_lote'])
+            except ArquivoInvalido as erro:
+                form.add_error('arquivo', str(erro))
+
+    else:
+
+        form = ImportacaoMovimentacaoForm()
+
+    return render(request, 'movimentacao/import.html', {'form': form, 'resultado': resultado})
+
 # ---- Fim Movimentações ----
 
 # ---- Inicio Relatórios ----
 
 
-def export_pdf_movimentacao(request):
-    # Cria a resposta HTTP com o tipo de conteúdo do PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="movimentações_mensal.pdf"'
+def _versao_movimentacoes(request):
+    # A versão é consultada uma única vez por requisição e reutilizada pelo ETag, Last-Modified e pela view
+    if not hasattr(request, 'versao_movimentacoes'):
+        request.versao_movimentacoes = obter_versao(versoes.MOVIMENTACAO)
 
-    # Define as configurações do PDF
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    elements = []
+    return request.versao_movimentacoes
 
-    # Obtenha o caminho absoluto da pasta static
-    caminho_static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
 
-    # Constrói o caminho absoluto da imagem
-    caminho_imagem = os.path.join(caminho_static, 'img', 'pdf-logo-min.png')
+def _chave_relatorio_mensal(request):
+    # A data da alteração faz parte da chave para que um banco recriado (versão reiniciada) não reutilize
+    # relatórios gerados com dados antigos
+    versao = _versao_movimentacoes(request)
+    alterado_em = int(versao.alterado_em.timestamp() * 1000000) if versao.alterado_em else 0
 
-    # Cria um objeto Image com o caminho absoluto da imagem
-    imagem = Image(caminho_imagem)
-    imagem.drawHeight = 125
-    imagem.drawWidth = 300
+    return f'v{versao.versao}-{alterado_em}'
 
-    # Cria o estilo para o título
-    styles = getSampleStyleSheet()
-    title_style = styles['Title']
 
-    # Cria a estrutura de layout usando uma tabela
-    tabela = Table([[imagem]])
-    tabela.setStyle([('VALIGN', (1, 3), (0, 0), 'MIDDLE')])
+def _etag_relatorio_mensal(request):
+    return f'relatorio-mensal-{_chave_relatorio_mensal(request)}'
 
-    # Adiciona a tabela aos elementos do documento
-    elements.append(tabela)
 
-    # Adiciona uma linha em branco
-    elements.append(Spacer(1, 12))
+def _ultima_alteracao_relatorio_mensal(request):
+    return _versao_movimentacoes(request).alterado_em
 
-    # Adiciona o texto "Total de movimentações"
-    elements.append(Paragraph('<u><b>Total de movimentações</b></u>', title_style))
 
-    # Adiciona uma linha em branco
-    elements.append(Spacer(1, 12))
+@condition(etag_func=_etag_relatorio_mensal, last_modified_func=_ultima_alteracao_relatorio_mensal)
+def export_pdf_movimentacao(request):
 
-    # Obtém as movimentações
-    movimentacoes = Movimentacao.objects.filter(deletado=False).order_by('data_hora')
+    # Monta as linhas do relatório a partir do resumo mensal das movimentações
+    def obter_linhas():
+        return linhas_relatorio_mensal(resumo_mensal())
 
-    # Cria a estrutura de tabela
-    conteudo_grid = [['Mês/Ano', 'Entradas', 'Saídas']]
+    # O relatório só é gerado novamente quando alguma movimentação foi alterada desde a última geração,
+    # caso o navegador já possua a versão atual a resposta 304 é enviada pelo decorator condition
+    caminho = obter_relatorio_mensal_em_cache(_chave_relatorio_mensal(request), obter_linhas)
 
-    # Preenche a tabela com os dados das movimentações
-    entradas_e_saidas = {}
-    for movimentacao in movimentacoes:
-        data_mes_ano = movimentacao.data_hora.strftime('%m/%Y')
-        if data_mes_ano not in entradas_e_saidas:
-            entradas_e_saidas[data_mes_ano] = {'entradas': 0, 'saidas': 0}
-        if movimentacao.tipo_movimentacao:
-            entradas_e_saidas[data_mes_ano]['entradas'] += movimentacao.quantidade
-        else:
-            entradas_e_saidas[data_mes_ano]['saidas'] += movimentacao.quantidade
-
-    for data_mes_ano, valores in entradas_e_saidas.items():
-        entradas = valores['entradas']
-        saidas = valores['saidas']
-        conteudo_grid.append([data_mes_ano, entradas, saidas])
-
-    # Define o estilo da tabela
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.gray),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ])
-    # Define o estilo dos itens de movimentação
-    item_style = TableStyle([
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 1), (-1, -1), 1, colors.black)
-    ])
-
-    # Cria a tabela com os dados
-    table = Table(conteudo_grid)
-    table.setStyle(table_style)
-
-    # Aplica o estilo para os itens de movimentação individualmente
-    for i in range(1, len(conteudo_grid)):
-        for j in range(len(conteudo_grid[i])):
-            if j != 0:  # Ignorar a primeira coluna (mes/ano)
-                valor = conteudo_grid[i][j]
-                if j == 1 and valor > 0:  # Entrada (pintar de verde)
-                    item_style = ('TEXTCOLOR', (j, i), (j, i), colors.green)
-                elif j == 2 and valor > 0:  # Saída (pintar de vermelho)
-                    item_style = ('TEXTCOLOR', (j, i), (j, i), colors.red)
-                else:  # Zero ou mês/ano (manter a cor padrão)
-                    item_style = ('TEXTCOLOR', (j, i), (j, i), colors.black)
-                table.setStyle(TableStyle([item_style]))
-
-    # Adiciona a tabela aos elementos do documento
-    elements.append(table)
-
-    # Gera o PDF
-    doc.build(elements)
+    response = FileResponse(open(caminho, 'rb'), as_attachment=True, filename='movimentações_mensal.pdf',
+                            content_type='application/pdf')
+    patch_cache_control(response, private=True, no_cache=True)
 
     return response
 
+
+def export_csv_movimentacao(request):
+
+    # Envia o CSV ao navegador conforme as linhas são lidas do banco, sem montar o arquivo em memória
+    try:
+        movimentacoes = consultar_exportacao(request.GET)
+    except ParametroInvalido as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    response = StreamingHttpResponse(gerar_csv(linhas_movimentacoes(movimentacoes)),
+                                     content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="movimentacoes.csv"'
+
+    return response
+
+
+def export_xlsx_movimentacao(request):
+
+    try:
+        movimentacoes = consultar_exportacao(request.GET)
+    except ParametroInvalido as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    # A planilha é gravada em um arquivo temporário, que é enviado ao navegador em partes
+    arquivo = tempfile.TemporaryFile()
+    try:
+        gerar_xlsx(linhas_movimentacoes(movimentacoes), arquivo)
+    except ImportError:
+        arquivo.close()
+        return HttpResponse('A exportação em XLSX requer o pacote openpyxl.', status=501)
+    arquivo.seek(0)
+
+    return FileResponse(arquivo, as_attachment=True, filename='movimentacoes.xlsx',
+                        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
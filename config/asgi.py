@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# A atualização do painel por server-sent events é atendida antes do Django (ver aplicativo/eventos.py),
+# o import é feito após get_asgi_application pois depende das aplicações já carregadas
+from aplicativo.eventos import aplicacao_com_eventos  # noqa: E402
+
+application = aplicacao_com_eventos(django_application)
@@ -43,7 +43,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Deve ser o primeiro middleware para contabilizar também as consultas da sessão
+    'aplicativo.monitoramento.MonitorConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serve os arquivos estáticos compactados, somente com ESTATICOS_COMPACTADOS ativo
+    'aplicativo.estaticos.EstaticosMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,17 +58,25 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# Os templates são compilados uma vez por processo (loader em cache). No servidor de desenvolvimento os templates
+# alterados continuam sendo recarregados automaticamente
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'aplicativo.layout.contexto_layout',
+            ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -72,6 +84,40 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Inicio Orçamento de consultas SQL por view, indexado pelo nome da URL em config/urls.py.
+# O middleware aplicativo.monitoramento.MonitorConsultasMiddleware registra um aviso quando uma requisição
+# ultrapassa o orçamento e os testes que utilizam o OrcamentoConsultasMixin falham.
+# Os valores incluem as consultas da sessão e os savepoints das transações, e nas gravações de movimentações
+# consideram o pior caso: a primeira gravação do banco, que cadastra o local, o contador de alteração, o saldo do
+# produto e o resumo do mês pelos caminhos get_or_create (create_movimentacao executa 21 consultas nas gravações
+# seguintes).
+ORCAMENTO_CONSULTAS = {
+    'index': 3,
+    'index_assincrono': 3,
+    'api_painel_delta': 4,
+    'produto': 3,
+    'create_produto': 9,
+    'edit_produto': 10,
+    'delete_produto': 21,
+    'delete_produto_lote': 21,
+    'stock_produto': 2,
+    'stock_produto_em': 4,
+    'stock_local': 5,
+    'api_stock_produto_em': 3,
+    'api_autocomplete_produto': 1,
+    'movimentacao': 2,
+    'grid_movimentacao': 1,
+    'create_movimentacao': 28,
+    'edit_movimentacao': 26,
+    'delete_movimentacao': 10,
+    'delete_movimentacao_lote': 10,
+    'import_movimentacao': 26,
+    'export_pdf_movimentacao': 2,
+    'export_csv_movimentacao': 1,
+    'export_xlsx_movimentacao': 1,
+}
+# Fim Orçamento de consultas SQL por view
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -140,5 +186,68 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 STATIC_URL = '/static/'
-
-# Fim Mapeamento dos assets da página, contendo o css, js, apex charts e etc.
\ No newline at end of file
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Fim Mapeamento dos assets da página, contendo o css, js, apex charts e etc.
+
+# Inicio Cache dos relatórios gerados em PDF, cada arquivo corresponde a uma versão dos dados das movimentações.
+# Arquivos mais antigos que a idade máxima (segundos) ou que ultrapassem o tamanho máximo (bytes) são removidos.
+RELATORIOS_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'relatorios')
+RELATORIOS_CACHE_IDADE_MAXIMA = 7 * 24 * 60 * 60
+RELATORIOS_CACHE_TAMANHO_MAXIMO = 200 * 1024 * 1024
+# Fim Cache dos relatórios gerados em PDF
+
+# Inicio Cache da aplicação, utilizado pelo painel da página inicial.
+# O cache em arquivos é compartilhado entre os processos do servidor, assim a invalidação feita por um processo
+# vale para todos. Com o cache em memória (LocMemCache) cada processo possui o seu próprio cache e os dados podem
+# ficar desatualizados em outros processos até PAINEL_CACHE_TIMEOUT (segundos).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'django'),
+    },
+    # Fragmentos do layout das páginas (cabeçalho e menu lateral), iguais em todos os processos e mantidos
+    # em memória por LAYOUT_CACHE_TIMEOUT segundos (None: até o processo ser reiniciado)
+    'layout': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'layout',
+    },
+}
+PAINEL_CACHE_TIMEOUT = 5 * 60
+LAYOUT_CACHE_TIMEOUT = None
+# Identificador da versão implantada, utilizado no ETag das páginas de listagem (ver aplicativo/layout.py).
+# Sem ele o identificador é calculado a partir dos templates e do manifesto dos arquivos estáticos
+VERSAO_IMPLANTACAO = os.environ.get('VERSAO_IMPLANTACAO')
+# Fim Cache da aplicação
+
+# Inicio Atualização do painel por server-sent events (aplicativo/eventos.py), disponível somente pelo ASGI.
+# A cada PAINEL_EVENTOS_INTERVALO segundos as versões dos dados são consultadas e as alterações enviadas ao navegador,
+# sem alterações é enviado um comentário a cada PAINEL_EVENTOS_HEARTBEAT segundos para manter a conexão aberta.
+# Após PAINEL_EVENTOS_DURACAO segundos a resposta é encerrada e o navegador reconecta a partir do último evento
+PAINEL_EVENTOS_INTERVALO = 2
+PAINEL_EVENTOS_HEARTBEAT = 15
+PAINEL_EVENTOS_DURACAO = 5 * 60
+# Fim Atualização do painel por server-sent events
+
+# Inicio Particionamento da tabela de movimentações por mês (somente PostgreSQL).
+# Com MOVIMENTACAO_PARTICIONADA ativo a migração 0020 converte aplicativo_movimentacao em uma tabela particionada
+# por intervalo de data_hora (uma partição por mês). Nos demais bancos (ex.: SQLite) a tabela continua sem partições.
+# Para ativar depois de aplicada a migração: python manage.py migrate aplicativo 0019 && python manage.py migrate
+# O comando manter_particoes cria as partições dos próximos MOVIMENTACAO_MESES_FUTUROS meses e, quando
+# MOVIMENTACAO_MESES_RETENCAO é informado, desanexa as partições mais antigas que o período de retenção.
+MOVIMENTACAO_PARTICIONADA = os.environ.get('MOVIMENTACAO_PARTICIONADA', '').lower() in ('1', 'true', 'sim')
+MOVIMENTACAO_MESES_FUTUROS = 3
+MOVIMENTACAO_MESES_RETENCAO = None
+# Fim Particionamento da tabela de movimentações
+
+# Inicio Arquivos estáticos compactados (ver aplicativo/estaticos.py).
+# Com ESTATICOS_COMPACTADOS ativo cada página carrega somente o pacote de css e js que utiliza, gerado pelo comando
+# ESTATICOS_COMPACTADOS=1 python manage.py collectstatic, com o hash do conteúdo no nome dos arquivos e as versões
+# pré-comprimidas (gzip e brotli). Os arquivos com hash são servidos com o cache de ESTATICOS_CACHE_MAXIMO segundos.
+# O comando medir_estaticos compara o tamanho dos arquivos de cada página com e sem os pacotes.
+ESTATICOS_COMPACTADOS = os.environ.get('ESTATICOS_COMPACTADOS', '').lower() in ('1', 'true', 'sim')
+if ESTATICOS_COMPACTADOS:
+    STATICFILES_STORAGE = 'aplicativo.estaticos.ArmazenamentoEstaticos'
+ESTATICOS_CACHE_MAXIMO = 365 * 24 * 60 * 60
+ESTATICOS_CACHE_SEM_HASH = 60
+# Fim Arquivos estáticos compactados
@@ -22,19 +22,31 @@ urlpatterns = [
     # Inicio e Admin
     path('admin/', admin.site.urls),
     path('', views.index, name='index'),
+    path('painel-assincrono/', views.index_assincrono, name='index_assincrono'),
+    path('api/painel/delta/', views.api_painel_delta, name='api_painel_delta'),
 
     # Produtos
     path('produto/', views.index_produto, name='produto'),
     path('produto/create', views.create_produto, name='create_produto'),
     path('produto/edit/<int:pk>', views.edit_produto, name='edit_produto'),
     path('produto/delete/<int:pk>', views.delete_produto, name='delete_produto'),
+    path('produto/delete-lote', views.delete_produto_lote, name='delete_produto_lote'),
     path('produto/stock', views.stock_produto, name='stock_produto'),
+    path('produto/stock-em/', views.stock_produto_em, name='stock_produto_em'),
+    path('produto/stock-local/', views.stock_local, name='stock_local'),
+    path('api/produto/<int:pk>/stock-em/', views.api_stock_produto_em, name='api_stock_produto_em'),
+    path('api/produto/autocomplete/', views.api_autocomplete_produto, name='api_autocomplete_produto'),
 
     # Movimentações
     path('movimentacao/', views.index_movimentacao, name='movimentacao'),
+    path('movimentacao/grid', views.grid_movimentacao, name='grid_movimentacao'),
     path('movimentacao/create', views.create_movimentacao, name='create_movimentacao'),
     path('movimentacao/edit/<int:pk>', views.edit_movimentacao, name='edit_movimentacao'),
     path('movimentacao/delete/<int:pk>', views.delete_movimentacao, name='delete_movimentacao'),
+    path('movimentacao/delete-lote', views.delete_movimentacao_lote, name='delete_movimentacao_lote'),
+    path('movimentacao/import', views.import_movimentacao, name='import_movimentacao'),
     path('movimentacao/export-pdf/', views.export_pdf_movimentacao, name='export_pdf_movimentacao'),
+    path('movimentacao/export-csv/', views.export_csv_movimentacao, name='export_csv_movimentacao'),
+    path('movimentacao/export-xlsx/', views.export_xlsx_movimentacao, name='export_xlsx_movimentacao'),
 
 ]
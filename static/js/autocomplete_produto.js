@@ -0,0 +1,29 @@
+// Campo de produto com busca (autocomplete) dos cadastros de movimentações.
+// O select contém somente o produto selecionado, os demais são buscados pela api de autocomplete durante a digitação.
+document.addEventListener('DOMContentLoaded', function () {
+  var campo = $('#id_produto');
+  if (!campo.length) {
+    return;
+  }
+
+  campo.select2({
+    language: 'pt-BR',
+    width: '100%',
+    placeholder: 'Digite o nome ou o fabricante do produto',
+    ajax: {
+      url: campo.data('autocomplete-url'),
+      dataType: 'json',
+      delay: 250,
+      data: function (parametros) {
+        return {q: parametros.term || ''};
+      },
+      processResults: function (dados) {
+        return {
+          results: dados.resultados.map(function (produto) {
+            return {id: produto.id, text: produto.nome + ' - ' + produto.fabricante};
+          })
+        };
+      }
+    }
+  });
+});